@@ -0,0 +1,151 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Buckets kept per limiter before the least recently used are evicted
+DEFAULT_MAX_KEYS = 50_000
+# Idle buckets looked at for eviction on each request
+EVICT_PER_CHECK = 2
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated', 'full_at')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+        # When the bucket will have refilled to its own burst
+        self.full_at = updated
+
+
+class RateLimiter:
+    """Token buckets per key (client, customer or provider) and endpoint.
+
+    Each key earns ``rate`` tokens per second up to ``burst``; a request
+    spends one. Buckets live in an LRU order, so a check is a dict lookup
+    and a move to the end. Every check also looks at the least recently
+    used buckets and drops those that have refilled by their own rate and
+    burst, since a full bucket is the same as no bucket; ``max_keys`` caps
+    the rest.
+    """
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = self.limited = self.evicted = 0
+
+    def check(self, key, rate, burst, now=None):
+        """Spend a token for ``key``; returns seconds to wait, 0 when the request may proceed"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(burst, now)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+                bucket.updated = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                self.allowed += 1
+                wait = 0
+            else:
+                self.limited += 1
+                wait = (1 - bucket.tokens) / rate
+            bucket.full_at = now + (burst - bucket.tokens) / rate
+            self._evict_idle(now)
+            return wait
+
+    def _evict_idle(self, now):
+        # Each bucket is judged by the limits of its own endpoint, so a
+        # drained slow bucket is kept; one that is not full yet goes to the
+        # back, so it does not hide full buckets behind it
+        for _ in range(EVICT_PER_CHECK):
+            key, bucket = next(iter(self._buckets.items()))
+            if now >= bucket.full_at or len(self._buckets) > self.max_keys:
+                del self._buckets[key]
+                self.evicted += 1
+            else:
+                self._buckets.move_to_end(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._buckets),
+                'max_keys': self.max_keys,
+                'allowed': self.allowed,
+                'limited': self.limited,
+                'evicted': self.evicted
+            }
+
+
+class ConcurrencyLimiter:
+    """Caps requests in progress and sheds load once too many are waiting.
+
+    Up to ``max_active`` requests run at once; the next ``max_queue`` wait
+    up to ``queue_timeout`` seconds for a slot. A request arriving while the
+    queue is full, or whose wait times out, is rejected at once so the
+    client can back off instead of piling onto a saturated worker.
+    """
+
+    def __init__(self, max_active, max_queue, queue_timeout=1.0):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._changed = threading.Condition()
+        self.active = self.waiting = 0
+        self.admitted = self.shed = self.timed_out = 0
+
+    def acquire(self):
+        """True if the request may run; the caller must ``release`` it afterwards"""
+        with self._changed:
+            if self.active < self.max_active and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                return False
+            self.waiting += 1
+            try:
+                if not self._changed.wait_for(lambda: self.active < self.max_active, self.queue_timeout):
+                    self.timed_out += 1
+                    return False
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._changed:
+            self.active -= 1
+            self._changed.notify()
+
+    def retry_after(self):
+        """Whole seconds a shed client should wait, growing with the backlog"""
+        return max(1, math.ceil(self.queue_timeout * (1 + self.waiting / max(1, self.max_active))))
+
+    def stats(self):
+        with self._changed:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_active': self.max_active,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'timed_out': self.timed_out
+            }
+
+
+def parse_limits(spec):
+    """'endpoint=rate/burst,...' -> {endpoint: (rate, burst)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        endpoint, _, value = item.partition('=')
+        rate, _, burst = value.partition('/')
+        limits[endpoint.strip()] = (float(rate), float(burst or rate))
+    return limits
@@ -1,27 +1,110 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, make_response, send_file, Response, stream_with_context, g
 from flask_socketio import SocketIO, emit, join_room
-import json
+import atexit
+import time
+from functools import wraps
 import math
-from datetime import datetime, timedelta
+import os
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
 import random
+import threading
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 import base64
+from collections import deque
+from collections.abc import Mapping
+from flask.json.provider import DefaultJSONProvider
+from geo_index import GeoIndex
+from coord_store import CoordinateStore
+from booking_store import BookingStore, InvalidTransition, STATUS_TRANSITIONS, offered_to
+from earnings import EarningsLedger, parse_date
+from message_store import MessageStore
+from event_stream import EventStream
+from event_bus import EventBus
+from receipts import ReceiptRenderer, receipt_fields
+from exports import stream_receipts_zip, stream_statement_pdf
+from persistence import Journal, SharedLog
+from dispatch import Dispatcher
+from availability import AvailabilityIndex, booking_slot, parse_slot_start, DEFAULT_SLOT_MINUTES
+from text_index import TextIndex
+from review_store import ReviewStore
+from search_cache import SearchCache
+from catalog_cache import CatalogCache, parse_fields
+from records import BookingRecord, epoch_now
+from locks import KeyedLocks
+from metrics import MetricsRegistry, SlowRequestProfiler, CONTENT_TYPE
+from admission import RateLimiter, ConcurrencyLimiter, parse_limits
+from bulk import (read_ndjson, batched, parse_provider, parse_booking, provider_defaults, stream_ndjson,
+                  DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, MAX_REPORTED_ERRORS, NDJSON_MIMETYPE)
+
+# Multi-worker mode: every worker replicates state through one SQLite log
+# (LOCALSERVE_SHARED_DB) and, optionally, fans socket emits out through a
+# Socket.IO message queue such as redis:// (LOCALSERVE_MESSAGE_QUEUE). Without
+# a queue, workers re-emit each other's events as they read them from the log.
+SHARED_DB = os.environ.get('LOCALSERVE_SHARED_DB')
+MESSAGE_QUEUE = os.environ.get('LOCALSERVE_MESSAGE_QUEUE') or None
+
+class JSONProvider(DefaultJSONProvider):
+    """Serializes booking records (and any other mapping) as plain JSON objects"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Mapping):
+            return dict(o)
+        return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.config['SECRET_KEY'] = 'localserve_secret_key'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Larger request bodies are refused with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=MESSAGE_QUEUE)
+
+# Handler latency, emit counts and store sizes, served at /metrics
+metrics = MetricsRegistry()
+http_latency = metrics.histogram('localserve_http_request_duration_seconds',
+                                 'Time spent in /api/* handlers', ('method', 'route', 'status'))
+socket_latency = metrics.histogram('localserve_socketio_event_duration_seconds',
+                                   'Time spent in Socket.IO event handlers', ('event',))
+socket_emits = metrics.counter('localserve_socketio_emits_total',
+                               'Room events delivered to sockets', ('room_type', 'event'))
+# Stack sampling of requests slower than LOCALSERVE_PROFILE_SLOW_MS, for the
+# fraction LOCALSERVE_PROFILE_SAMPLE of requests (default all); off when unset
+PROFILE_SLOW_MS = os.environ.get('LOCALSERVE_PROFILE_SLOW_MS')
+profiler = SlowRequestProfiler(float(PROFILE_SLOW_MS) / 1000,
+                               float(os.environ.get('LOCALSERVE_PROFILE_SAMPLE', 1))) if PROFILE_SLOW_MS else None
+
+# Rooms clients may subscribe to over Socket.IO or /api/events
+ROOM_PREFIXES = ('provider_', 'consumer_', 'chat_')
+# Recent provider/consumer events kept for /api/notifications
+MAX_NOTIFICATIONS = 1000
+notifications = deque(maxlen=MAX_NOTIFICATIONS)
+
+# Socket emits, notifications and logging run on the event bus, off the request path
+event_bus = EventBus(workers=int(os.environ.get('LOCALSERVE_EVENT_WORKERS', 2)))
+
+def deliver_event(event, data, room=None):
+    """Event bus worker: push one room event to sockets and the notification feed"""
+    socketio.emit(event, data, room=room)
+    socket_emits.inc(room.split('_', 1)[0] if room else 'broadcast', event)
+    if room and room.startswith(('provider_', 'consumer_')):
+        notifications.append({
+            'event': event,
+            'room': room,
+            'seq': data.get('seq'),
+            'request_id': data.get('request_id'),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+
+events = EventStream(emit=event_bus.emitter(deliver_event))
 
 # Store data in memory
-active_requests = []
-new_requests_queue = []
-booking_history = []
-messages = []
-provider_earnings_history = []
+bookings = BookingStore()
+messages = MessageStore()
+earnings_ledger = EarningsLedger()
+receipt_renderer = ReceiptRenderer()
 provider_schedule = {}
 provider_profiles = {}
-notifications = []
 
 # Provider data with enhanced information
 PROVIDERS = [
@@ -118,66 +201,577 @@ PROVIDERS = [
 for provider in PROVIDERS:
     provider_profiles[provider['id']] = {**provider}
 
+# Lookup and spatial indexes used by /api/search and /api/search/batch
+providers_by_id = {provider['id']: provider for provider in PROVIDERS}
+# Serializes read-modify-write of one provider; readers use whichever record is current
+provider_locks = KeyedLocks()
+# Serializes bulk imports, which allocate ids to new providers
+provider_import_lock = threading.Lock()
+provider_index = GeoIndex()
+provider_index.rebuild(PROVIDERS)
+provider_coords = CoordinateStore()
+provider_coords.rebuild(PROVIDERS)
+# Radius-search candidates per (service, geohash cell, radius bucket)
+search_cache = SearchCache(provider_index.query)
+# Encoded catalog and detail bodies, rebuilt only after a provider changes
+catalog_cache = CatalogCache(lambda: list(PROVIDERS), lambda provider_id: provider_detail(provider_id))
+# Free text and facet postings (services, languages, certifications, price band, rating)
+provider_text = TextIndex()
+provider_text.rebuild(PROVIDERS)
+# Working hours, holidays and booked slots per provider
+availability = AvailabilityIndex()
+for provider in PROVIDERS:
+    availability.set_hours(provider['id'], provider.get('working_hours'))
+# Ratings and reviews; the catalog figures are the baseline new reviews add to
+reviews = ReviewStore()
+for provider in PROVIDERS:
+    reviews.set_baseline(provider['id'], provider['rating'], provider['reviews'])
+
+MAX_BATCH_QUERIES = 500
+MAX_EARNINGS_RANGE_DAYS = 3660
+MAX_STATEMENT_RANGE_DAYS = 366
+DEFAULT_BOOKINGS_PAGE = 50
+MAX_BOOKINGS_PAGE = 200
+DEFAULT_REVIEWS_PAGE = 10
+MAX_REVIEWS_PAGE = 100
+MAX_MESSAGE_LENGTH = 2000
+MAX_DETAILS_LENGTH = 1000
+# Bulk import bodies are streamed, so they may be far larger than other requests
+MAX_IMPORT_BYTES = int(os.environ.get('LOCALSERVE_MAX_IMPORT_BYTES', 256 * 1024 * 1024))
+
+# Per-client (tokens per second, burst) by endpoint. LOCALSERVE_RATE_LIMITS
+# overrides entries as 'endpoint=rate/burst,...', or 'off' disables limiting
+RATE_LIMITS = {
+    'api_search': (5, 20),
+    'api_search_batch': (1, 5),
+    'get_all_providers': (2, 10),
+    'get_provider_details': (5, 20),
+    'check_request_status': (1, 5),
+    'create_booking_request': (0.2, 5),
+    'dispatch_booking_request': (0.2, 5),
+    'send_message': (2, 10)
+}
+RATE_LIMITS_SPEC = os.environ.get('LOCALSERVE_RATE_LIMITS', '')
+if RATE_LIMITS_SPEC.strip().lower() == 'off':
+    RATE_LIMITS = {}
+else:
+    RATE_LIMITS.update(parse_limits(RATE_LIMITS_SPEC))
+rate_limiter = RateLimiter()
+# Requests of this worker in progress at once, and how many more may queue
+# for a slot before new ones are shed with 503; 0 turns the limit off
+MAX_CONCURRENT = int(os.environ.get('LOCALSERVE_MAX_CONCURRENT', 32))
+MAX_QUEUED = int(os.environ.get('LOCALSERVE_MAX_QUEUED', 64))
+concurrency = ConcurrencyLimiter(MAX_CONCURRENT, MAX_QUEUED) if MAX_CONCURRENT > 0 else None
+# Long polls hold their request open by design, so they do not take a slot
+UNLIMITED_ENDPOINTS = {'poll_events'}
+admission_rejections = metrics.counter('localserve_admission_rejections_total',
+                                       'Requests refused by rate limiting or load shedding', ('endpoint', 'reason'))
+
+def store_sizes():
+    return (
+        (('active_requests',), bookings.active_count),
+        (('booking_history',), bookings.history_count),
+        (('messages',), len(messages)),
+        (('conversations',), messages.conversation_count),
+        (('provider_earnings_history',), len(earnings_ledger)),
+        (('notifications',), len(notifications))
+    )
+
+def event_bus_totals():
+    stats = event_bus.stats()
+    return [((outcome,), stats[outcome]) for outcome in ('enqueued', 'delivered', 'coalesced', 'dropped', 'failed')]
+
+def search_cache_totals():
+    stats = search_cache.stats()
+    return [((outcome,), stats[outcome]) for outcome in ('hits', 'misses')]
+
+def resident_memory():
+    """Resident set size in bytes, where /proc is available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return [((), int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE'))]
+    except (OSError, ValueError):
+        return []
+
+metrics.gauge('localserve_store_size', 'Entries held by each in-memory store', ('store',), collect=store_sizes)
+metrics.gauge('localserve_event_bus_depth', 'Jobs waiting on the event bus',
+              collect=lambda: [((), event_bus.depth())])
+metrics.gauge('localserve_event_bus_jobs_total', 'Event bus jobs by outcome', ('outcome',),
+              collect=event_bus_totals, kind='counter')
+metrics.gauge('localserve_search_cache_lookups_total', 'Search cache lookups by outcome', ('outcome',),
+              collect=search_cache_totals, kind='counter')
+metrics.gauge('localserve_admission_requests', 'Requests running and queued for a slot', ('state',),
+              collect=lambda: [(('active',), concurrency.active), (('waiting',), concurrency.waiting)]
+              if concurrency is not None else [])
+metrics.gauge('localserve_rate_limiter_keys', 'Token buckets held by the rate limiter',
+              collect=lambda: [((), rate_limiter.stats()['keys'])])
+metrics.gauge('localserve_process_resident_memory_bytes', 'Resident memory of this worker',
+              collect=resident_memory)
+
+def reindex_provider(provider):
+    """Refresh derived search structures after a provider is edited"""
+    provider_index.update(provider)
+    provider_coords.update(provider)
+    provider_text.update(provider)
+    search_cache.invalidate(provider)
+    catalog_cache.invalidate(provider['id'])
+    availability.set_hours(provider['id'], provider.get('working_hours'))
+
+def replace_provider(provider_id, changes):
+    """Swap in a changed copy of a provider; call with provider_locks(provider_id) held
+
+    Provider records are never changed in place, so a reader holding one
+    sees it wholly before or wholly after an update.
+    """
+    current = providers_by_id[provider_id]
+    provider = {**current, **changes}
+    providers_by_id[provider_id] = provider
+    PROVIDERS[PROVIDERS.index(current)] = provider
+    reindex_provider(provider)
+    return provider
+
+def record_review(booking):
+    """Add a rated booking's review and refresh the provider's rating from the exact totals"""
+    record_reviews([booking])
+
+def record_reviews(rated):
+    """``record_review`` for a batch; each provider's rating is refreshed once"""
+    changed = set()
+    for booking in rated:
+        if booking.get('rating') is not None and booking.get('provider_id') is not None and reviews.add(booking):
+            changed.add(booking['provider_id'])
+    for provider_id in changed:
+        with provider_locks(provider_id):
+            if provider_id in providers_by_id:
+                summary = reviews.summary(provider_id)
+                replace_provider(provider_id, {'rating': summary['rating'], 'reviews': summary['reviews']})
+
+def import_providers(batch):
+    """Add or replace a batch of providers, refreshing lookups and search indexes once
+
+    Records without an id become new providers. A known id keeps its
+    rating, which stays derived from reviews; a new provider's rating and
+    review count seed its baseline. Returns the stored records.
+    """
+    with provider_import_lock:
+        next_id = max(providers_by_id, default=0) + 1
+        for data in batch:
+            if data.get('id') is None:
+                data['id'] = next_id
+            next_id = max(next_id, data['id'] + 1)
+        stored = {}
+        with provider_locks.many(data['id'] for data in batch):
+            positions = {provider['id']: position for position, provider in enumerate(PROVIDERS)}
+            for data in batch:
+                current = providers_by_id.get(data['id'])
+                if current is None:
+                    provider = {**provider_defaults(), **data}
+                    reviews.set_baseline(provider['id'], provider['rating'], provider['reviews'])
+                    positions[provider['id']] = len(PROVIDERS)
+                    PROVIDERS.append(provider)
+                else:
+                    summary = reviews.summary(data['id'])
+                    provider = {**current, **data, 'rating': summary['rating'], 'reviews': summary['reviews']}
+                    PROVIDERS[positions[provider['id']]] = provider
+                providers_by_id[provider['id']] = provider
+                provider_profiles[provider['id']] = {**provider_profiles.get(provider['id'], {}), **provider}
+                availability.set_hours(provider['id'], provider.get('working_hours'))
+                stored[provider['id']] = provider
+            provider_index.update_many(stored.values())
+            provider_coords.update_many(stored.values())
+            provider_text.update_many(stored.values())
+            search_cache.clear()
+            catalog_cache.invalidate_many(stored)
+    return list(stored.values())
+
+def import_bookings(batch):
+    """Store a batch of (booking, archived) pairs; returns (stored records, [(position, error)])"""
+    stored, rejected = bookings.add_many(batch)
+    for booking in stored:
+        availability.sync(booking)
+    record_reviews([booking for booking in stored if bookings.is_archived(booking['id'])])
+    # Paid bookings count towards earnings on their payment day, once each, as process_payment records them
+    earnings_ledger.record_many(
+        (booking['provider_id'], parse_date((booking.get('payment_at') or booking['timestamp'])[:10]),
+         int(booking['payment_amount']), booking.get('service_type', 'Other'), f'booking-{booking["id"]}')
+        for booking in stored
+        if booking.get('payment_status') == 'paid' and booking.get('provider_id') is not None
+    )
+    return stored, rejected
+
 # Generate sample earnings data
 def generate_earnings_data():
-    today = datetime.now()
-    for i in range(30):
-        date = today - timedelta(days=i)
-        if random.random() > 0.3:
-            provider_earnings_history.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'amount': random.randint(500, 3000),
-                'service': random.choice(['Installation', 'Repair', 'Products']),
-                'customer': f'Customer {random.randint(1, 100)}'
-            })
+    today = datetime.now().date()
+    for provider in PROVIDERS:
+        for i in range(30):
+            date = today - timedelta(days=i)
+            if random.random() > 0.3:
+                earnings_ledger.record(
+                    provider['id'],
+                    date,
+                    random.randint(500, 3000),
+                    random.choice(['Installation', 'Repair', 'Products']),
+                    entry_id=f"seed-{provider['id']}-{date.isoformat()}"
+                )
+
+# Durable state: a write-ahead journal plus periodic snapshots under DATA_DIR.
+# Set LOCALSERVE_DATA_DIR to '' or 'none' to keep everything in memory only.
+DATA_DIR = os.environ.get('LOCALSERVE_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+def journal_enabled():
+    # Export pool workers re-import the entry script as __mp_main__
+    if __name__ == '__mp_main__':
+        return False
+    # Under the debug reloader only the serving child may own the journal
+    if __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        return False
+    return bool(SHARED_DB) or bool(DATA_DIR and DATA_DIR.lower() != 'none')
+
+if not journal_enabled():
+    journal = None
+elif SHARED_DB:
+    journal = SharedLog(SHARED_DB)
+else:
+    journal = Journal(DATA_DIR)
+shared_log = journal if isinstance(journal, SharedLog) else None
+
+def state_write():
+    """Context for a mutation; in multi-worker mode it holds the shared write lock"""
+    return shared_log.write() if shared_log is not None else nullcontext()
+
+def journal_record(op, payload):
+    if journal is not None:
+        journal.record(op, payload)
+
+def restore_provider(data):
+    with provider_locks(data['id']):
+        if data['id'] not in providers_by_id:
+            provider = dict(data)
+            PROVIDERS.append(provider)
+            providers_by_id[provider['id']] = provider
+            reviews.set_baseline(provider['id'], provider.get('rating'), provider.get('reviews'))
+        # Ratings are derived from the review store, never taken from a saved copy
+        summary = reviews.summary(data['id'])
+        replace_provider(data['id'], {**data, 'rating': summary['rating'], 'reviews': summary['reviews']})
+
+def apply_journal_record(op, payload):
+    """Replay one journal record (or the snapshot) into the in-memory stores"""
+    if op == 'snapshot':
+        for data in payload['providers']:
+            restore_provider(data)
+        for provider_id, profile in payload['profiles']:
+            provider_profiles[provider_id] = profile
+        for provider_id, schedule in payload['schedules']:
+            provider_schedule[provider_id] = schedule
+            availability.set_holidays(provider_id, schedule.get('holidays'))
+        for booking, archived in payload['bookings']:
+            availability.sync(bookings.restore(booking, archived))
+            if archived:
+                record_review(booking)
+        messages.load_snapshot(payload['messages'])
+        earnings_ledger.load_snapshot(payload['earnings'])
+    elif op == 'booking':
+        availability.sync(bookings.restore(payload['booking'], payload['archived']))
+        if payload['archived']:
+            record_review(payload['booking'])
+    elif op == 'message':
+        messages.restore(payload)
+    elif op == 'chat_closed':
+        messages.close(payload['request_id'], payload['closed_at'])
+    elif op == 'earning':
+        earnings_ledger.restore(payload)
+    elif op == 'provider':
+        restore_provider(payload)
+    elif op == 'providers':
+        import_providers(payload)
+    elif op == 'profile':
+        provider_profiles[payload['provider_id']] = payload['profile']
+    elif op == 'schedule':
+        provider_schedule[payload['provider_id']] = payload['schedule']
+        availability.set_holidays(payload['provider_id'], payload['schedule'].get('holidays'))
+    elif op == 'event':
+        events.replay(payload['event'], payload['data'], payload['room'], emit=MESSAGE_QUEUE is None)
+
+def capture_state():
+    """Consistent-enough copy of every store for a journal snapshot"""
+    return {
+        # Ratings go in as baselines; the restored bookings add their reviews back on top
+        'providers': [{**p, **reviews.baseline(p['id'])} for p in list(PROVIDERS)],
+        'profiles': [[pid, dict(p)] for pid, p in list(provider_profiles.items())],
+        'schedules': [[pid, s] for pid, s in list(provider_schedule.items())],
+        'bookings': bookings.snapshot(),
+        'messages': messages.snapshot(),
+        'earnings': earnings_ledger.snapshot()
+    }
+
+def open_journal():
+    """Recover state from DATA_DIR, then journal every change from here on"""
+    journal.recover(apply_journal_record)
+    bookings.listener = lambda booking, archived: journal.record(
+        'booking', {'booking': booking, 'archived': archived})
+    messages.listener = journal.record
+    earnings_ledger.listener = lambda entry: journal.record('earning', entry)
+    if shared_log is not None:
+        # Each check-and-set on a booking holds the shared write lock, not the whole request
+        bookings.transaction = state_write
+        events.listener = lambda event, payload, room: journal.record(
+            'event', {'event': event, 'data': payload, 'room': room})
+    journal.snapshot_source = capture_state
+    journal.start()
+    atexit.register(journal.close)
+
+if journal is None:
+    generate_earnings_data()
+else:
+    open_journal()
+    # Only the first worker to reach an empty log seeds the demo data
+    with state_write():
+        if journal.seq == 0:
+            generate_earnings_data()
+
+@app.before_request
+def start_request_timer():
+    if request.path.startswith('/api/'):
+        g.request_started = time.perf_counter()
+        if profiler is not None:
+            g.profile = profiler.start(f'{request.method} {request.path}')
+
+@app.after_request
+def record_request_timing(response):
+    """Time until the handler returned; streamed bodies are not included"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_latency.observe(time.perf_counter() - started, request.method, route, response.status_code)
+    if profiler is not None:
+        profiler.finish(g.pop('profile', None))
+    return response
+
+def client_key():
+    """Who a request counts against: the client address
+
+    Customer and provider ids in a request are not authenticated, so a
+    client could dodge its limits by sending a new one each time.
+    """
+    return request.remote_addr
+
+def rate_limited(endpoint, key):
+    """Seconds the caller must wait before ``endpoint`` serves ``key`` again; 0 if it may proceed now"""
+    limit = RATE_LIMITS.get(endpoint)
+    if limit is None:
+        return 0
+    return rate_limiter.check((endpoint, key), *limit)
+
+@app.before_request
+def admit_request():
+    """Per-client rate limits, then the worker-wide concurrency limit"""
+    if not request.path.startswith('/api/') or request.endpoint in UNLIMITED_ENDPOINTS:
+        return
+    wait = rate_limited(request.endpoint, client_key())
+    if wait:
+        admission_rejections.inc(request.endpoint, 'rate_limited')
+        response = jsonify({'success': False, 'message': 'Too many requests, slow down'})
+        response.headers['Retry-After'] = str(math.ceil(wait))
+        return response, 429
+    if concurrency is None:
+        return
+    if not concurrency.acquire():
+        admission_rejections.inc(request.endpoint or 'unmatched', 'shed')
+        response = jsonify({'success': False, 'message': 'Server is busy, try again shortly'})
+        response.headers['Retry-After'] = str(concurrency.retry_after())
+        return response, 503
+    g.admitted = True
+
+@app.teardown_request
+def release_request_slot(exc):
+    if g.pop('admitted', False):
+        concurrency.release()
+
+@app.before_request
+def sync_shared_state():
+    """Bring this worker up to date; writes take the shared lock only around their state change"""
+    if shared_log is not None:
+        shared_log.catch_up()
+
+def open_job_count(provider_id):
+    """Accepted jobs a provider has not completed yet"""
+    return sum(1 for b in bookings.find(archived=False, provider_id=provider_id, status='accepted')
+               if b.get('job_status') != 'completed')
 
-generate_earnings_data()
+def offer_dispatched_request(booking, provider_ids, state):
+    for provider_id in provider_ids:
+        events.publish('new_request', booking, room=f"provider_{provider_id}")
+    events.publish('dispatch_wave', {
+        'request_id': booking['id'],
+        'wave': state.waves,
+        'radius': dispatcher.radii[state.radius_index],
+        'offered': len(state.offered)
+    }, room=f"consumer_{booking.get('customer_id', 'consumer_1')}")
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two coordinates in km"""
-    R = 6371
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = (math.sin(dlat / 2) ** 2 + 
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-         math.sin(dlon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return round(R * c, 2)
+def expire_dispatched_request(booking):
+    """Dispatcher callback, run inside the booking's edit"""
+    try:
+        bookings.set_status(booking, 'expired')
+    except InvalidTransition:
+        return
+    booking['can_cancel'] = False
+    booking['expired_at'] = epoch_now()
+    messages.close(booking['id'])
+    for provider_id in booking.get('provider_ids') or ():
+        events.publish('request_withdrawn', {'request_id': booking['id']}, room=f"provider_{provider_id}")
+    events.publish('request_expired', {
+        'request_id': booking['id']
+    }, room=f"consumer_{booking.get('customer_id', 'consumer_1')}")
+
+# Finds providers for /api/booking/dispatch requests in timed waves
+dispatcher = Dispatcher(
+    bookings,
+    find_providers=provider_index.query,
+    open_jobs=open_job_count,
+    on_offer=offer_dispatched_request,
+    on_expire=expire_dispatched_request,
+    transaction=state_write
+)
+
+# A worker silent for this long is presumed dead and its dispatch waves are taken over
+DISPATCH_HANDOVER_SECONDS = 15
+# Workers alive at the last handover check
+handover_live = set()
+
+def resume_dispatch(booking):
+    dispatch = booking['dispatch']
+    dispatcher.dispatch(booking, dispatch['lat'], dispatch['lng'], dispatch['service'])
+
+def adopt_orphaned_dispatches():
+    """Shared-log upkeep: run the waves of pending dispatches whose worker has stopped
+
+    Only scans when a worker has disappeared since the last check (or on
+    the first one, to pick up dispatches from before a restart).
+    """
+    live = shared_log.live_workers(DISPATCH_HANDOVER_SECONDS)
+    lost = handover_live - live
+    first = not handover_live
+    handover_live.clear()
+    handover_live.update(live)
+    if not (first or lost):
+        return
+    for booking in list(bookings.find(status='pending')):
+        if not booking.get('dispatch') or booking['dispatch'].get('worker') in live:
+            continue
+        with bookings.edit(booking['id']) as current:
+            # Checked again under the shared lock: another worker may have adopted it first
+            if (current is None or current['status'] != 'pending'
+                    or current['dispatch'].get('worker') in shared_log.live_workers(DISPATCH_HANDOVER_SECONDS)):
+                continue
+            current['dispatch'] = {**current['dispatch'], 'worker': shared_log.worker_id}
+        resume_dispatch(current)
+
+# Pick up dispatches interrupted by a restart. With several workers the one
+# that created a request owns its waves; the others adopt them if it stops.
+if shared_log is None:
+    for booking in list(bookings.find(status='pending')):
+        if booking.get('dispatch'):
+            resume_dispatch(booking)
+else:
+    shared_log.upkeep = adopt_orphaned_dispatches
+
+def chat_key(request_id):
+    """Normalize a chat request_id so socket and HTTP messages share a conversation"""
+    try:
+        return int(request_id)
+    except (TypeError, ValueError):
+        return request_id
+
+def timed_event(event):
+    """Record a Socket.IO handler's run time (and slow stacks) under its event name"""
+    def decorate(handler):
+        @wraps(handler)
+        def run(*args):
+            trace = profiler.start(f'socket {event}') if profiler is not None else None
+            started = time.perf_counter()
+            try:
+                return handler(*args)
+            finally:
+                socket_latency.observe(time.perf_counter() - started, event)
+                if profiler is not None:
+                    profiler.finish(trace)
+        return run
+    return decorate
 
 # WebSocket event handlers
 @socketio.on('connect')
 def handle_connect():
-    print('Client connected')
+    event_bus.submit(print, 'Client connected')
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print('Client disconnected')
+    event_bus.submit(print, 'Client disconnected')
+
+def replay_events(room, since):
+    """Send a reconnecting socket the events it missed, or ask it to resync"""
+    if since is None:
+        return
+    missed, reset = events.since(room, int(since))
+    if reset:
+        emit('resync', {'room': room, 'seq': events.last_seq(room)})
+        return
+    for seq, event, data in missed:
+        emit(event, data)
 
 @socketio.on('join_provider')
+@timed_event('join_provider')
 def handle_join_provider(data):
     provider_id = data.get('provider_id')
-    join_room(f'provider_{provider_id}')
-    emit('joined', {'message': f'Joined provider room {provider_id}'})
+    room = f'provider_{provider_id}'
+    join_room(room)
+    emit('joined', {'message': f'Joined provider room {provider_id}', 'room': room, 'seq': events.last_seq(room)})
+    replay_events(room, data.get('since'))
 
 @socketio.on('join_consumer')
+@timed_event('join_consumer')
 def handle_join_consumer(data):
     consumer_id = data.get('consumer_id')
-    join_room(f'consumer_{consumer_id}')
-    emit('joined', {'message': f'Joined consumer room {consumer_id}'})
+    room = f'consumer_{consumer_id}'
+    join_room(room)
+    emit('joined', {'message': f'Joined consumer room {consumer_id}', 'room': room, 'seq': events.last_seq(room)})
+    replay_events(room, data.get('since'))
+
+@socketio.on('join_room')
+@timed_event('join_room')
+def handle_join_room(data):
+    room = str(data.get('room', ''))
+    if not room.startswith(ROOM_PREFIXES):
+        emit('error', {'message': f'Unknown room {room}'})
+        return
+    join_room(room)
+    emit('joined', {'message': f'Joined room {room}', 'room': room, 'seq': events.last_seq(room)})
+    replay_events(room, data.get('since'))
 
 @socketio.on('send_message')
+@timed_event('send_message')
 def handle_message(data):
-    message = {
-        'id': len(messages) + 1,
-        'request_id': data.get('request_id'),
-        'sender': data.get('sender'),
-        'message': data.get('message'),
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    messages.append(message)
-    
-    # Emit to the chat room
-    socketio.emit('new_message', message, room=f"chat_{data.get('request_id')}")
+    error = message_error(data.get('message'))
+    if error:
+        emit('error', {'message': error})
+        return
+    wait = rate_limited('send_message', client_key())
+    if wait:
+        admission_rejections.inc('socket send_message', 'rate_limited')
+        emit('error', {'message': 'Too many messages, slow down', 'retry_after': math.ceil(wait)})
+        return
+    if chat_key(data.get('request_id')) not in bookings:
+        emit('error', {'message': 'Request not found'})
+        return
+    with state_write():
+        message = messages.add(
+            chat_key(data.get('request_id')),
+            data.get('sender'),
+            data.get('message'),
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        
+        # Emit to the chat room
+        events.publish('new_message', message, room=f"chat_{message['request_id']}")
 
 # Routes
 @app.route('/')
@@ -210,44 +804,194 @@ def api_search():
     user_lat = float(request.args.get('lat', 12.9716))
     user_lng = float(request.args.get('lng', 77.5946))
     radius = float(request.args.get('radius', 1.0))
+    # Optional ?at=YYYY-MM-DDTHH:MM keeps only providers free for ?duration= minutes from then
+    slot = parse_slot_query(request.args)
+    if isinstance(slot, str):
+        return jsonify({'error': slot}), 400
+    
+    min_rating = request.args.get('min_rating', type=float)
+    # ?q= matches names, services, languages, certifications and descriptions by
+    # prefix with one typo allowed; facet parameters match whole values
+    allowed = intersect(provider_text.match(request.args.get('q', '')), provider_text.filter(
+        services=request.args.get('sub_service'),
+        languages=request.args.get('language'),
+        certifications=request.args.get('certification'),
+        price_band=request.args.get('price_band')
+    ))
     
     results = []
-    for provider in PROVIDERS:
-        if service_type and provider['service'].lower() != service_type.lower():
+    for distance, provider in search_cache.query(user_lat, user_lng, radius, service_type):
+        if allowed is not None and provider['id'] not in allowed:
+            continue
+        if min_rating is not None and (provider.get('rating') or 0) < min_rating:
+            continue
+        if slot and not availability.is_free(provider['id'], *slot):
             continue
-        distance = calculate_distance(user_lat, user_lng, provider['lat'], provider['lng'])
-        if distance <= radius:
-            provider_copy = provider.copy()
+        provider_copy = provider.copy()
+        provider_copy['distance'] = distance
+        results.append(provider_copy)
+    
+    response = {'providers': results, 'radius_used': radius, 'count': len(results)}
+    if request.args.get('facets'):
+        response['facets'] = provider_text.facet_counts(p['id'] for p in results)
+    return jsonify(response)
+
+@app.route('/api/search/cache-stats')
+def search_cache_stats():
+    """Hit/miss counters of the radius-search cache"""
+    return jsonify(search_cache.stats())
+
+def intersect(*id_sets):
+    """Intersection of the given id sets, skipping None (no constraint); None if all are None"""
+    result = None
+    for ids in id_sets:
+        if ids is not None:
+            result = ids if result is None else result & ids
+    return result
+
+def parse_slot_query(args):
+    """(start, end) from ?at= and ?duration=, None without ?at=, or an error message"""
+    at = args.get('at')
+    if not at:
+        return None
+    try:
+        start = datetime.fromisoformat(at)
+    except ValueError:
+        return 'at must be an ISO date and time, e.g. 2025-01-31T14:30'
+    duration = args.get('duration', DEFAULT_SLOT_MINUTES, type=int)
+    if duration <= 0:
+        return 'duration must be positive'
+    return start.replace(tzinfo=None), start.replace(tzinfo=None) + timedelta(minutes=duration)
+
+@app.route('/api/provider/next-slot')
+def get_next_free_slot():
+    """Earliest free slot for a provider at or after ?after= (default now)"""
+    provider_id = request.args.get('provider_id', 1, type=int)
+    duration = request.args.get('duration', DEFAULT_SLOT_MINUTES, type=int)
+    if provider_id not in providers_by_id:
+        return jsonify({'error': 'Provider not found'}), 404
+    try:
+        after = datetime.fromisoformat(request.args['after']) if request.args.get('after') else datetime.now()
+    except ValueError:
+        return jsonify({'error': 'after must be an ISO date and time'}), 400
+    if duration <= 0:
+        return jsonify({'error': 'duration must be positive'}), 400
+    
+    start = availability.next_free_slot(provider_id, after.replace(tzinfo=None, second=0, microsecond=0),
+                                        timedelta(minutes=duration))
+    return jsonify({
+        'provider_id': provider_id,
+        'start': start.isoformat(timespec='minutes') if start else None,
+        'end': (start + timedelta(minutes=duration)).isoformat(timespec='minutes') if start else None
+    })
+
+def batch_query(query, defaults):
+    """(lat, lng, radius, service, limit) for one batch item; ValueError if it is malformed"""
+    if not isinstance(query, dict):
+        raise ValueError('must be an object')
+    query = {**defaults, **query}
+    try:
+        lat, lng, radius = (float(query[field]) for field in ('lat', 'lng', 'radius'))
+        limit = int(query['limit']) if query['limit'] is not None else None
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('lat, lng, radius and limit must be numbers') from None
+    if not all(math.isfinite(value) for value in (lat, lng, radius)) or (limit is not None and limit < 0):
+        raise ValueError('lat, lng and radius must be finite and limit not negative')
+    if not isinstance(query['service'], str):
+        raise ValueError('service must be a string')
+    return lat, lng, radius, query['service'], limit
+
+@app.route('/api/search/batch', methods=['POST'])
+def api_search_batch():
+    """Nearest providers for many locations and service types in one call"""
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'error': 'expected a JSON object'}), 400
+    queries = data.get('queries', [])
+    if not isinstance(queries, list) or len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({'error': f'queries must be a list of at most {MAX_BATCH_QUERIES} items'}), 400
+    defaults = {'lat': 12.9716, 'lng': 77.5946, 'radius': data.get('radius', 1.0), 'service': '',
+                'limit': data.get('limit')}
+    parsed = []
+    for position, query in enumerate(queries):
+        try:
+            parsed.append(batch_query(query, defaults))
+        except ValueError as e:
+            return jsonify({'error': f'queries[{position}]: {e}'}), 400
+    
+    results = []
+    for (_, _, radius, _, _), matches in zip(parsed, provider_coords.nearest_many(parsed)):
+        providers = []
+        for provider_id, distance in matches:
+            provider_copy = providers_by_id[provider_id].copy()
             provider_copy['distance'] = distance
-            results.append(provider_copy)
+            providers.append(provider_copy)
+        results.append({'providers': providers, 'radius_used': radius, 'count': len(providers)})
     
-    results.sort(key=lambda x: x['distance'])
-    return jsonify({'providers': results, 'radius_used': radius, 'count': len(results)})
+    return jsonify({'results': results, 'count': len(results)})
+
+def provider_detail(provider_id):
+    """Detail page data for a provider, or None"""
+    provider = providers_by_id.get(provider_id)
+    if provider is None:
+        return None
+    provider_data = {**provider}
+    provider_data['recent_reviews'] = reviews.recent(provider_id)
+    provider_data['rating_distribution'] = reviews.summary(provider_id)['distribution']
+    return provider_data
+
+def encoded_response(encoded):
+    """Serve a pre-encoded JSON body with a strong ETag, compressed when the client accepts it"""
+    body, encoding, etag = encoded.variant(request.headers.get('Accept-Encoding'))
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.mimetype = 'application/json'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/providers')
 def get_all_providers():
-    return jsonify(PROVIDERS)
+    """Provider catalog; ?view=summary for list/map views, ?fields=a,b to pick fields"""
+    fields = parse_fields(request.args.get('fields'))
+    if fields is None and request.args.get('view') == 'summary':
+        fields = 'summary'
+    return encoded_response(catalog_cache.catalog(fields))
 
 @app.route('/api/provider/<int:provider_id>')
 def get_provider_details(provider_id):
     """Get detailed provider profile"""
-    provider = next((p for p in PROVIDERS if p['id'] == provider_id), None)
-    if provider:
-        # Get recent reviews
-        recent_reviews = [r for r in booking_history if r.get('provider_id') == provider_id and r.get('review')][-5:]
-        provider_data = {**provider}
-        provider_data['recent_reviews'] = recent_reviews
-        return jsonify(provider_data)
-    return jsonify({'error': 'Provider not found'}), 404
+    encoded = catalog_cache.provider(provider_id, parse_fields(request.args.get('fields')))
+    if encoded is None:
+        return jsonify({'error': 'Provider not found'}), 404
+    return encoded_response(encoded)
 
-@app.route('/api/booking/request', methods=['POST'])
-def create_booking_request():
-    data = request.json
-    booking_request = {
-        'id': len(active_requests) + len(booking_history) + 1,
+@app.route('/api/provider/<int:provider_id>/reviews')
+def get_provider_reviews(provider_id):
+    """Page through a provider's reviews, newest first; ?before_id= continues after a review"""
+    if provider_id not in providers_by_id:
+        return jsonify({'error': 'Provider not found'}), 404
+    limit = max(1, min(request.args.get('limit', DEFAULT_REVIEWS_PAGE, type=int), MAX_REVIEWS_PAGE))
+    page, next_before_id = reviews.page(provider_id, request.args.get('before_id', type=int), limit)
+    return jsonify({
+        **reviews.summary(provider_id),
+        'items': page,
+        'next_before_id': next_before_id
+    })
+
+def build_booking_request(data):
+    """New pending booking from a request body"""
+    return BookingRecord({
+        'id': bookings.next_id(),
         'customer_name': data.get('customer_name', 'Anonymous Customer'),
         'customer_id': data.get('customer_id', 'consumer_1'),
         'provider_id': data.get('provider_id'),
+        'provider_ids': data.get('provider_ids'),
         'provider_name': data.get('provider_name'),
         'service_type': data.get('service_type'),
         'service': data.get('service'),
@@ -257,7 +1001,10 @@ def create_booking_request():
         'customer_phone': data.get('customer_phone', '+91 99999 99999'),
         'customer_lat': data.get('customer_lat'),
         'customer_lng': data.get('customer_lng'),
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'scheduled_date': data.get('scheduled_date'),
+        'scheduled_time': data.get('scheduled_time'),
+        'duration_minutes': data.get('duration_minutes'),
+        'timestamp': epoch_now(),
         'time_ago': 'Just now',
         'status': 'pending',
         'job_status': None,
@@ -266,13 +1013,33 @@ def create_booking_request():
         'review': None,
         'can_cancel': True,
         'can_reschedule': False
-    }
-    
-    active_requests.append(booking_request)
-    new_requests_queue.append(booking_request)
+    })
+
+def details_error(data):
+    """Why a booking body's free text is refused, or None"""
+    details = data.get('details')
+    if details is not None and (not isinstance(details, str) or len(details) > MAX_DETAILS_LENGTH):
+        return f'details must be text of at most {MAX_DETAILS_LENGTH} characters'
+    return None
+
+def message_error(text):
+    if not isinstance(text, str) or len(text) > MAX_MESSAGE_LENGTH:
+        return f'message must be text of at most {MAX_MESSAGE_LENGTH} characters'
+    return None
+
+@app.route('/api/booking/request', methods=['POST'])
+def create_booking_request():
+    error = details_error(request.json)
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    # The id is allocated and the booking stored as one step across workers
+    with state_write():
+        booking_request = build_booking_request(request.json)
+        bookings.add(booking_request)
     
-    # Send WebSocket notification to provider
-    socketio.emit('new_request', booking_request, room=f"provider_{data.get('provider_id')}")
+    # Send WebSocket notification to every provider the request was offered to
+    for provider_id in offered_to(booking_request):
+        events.publish('new_request', booking_request, room=f"provider_{provider_id}")
     
     return jsonify({
         'success': True,
@@ -280,10 +1047,86 @@ def create_booking_request():
         'request_id': booking_request['id']
     })
 
+@app.route('/api/booking/dispatch', methods=['POST'])
+def dispatch_booking_request():
+    """Let the server find a provider: offer the request in widening waves until one accepts"""
+    data = request.json
+    try:
+        lat = float(data.get('customer_lat'))
+        lng = float(data.get('customer_lng'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'customer_lat and customer_lng are required'}), 400
+    error = details_error(data)
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    service = data.get('service') or None
+    
+    with state_write():
+        booking_request = build_booking_request({**data, 'provider_id': None, 'provider_ids': None})
+        booking_request['dispatch'] = {'lat': lat, 'lng': lng, 'service': service}
+        if shared_log is not None:
+            # This worker runs the waves; another takes them over if it stops
+            booking_request['dispatch']['worker'] = shared_log.worker_id
+        bookings.add(booking_request)
+    state = dispatcher.dispatch(booking_request, lat, lng, service)
+    
+    # The first wave replaced the stored record; read its outcome from the store
+    if bookings.get(booking_request['id'])['status'] == 'expired':
+        return jsonify({
+            'success': False,
+            'message': 'No providers available nearby',
+            'request_id': booking_request['id']
+        })
+    return jsonify({
+        'success': True,
+        'message': f'Request offered to {len(state.offered)} nearby providers',
+        'request_id': booking_request['id']
+    })
+
 @app.route('/api/provider/requests')
 def get_provider_requests():
-    pending = [r for r in active_requests if r['status'] == 'pending']
-    return jsonify(pending)
+    """Requests for one provider, optionally only the changes after ?since=<seq>"""
+    provider_id = request.args.get('provider_id', 1, type=int)
+    status = request.args.get('status', 'pending')
+    since = request.args.get('since', type=int)
+    if status not in STATUS_TRANSITIONS:
+        return jsonify({'error': f'Unknown status {status}'}), 400
+    
+    # The feed version changes whenever a booking visible to this provider does,
+    # so an unchanged poll is answered before touching any booking
+    version = bookings.provider_version(provider_id)
+    etag = f'{provider_id}-{status}-{since}-{version}'
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    if status == 'pending':
+        # Pending requests may be broadcast to several providers
+        def visible(r):
+            return r['status'] == 'pending' and provider_id in offered_to(r)
+    else:
+        def visible(r):
+            return (r['status'] == status and r.get('provider_id') == provider_id
+                    and not bookings.is_archived(r['id']))
+    
+    if since is None:
+        if status == 'pending':
+            matches = bookings.find(status='pending', offered_to=provider_id)
+        else:
+            matches = bookings.find(status=status, provider_id=provider_id, archived=False)
+        response = make_response(jsonify(list(matches)))
+    else:
+        changed = bookings.provider_changes(provider_id, since)
+        response = make_response(jsonify({
+            'since': since,
+            'seq': version,
+            'upserted': [r for r in changed if visible(r)],
+            'removed': [r['id'] for r in changed if not visible(r)]
+        }))
+    response.headers['X-Feed-Seq'] = str(version)
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/provider/accept-request', methods=['POST'])
 def accept_request():
@@ -291,22 +1134,46 @@ def accept_request():
     request_id = data.get('request_id')
     provider_data = data.get('provider_data', {})
     
-    for req in active_requests:
-        if req['id'] == request_id:
-            req['status'] = 'accepted'
-            req['job_status'] = 'accepted'
-            req['accepted_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            req['provider_details'] = provider_data
-            req['can_cancel'] = False
-            req['can_reschedule'] = True
-            
-            # Send WebSocket notification to consumer
-            socketio.emit('request_accepted', {
-                'request_id': request_id,
-                'provider_details': provider_data
-            }, room=f"consumer_{req.get('customer_id', 'consumer_1')}")
-            
-            break
+    # First accept wins: the booking is locked while its status is checked and set
+    with bookings.edit(request_id) as req:
+        if not req:
+            return jsonify({'success': False, 'message': 'Request not found'})
+        if req['status'] == 'accepted':
+            return jsonify({'success': False, 'message': 'Request was already accepted'})
+        if provider_data.get('id') is not None and provider_data['id'] not in offered_to(req):
+            return jsonify({'success': False, 'message': 'Request was not offered to this provider'})
+        slot = booking_slot(req, explicit_only=True)
+        accepting_id = req.get('provider_id') if req.get('provider_id') is not None else provider_data.get('id')
+        # Checking and holding the slot is one step, so two bookings cannot both take it
+        if slot and accepting_id is not None and not availability.claim(accepting_id, req['id'], *slot):
+            return jsonify({'success': False, 'message': 'Provider is not free at the requested time'})
+        
+        try:
+            bookings.set_status(req, 'accepted')
+        except InvalidTransition as e:
+            availability.release(req['id'])
+            return jsonify({'success': False, 'message': str(e)})
+        dispatcher.cancel(request_id)
+        if req.get('provider_id') is None and provider_data.get('id') is not None:
+            bookings.assign_provider(req, provider_data['id'])
+            req['provider_name'] = provider_data.get('name', req.get('provider_name'))
+        req['accepted_at'] = epoch_now()
+        req['provider_details'] = provider_data
+        req['can_cancel'] = False
+        req['can_reschedule'] = True
+        bookings.set_job_status(req, 'accepted')
+        availability.sync(req)
+        
+        # Take the offer back from everyone else it went to
+        for provider_id in offered_to(req):
+            if provider_id != req.get('provider_id'):
+                events.publish('request_withdrawn', {'request_id': request_id}, room=f"provider_{provider_id}")
+        
+        # Send WebSocket notification to consumer
+        events.publish('request_accepted', {
+            'request_id': request_id,
+            'provider_details': provider_data
+        }, room=f"consumer_{req.get('customer_id', 'consumer_1')}")
     
     return jsonify({'success': True, 'message': 'Request accepted'})
 
@@ -315,28 +1182,32 @@ def reject_request():
     data = request.json
     request_id = data.get('request_id')
     
-    for req in active_requests:
-        if req['id'] == request_id:
-            req['status'] = 'rejected'
-            
-            # Notify consumer
-            socketio.emit('request_rejected', {
-                'request_id': request_id
-            }, room=f"consumer_{req.get('customer_id', 'consumer_1')}")
-            
-            break
+    with bookings.edit(request_id) as req:
+        if not req:
+            return jsonify({'success': False, 'message': 'Request not found'})
+        
+        try:
+            bookings.set_status(req, 'rejected')
+        except InvalidTransition as e:
+            return jsonify({'success': False, 'message': str(e)})
+        messages.close(request_id)
+        
+        # Notify consumer
+        events.publish('request_rejected', {
+            'request_id': request_id
+        }, room=f"consumer_{req.get('customer_id', 'consumer_1')}")
     
     return jsonify({'success': True, 'message': 'Request rejected'})
 
 @app.route('/api/consumer/check-status/<int:request_id>')
 def check_request_status(request_id):
-    for req in active_requests:
-        if req['id'] == request_id:
-            return jsonify({
-                'status': req['status'],
-                'job_status': req.get('job_status'),
-                'provider_details': req.get('provider_details', {})
-            })
+    req = bookings.get(request_id)
+    if req:
+        return jsonify({
+            'status': req['status'],
+            'job_status': req.get('job_status'),
+            'provider_details': req.get('provider_details', {})
+        })
     return jsonify({'status': 'not_found'})
 
 @app.route('/api/job/update-status', methods=['POST'])
@@ -346,14 +1217,17 @@ def update_job_status():
     request_id = data.get('request_id')
     new_status = data.get('status')
     
-    for req in active_requests:
-        if req['id'] == request_id:
-            req['job_status'] = new_status
+    with bookings.edit(request_id) as req:
+        if req:
+            try:
+                bookings.set_job_status(req, new_status)
+            except InvalidTransition as e:
+                return jsonify({'success': False, 'message': str(e)})
             if new_status == 'completed':
-                req['completed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                req['completed_at'] = epoch_now()
             
             # Notify consumer via WebSocket
-            socketio.emit('job_status_update', {
+            events.publish('job_status_update', {
                 'request_id': request_id,
                 'status': new_status
             }, room=f"consumer_{req.get('customer_id', 'consumer_1')}")
@@ -370,14 +1244,27 @@ def reschedule_booking():
     new_date = data.get('new_date')
     new_time = data.get('new_time')
     
-    for req in active_requests:
-        if req['id'] == request_id and req.get('can_reschedule', False):
+    with bookings.edit(request_id) as req:
+        if req and req.get('can_reschedule', False):
+            try:
+                start = parse_slot_start(new_date, new_time)
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'message': 'new_date must be YYYY-MM-DD and new_time HH:MM'})
+            duration = timedelta(minutes=req.get('duration_minutes') or DEFAULT_SLOT_MINUTES)
+            if not availability.claim(req.get('provider_id'), req['id'], start, start + duration):
+                suggestion = availability.next_free_slot(req.get('provider_id'), start, duration, ignore=req['id'])
+                return jsonify({
+                    'success': False,
+                    'message': 'Provider is not available at that time',
+                    'next_free_slot': suggestion.isoformat(timespec='minutes') if suggestion else None
+                })
             req['rescheduled_date'] = new_date
             req['rescheduled_time'] = new_time
-            req['rescheduled_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            req['rescheduled_at'] = epoch_now()
+            availability.sync(req)
             
             # Notify provider
-            socketio.emit('booking_rescheduled', {
+            events.publish('booking_rescheduled', {
                 'request_id': request_id,
                 'new_date': new_date,
                 'new_time': new_time
@@ -394,17 +1281,24 @@ def cancel_booking():
     request_id = data.get('request_id')
     reason = data.get('reason', 'No reason provided')
     
-    for req in active_requests:
-        if req['id'] == request_id and req.get('can_cancel', True):
-            req['status'] = 'cancelled'
+    with bookings.edit(request_id) as req:
+        if req and req.get('can_cancel', True):
+            try:
+                bookings.set_status(req, 'cancelled')
+            except InvalidTransition:
+                return jsonify({'success': False, 'message': 'Cannot cancel this booking'})
             req['cancellation_reason'] = reason
-            req['cancelled_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            req['cancelled_at'] = epoch_now()
+            availability.sync(req)
+            dispatcher.cancel(request_id)
+            messages.close(request_id)
             
-            # Notify provider
-            socketio.emit('booking_cancelled', {
-                'request_id': request_id,
-                'reason': reason
-            }, room=f"provider_{req.get('provider_id')}")
+            # Notify every provider holding the request
+            for provider_id in offered_to(req):
+                events.publish('booking_cancelled', {
+                    'request_id': request_id,
+                    'reason': reason
+                }, room=f"provider_{provider_id}")
             
             return jsonify({'success': True, 'message': 'Booking cancelled'})
     
@@ -412,8 +1306,35 @@ def cancel_booking():
 
 @app.route('/api/consumer/my-bookings')
 def get_consumer_bookings():
-    """Get all bookings for consumer"""
-    return jsonify(active_requests + booking_history)
+    """Get a page of one consumer's bookings, newest first"""
+    customer_id = request.args.get('customer_id', 'consumer_1')
+    before_id = request.args.get('before_id', type=int)
+    limit = max(1, min(request.args.get('limit', DEFAULT_BOOKINGS_PAGE, type=int), MAX_BOOKINGS_PAGE))
+    statuses = set(filter(None, request.args.get('status', '').split(','))) or None
+    archived = request.args.get('archived')
+    archived = None if archived is None else archived.lower() == 'true'
+    
+    # Conditional check runs off the per-customer version, before any booking is read
+    version, modified = bookings.customer_version(customer_id)
+    etag = f'{customer_id}-{version}-{before_id}-{limit}-{",".join(sorted(statuses or ()))}-{archived}'
+    last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+    
+    if not_modified:
+        response = make_response('', 304)
+    else:
+        page, next_before_id = bookings.customer_page(customer_id, before_id, limit, statuses, archived)
+        response = make_response(jsonify(page))
+        if next_before_id is not None:
+            response.headers['X-Next-Before-Id'] = str(next_before_id)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Let browsers cache the page but always revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/payment/process', methods=['POST'])
 def process_payment():
@@ -422,22 +1343,27 @@ def process_payment():
     request_id = data.get('request_id')
     amount = data.get('amount')
     
-    for req in active_requests:
-        if req['id'] == request_id:
-            req['payment_status'] = 'paid'
-            req['payment_amount'] = amount
-            req['payment_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # The paid check and the payment are one step under the booking's lock
+    with bookings.edit(request_id) as req:
+        if req:
+            try:
+                bookings.pay(req, amount, epoch_now())
+            except InvalidTransition as e:
+                return jsonify({'success': False, 'message': str(e)})
             req['receipt_id'] = f'RCP{request_id}{datetime.now().strftime("%Y%m%d%H%M")}'
+            # Render the receipt in the background so the first download is a cache hit
+            receipt_renderer.submit(receipt_fields(req))
             
-            provider_earnings_history.append({
-                'date': datetime.now().strftime('%Y-%m-%d'),
-                'amount': int(amount),
-                'service': req['service_type'],
-                'customer': req['customer_name']
-            })
+            earnings_ledger.record(
+                req.get('provider_id'),
+                datetime.now().date(),
+                int(amount),
+                req['service_type'],
+                entry_id=f'booking-{request_id}'
+            )
             
             # Notify provider
-            socketio.emit('payment_received', {
+            events.publish('payment_received', {
                 'request_id': request_id,
                 'amount': amount
             }, room=f"provider_{req.get('provider_id')}")
@@ -453,56 +1379,92 @@ def process_payment():
 @app.route('/api/payment/receipt/<int:request_id>')
 def get_receipt(request_id):
     """Get payment receipt details"""
-    for req in active_requests + booking_history:
-        if req['id'] == request_id and req.get('payment_status') == 'paid':
-            receipt = {
-                'receipt_id': req.get('receipt_id'),
-                'date': req.get('payment_at'),
-                'customer_name': req['customer_name'],
-                'provider_name': req['provider_name'],
-                'service': req['service_type'],
-                'amount': req.get('payment_amount'),
-                'status': 'Paid'
-            }
-            return jsonify(receipt)
+    req = bookings.get(request_id)
+    if req and req.get('payment_status') == 'paid':
+        receipt = {
+            'receipt_id': req.get('receipt_id'),
+            'date': req.get('payment_at'),
+            'customer_name': req['customer_name'],
+            'provider_name': req['provider_name'],
+            'service': req['service_type'],
+            'amount': req.get('payment_amount'),
+            'status': 'Paid'
+        }
+        return jsonify(receipt)
     
     return jsonify({'error': 'Receipt not found'}), 404
 
 @app.route('/api/payment/receipt/<int:request_id>/pdf')
 def download_receipt_pdf(request_id):
-    """Generate and download PDF receipt"""
-    for req in active_requests + booking_history:
-        if req['id'] == request_id and req.get('payment_status') == 'paid':
-            buffer = BytesIO()
-            p = canvas.Canvas(buffer, pagesize=letter)
-            
-            # Add content to PDF
-            p.setFont("Helvetica-Bold", 20)
-            p.drawString(100, 750, "LocalServe - Payment Receipt")
-            
-            p.setFont("Helvetica", 12)
-            p.drawString(100, 700, f"Receipt ID: {req.get('receipt_id')}")
-            p.drawString(100, 680, f"Date: {req.get('payment_at')}")
-            p.drawString(100, 660, f"Customer: {req['customer_name']}")
-            p.drawString(100, 640, f"Provider: {req['provider_name']}")
-            p.drawString(100, 620, f"Service: {req['service_type']}")
-            p.drawString(100, 600, f"Amount Paid: ₹{req.get('payment_amount')}")
-            p.drawString(100, 580, f"Status: Paid")
-            
-            p.showPage()
-            p.save()
-            
-            buffer.seek(0)
-            pdf_data = base64.b64encode(buffer.read()).decode()
-            
+    """Download a PDF receipt; ?format=json returns the legacy base64 payload"""
+    req = bookings.get(request_id)
+    if req and req.get('payment_status') == 'paid':
+        receipt = receipt_renderer.get(receipt_fields(req))
+        filename = f'receipt_{req.get("receipt_id")}.pdf'
+        
+        if request.args.get('format') == 'json':
             return jsonify({
                 'success': True,
-                'pdf_data': pdf_data,
-                'filename': f'receipt_{req.get("receipt_id")}.pdf'
+                'pdf_data': base64.b64encode(receipt.data).decode(),
+                'filename': filename
             })
+        
+        # send_file handles If-None-Match and Range requests against the cached bytes
+        return send_file(
+            BytesIO(receipt.data),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=filename,
+            etag=receipt.etag,
+            conditional=True,
+            max_age=3600
+        )
     
     return jsonify({'error': 'Receipt not found'}), 404
 
+@app.route('/api/provider/statement')
+def export_provider_statement():
+    """Stream a provider's receipts for ?start=&end= as a statement PDF or a ZIP of receipts"""
+    provider_id = request.args.get('provider_id', 1, type=int)
+    export_format = request.args.get('format', 'pdf')
+    today = datetime.now().date()
+    try:
+        end = parse_date(request.args['end']) if 'end' in request.args else today
+        start = parse_date(request.args['start']) if 'start' in request.args else end - timedelta(days=29)
+        if start > end or (end - start).days >= MAX_STATEMENT_RANGE_DAYS:
+            raise ValueError(f'start must not be after end and the range must be under {MAX_STATEMENT_RANGE_DAYS} days')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if export_format not in ('pdf', 'zip'):
+        return jsonify({'error': 'format must be pdf or zip'}), 400
+    
+    # payment_at is 'YYYY-MM-DD HH:MM:SS', so the date prefix compares as a string.
+    # A ZIP gathers receipts as the response streams; a PDF needs them all before it starts.
+    first, last = start.isoformat(), end.isoformat()
+    receipts = (
+        receipt_fields(r) for r in bookings.find(provider_id=provider_id)
+        if r.get('payment_status') == 'paid' and first <= (r.get('payment_at') or '')[:10] <= last
+    )
+    
+    provider = providers_by_id.get(provider_id, {})
+    filename = f'statement_{provider_id}_{first}_{last}.{export_format}'
+    if export_format == 'zip':
+        body = stream_receipts_zip(receipts, receipt_renderer.cache)
+        mimetype = 'application/zip'
+    else:
+        try:
+            body = stream_statement_pdf(provider.get('name', f'Provider {provider_id}'), f'{first} to {last}',
+                                        receipts)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        mimetype = 'application/pdf'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/api/rating/submit', methods=['POST'])
 def submit_rating():
     """Consumer submits rating and review"""
@@ -510,27 +1472,20 @@ def submit_rating():
     request_id = data.get('request_id')
     rating = data.get('rating')
     review = data.get('review')
+    if not isinstance(rating, (int, float)) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        return jsonify({'success': False, 'message': 'Rating must be between 1 and 5'})
     
-    for req in active_requests:
-        if req['id'] == request_id:
-            req['rating'] = rating
-            req['review'] = review
-            req['rated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            booking_history.append(req)
-            active_requests.remove(req)
-            
-            provider_id = req['provider_id']
-            for provider in PROVIDERS:
-                if provider['id'] == provider_id:
-                    total_reviews = provider['reviews']
-                    current_rating = provider['rating']
-                    new_rating = ((current_rating * total_reviews) + rating) / (total_reviews + 1)
-                    provider['rating'] = round(new_rating, 1)
-                    provider['reviews'] += 1
-                    break
-            
-            return jsonify({'success': True, 'message': 'Rating submitted successfully'})
+    with bookings.edit(request_id) as req:
+        if req:
+            try:
+                bookings.rate(req, rating, review, epoch_now())
+            except InvalidTransition as e:
+                return jsonify({'success': False, 'message': str(e)})
+            bookings.archive(req)
+            messages.close(request_id)
+    if req:
+        record_review(req)
+        return jsonify({'success': True, 'message': 'Rating submitted successfully'})
     
     return jsonify({'success': False, 'message': 'Request not found'})
 
@@ -538,57 +1493,124 @@ def submit_rating():
 def send_message():
     """Send a message"""
     data = request.json
-    message = {
-        'id': len(messages) + 1,
-        'request_id': data.get('request_id'),
-        'sender': data.get('sender'),
-        'message': data.get('message'),
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    messages.append(message)
+    error = message_error(data.get('message'))
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    if chat_key(data.get('request_id')) not in bookings:
+        return jsonify({'success': False, 'message': 'Request not found'}), 404
+    with state_write():
+        message = messages.add(
+            chat_key(data.get('request_id')),
+            data.get('sender'),
+            data.get('message'),
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
     
     # Emit via WebSocket
-    socketio.emit('new_message', message, room=f"chat_{data.get('request_id')}")
+    events.publish('new_message', message, room=f"chat_{message['request_id']}")
     
     return jsonify({'success': True, 'message_id': message['id']})
 
 @app.route('/api/messages/<int:request_id>')
 def get_messages(request_id):
-    """Get all messages for a request"""
-    request_messages = [m for m in messages if m['request_id'] == request_id]
+    """Get messages for a request, optionally only those after/before a message id"""
+    request_messages = messages.page(
+        request_id,
+        after_id=request.args.get('after_id', type=int),
+        before_id=request.args.get('before_id', type=int),
+        limit=request.args.get('limit', type=int)
+    )
     return jsonify(request_messages)
 
+@app.route('/api/events')
+def poll_events():
+    """Long-poll fallback for clients without a socket: wait for room events after ?since="""
+    room = request.args.get('room', '')
+    if not room.startswith(ROOM_PREFIXES):
+        return jsonify({'error': 'Unknown room'}), 400
+    
+    since = request.args.get('since', type=int)
+    if since is None:
+        # First call only learns the current position
+        return jsonify({'room': room, 'events': [], 'last_seq': events.last_seq(room), 'reset': False})
+    
+    timeout = request.args.get('timeout', 25, type=float)
+    missed, reset = events.wait(room, since, timeout)
+    return jsonify({
+        'room': room,
+        'events': [{'seq': seq, 'event': event, 'data': data} for seq, event, data in missed],
+        'last_seq': events.last_seq(room),
+        'reset': reset
+    })
+
+@app.route('/api/events/bus-stats')
+def event_bus_stats():
+    """Queue depth, coalescing and backpressure counters of the event bus"""
+    return jsonify(event_bus.stats())
+
+@app.route('/api/admission/stats')
+def admission_stats():
+    """Rate limiter buckets and concurrency limiter occupancy"""
+    return jsonify({
+        'rate_limits': {endpoint: {'rate': rate, 'burst': burst} for endpoint, (rate, burst) in RATE_LIMITS.items()},
+        'rate_limiter': rate_limiter.stats(),
+        'concurrency': concurrency.stats() if concurrency is not None else None
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Latency histograms, emit counters and store sizes in Prometheus text format"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/metrics/slow')
+def get_slow_requests():
+    """Sampled stacks of recent requests slower than LOCALSERVE_PROFILE_SLOW_MS"""
+    if profiler is None:
+        return jsonify({'enabled': False, 'requests': []})
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'enabled': True,
+        'threshold_ms': profiler.threshold * 1000,
+        'slow': profiler.slow,
+        'requests': profiler.reports(limit)
+    })
+
+@app.route('/api/notifications')
+def get_notifications():
+    """Latest notifications for a provider_ or consumer_ room, newest first"""
+    room = request.args.get('room', 'provider_1')
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_NOTIFICATIONS))
+    matches = []
+    for notification in reversed(list(notifications)):
+        if notification['room'] == room:
+            matches.append(notification)
+            if len(matches) == limit:
+                break
+    return jsonify(matches)
+
 @app.route('/api/provider/earnings')
 def get_provider_earnings():
     """Get earnings data for charts"""
+    provider_id = request.args.get('provider_id', 1, type=int)
     period = request.args.get('period', 'weekly')
-    today = datetime.now()
+    today = datetime.now().date()
+    
+    if 'start' in request.args or 'end' in request.args:
+        return get_provider_earnings_range(provider_id, today)
     
     if period == 'weekly':
-        days = 7
-        data = []
-        for i in range(days):
-            date = today - timedelta(days=days-1-i)
-            date_str = date.strftime('%Y-%m-%d')
-            day_earnings = sum([e['amount'] for e in provider_earnings_history if e['date'] == date_str])
-            data.append({
-                'date': date.strftime('%a'),
-                'amount': day_earnings
-            })
+        data = [{
+            'date': day.strftime('%a'),
+            'amount': bucket['amount'] if bucket else 0
+        } for day, bucket in earnings_ledger.daily(provider_id, today - timedelta(days=6), today)]
     else:  # monthly
-        days = 30
-        data = []
-        for i in range(days):
-            date = today - timedelta(days=days-1-i)
-            date_str = date.strftime('%Y-%m-%d')
-            day_earnings = sum([e['amount'] for e in provider_earnings_history if e['date'] == date_str])
-            if day_earnings > 0:
-                data.append({
-                    'date': date.strftime('%d %b'),
-                    'amount': day_earnings
-                })
+        data = [{
+            'date': day.strftime('%d %b'),
+            'amount': bucket['amount']
+        } for day, bucket in earnings_ledger.daily(provider_id, today - timedelta(days=29), today)
+            if bucket and bucket['amount'] > 0]
     
-    total_today = sum([e['amount'] for e in provider_earnings_history if e['date'] == today.strftime('%Y-%m-%d')])
+    total_today = earnings_ledger.day_total(provider_id, today)
     total_period = sum([d['amount'] for d in data])
     
     return jsonify({
@@ -598,14 +1620,41 @@ def get_provider_earnings():
         'period': period
     })
 
+def get_provider_earnings_range(provider_id, today):
+    """Earnings between ?start= and ?end= (YYYY-MM-DD) at daily, weekly or monthly granularity"""
+    granularity = request.args.get('granularity', 'daily')
+    try:
+        end = parse_date(request.args['end']) if 'end' in request.args else today
+        start = parse_date(request.args['start']) if 'start' in request.args else end - timedelta(days=29)
+        if start > end or (end - start).days >= MAX_EARNINGS_RANGE_DAYS:
+            raise ValueError(f'start must not be after end and the range must be under {MAX_EARNINGS_RANGE_DAYS} days')
+        periods = earnings_ledger.series(provider_id, start, end, granularity)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    data = [{
+        'date': p['start'].isoformat(),
+        'amount': p['amount'],
+        'count': p['count'],
+        'services': p['services']
+    } for p in periods]
+    
+    return jsonify({
+        'data': data,
+        'total_period': sum([p['amount'] for p in periods]),
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity
+    })
+
 @app.route('/api/provider/stats')
 def get_provider_stats():
     """Get provider statistics"""
     provider_id = request.args.get('provider_id', 1, type=int)
-    provider = next((p for p in PROVIDERS if p['id'] == provider_id), PROVIDERS[0])
+    provider = providers_by_id.get(provider_id, PROVIDERS[0])
     
-    completed = [r for r in booking_history if r.get('provider_id') == provider_id]
-    total_earnings = sum([e['amount'] for e in provider_earnings_history])
+    completed = bookings.find(provider_id=provider_id, archived=True)
+    total_earnings = earnings_ledger.total(provider_id)
     avg_rating = provider['rating']
     
     service_counts = {}
@@ -619,6 +1668,7 @@ def get_provider_stats():
         'average_rating': avg_rating,
         'total_reviews': provider['reviews'],
         'service_breakdown': service_counts,
+        'service_earnings': earnings_ledger.service_totals(provider_id),
         'response_time': provider.get('response_time', '15 mins')
     })
 
@@ -629,15 +1679,18 @@ def provider_schedule_api():
     
     if request.method == 'POST':
         data = request.json
-        provider_schedule[provider_id] = data
-        
-        for provider in PROVIDERS:
-            if provider['id'] == provider_id:
-                provider['working_hours'] = {
-                    'start': data.get('start_time'),
-                    'end': data.get('end_time')
-                }
-                break
+        with state_write():
+            provider_schedule[provider_id] = data
+            availability.set_holidays(provider_id, data.get('holidays'))
+            journal_record('schedule', {'provider_id': provider_id, 'schedule': data})
+            
+            with provider_locks(provider_id):
+                if provider_id in providers_by_id:
+                    provider = replace_provider(provider_id, {'working_hours': {
+                        'start': data.get('start_time'),
+                        'end': data.get('end_time')
+                    }})
+                    journal_record('provider', provider)
         
         return jsonify({'success': True, 'message': 'Schedule updated'})
     
@@ -656,10 +1709,14 @@ def provider_profile_api():
     if request.method == 'PUT':
         data = request.json
         
-        for provider in PROVIDERS:
-            if provider['id'] == provider_id:
-                provider.update({
+        with state_write(), provider_locks(provider_id):
+            provider = providers_by_id.get(provider_id)
+            if provider:
+                provider = replace_provider(provider_id, {
                     'name': data.get('name', provider['name']),
+                    'service': data.get('service', provider['service']),
+                    'lat': float(data.get('lat', provider['lat'])),
+                    'lng': float(data.get('lng', provider['lng'])),
                     'phone': data.get('phone', provider['phone']),
                     'email': data.get('email', provider['email']),
                     'description': data.get('description', provider['description']),
@@ -667,18 +1724,124 @@ def provider_profile_api():
                     'services': data.get('services', provider['services']),
                     'bio': data.get('bio', provider.get('bio')),
                     'address': data.get('address', provider.get('address')),
-                    'years_experience': data.get('years_experience', provider.get('years_experience'))
+                    'years_experience': data.get('years_experience', provider.get('years_experience')),
+                    'languages': data.get('languages', provider.get('languages')),
+                    'certifications': data.get('certifications', provider.get('certifications'))
                 })
-                break
-        
-        if provider_id in provider_profiles:
-            provider_profiles[provider_id].update(data)
+                journal_record('provider', provider)
+            
+            if provider_id in provider_profiles:
+                provider_profiles[provider_id] = {**provider_profiles[provider_id], **data}
+                journal_record('profile', {'provider_id': provider_id, 'profile': provider_profiles[provider_id]})
         
         return jsonify({'success': True, 'message': 'Profile updated successfully'})
     
     profile = provider_profiles.get(provider_id, {})
     return jsonify(profile)
 
+def run_import(parse, ingest):
+    """Read an NDJSON body line by line, parse each line and ingest the valid records in batches
+
+    ``ingest`` takes a list of parsed records and returns [(position, error)]
+    for those it refused. Batches already ingested stay if a later line fails.
+    """
+    request.max_content_length = MAX_IMPORT_BYTES
+    batch_size = max(1, min(request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int), MAX_BATCH_SIZE))
+    summary = {'imported': 0, 'rejected': 0, 'batches': 0, 'errors': []}
+    
+    def reject(line, error):
+        summary['rejected'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line, 'error': error})
+    
+    def parsed():
+        for line, value, error in read_ndjson(request.stream):
+            if error is None:
+                try:
+                    yield line, parse(value)
+                    continue
+                except ValueError as e:
+                    error = str(e)
+            reject(line, error)
+    
+    for batch in batched(parsed(), batch_size):
+        refused = ingest([record for _, record in batch])
+        for position, error in refused:
+            reject(batch[position][0], error)
+        summary['imported'] += len(batch) - len(refused)
+        summary['batches'] += 1
+    summary['errors'].sort(key=lambda e: e['line'])
+    return jsonify({'success': True, **summary})
+
+def ingest_providers(batch):
+    # New providers take ids above every id in use across workers
+    with state_write():
+        journal_record('providers', import_providers(batch))
+    return []
+
+def parse_import_booking(value):
+    booking, archived = parse_booking(value)
+    error = details_error(booking)
+    if error:
+        raise ValueError(error)
+    booking.setdefault('timestamp', epoch_now())
+    return booking, archived
+
+def ingest_bookings(batch):
+    with state_write():
+        return import_bookings(batch)[1]
+
+@app.route('/api/import/providers', methods=['POST'])
+def import_providers_api():
+    """Add or update providers from an NDJSON body, one provider per line"""
+    return run_import(parse_provider, ingest_providers)
+
+@app.route('/api/import/bookings', methods=['POST'])
+def import_bookings_api():
+    """Add bookings from an NDJSON body, e.g. one written by /api/export/bookings"""
+    return run_import(parse_import_booking, ingest_bookings)
+
+@app.route('/api/export/providers')
+def export_providers():
+    """Stream every provider (or those of one ?service=) as NDJSON"""
+    service = (request.args.get('service') or '').lower()
+    
+    def providers():
+        # Walk by position so the export holds one provider at a time
+        position = 0
+        while position < len(PROVIDERS):
+            provider = PROVIDERS[position]
+            position += 1
+            if not service or provider['service'].lower() == service:
+                yield provider
+    
+    return Response(
+        stream_with_context(stream_ndjson(providers())),
+        mimetype=NDJSON_MIMETYPE,
+        headers={'Content-Disposition': 'attachment; filename=providers.ndjson'}
+    )
+
+@app.route('/api/export/bookings')
+def export_bookings():
+    """Stream bookings in id order as NDJSON, filtered by ?status=, provider_id=, customer_id=, archived="""
+    archived = request.args.get('archived')
+    archived = None if archived is None else archived.lower() == 'true'
+    criteria = {}
+    if request.args.get('status'):
+        criteria['status'] = request.args['status']
+    if request.args.get('provider_id'):
+        criteria['provider_id'] = request.args.get('provider_id', type=int)
+    if request.args.get('customer_id'):
+        criteria['customer_id'] = request.args['customer_id']
+    records = ({**booking.to_dict(), 'archived': bookings.is_archived(booking['id'])}
+               for booking in bookings.scan(archived, **criteria))
+    
+    return Response(
+        stream_with_context(stream_ndjson(records)),
+        mimetype=NDJSON_MIMETYPE,
+        headers={'Content-Disposition': 'attachment; filename=bookings.ndjson'}
+    )
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🚀 LocalServe Server Started!")
@@ -0,0 +1,211 @@
+import threading
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+# Length of a booking that does not say how long it takes
+DEFAULT_SLOT_MINUTES = 60
+# How far ahead next_free_slot looks before giving up
+SEARCH_HORIZON_DAYS = 60
+
+
+def parse_clock(value):
+    """'HH:MM' -> minutes after midnight"""
+    hours, minutes = value.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_slot_start(day, clock):
+    """Combine 'YYYY-MM-DD' and 'HH:MM' into a datetime"""
+    return datetime.combine(date.fromisoformat(day), datetime.min.time()) + timedelta(minutes=parse_clock(clock))
+
+
+def booking_slot(booking, explicit_only=False):
+    """(start, end) a booking occupies, or None when it has no usable time
+
+    A reschedule wins over the originally requested slot; without either,
+    an accepted booking is taken to start when it was accepted.
+    """
+    duration = timedelta(minutes=booking.get('duration_minutes') or DEFAULT_SLOT_MINUTES)
+    try:
+        if booking.get('rescheduled_date') and booking.get('rescheduled_time'):
+            start = parse_slot_start(booking['rescheduled_date'], booking['rescheduled_time'])
+        elif booking.get('scheduled_date') and booking.get('scheduled_time'):
+            start = parse_slot_start(booking['scheduled_date'], booking['scheduled_time'])
+        elif not explicit_only and booking.get('accepted_at'):
+            start = datetime.strptime(booking['accepted_at'], '%Y-%m-%d %H:%M:%S')
+        else:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return start, start + duration
+
+
+class ProviderCalendar:
+    __slots__ = ('open_minute', 'close_minute', 'holidays', 'starts', 'intervals', 'longest')
+
+    def __init__(self):
+        # Working hours as minutes after midnight; None means around the clock
+        self.open_minute = None
+        self.close_minute = None
+        self.holidays = set()
+        # Busy intervals sorted by start, with their starts kept alongside for bisect
+        self.starts = []
+        self.intervals = []
+        self.longest = timedelta(0)
+
+
+class AvailabilityIndex:
+    """Per-provider calendars of working hours, holidays and booked intervals.
+
+    Booked intervals are kept sorted by start time, so an overlap check is a
+    bisect plus a backwards scan bounded by the provider's longest booking,
+    i.e. O(log n) for realistic calendars, and booking or releasing a slot
+    is a bisect and a list insert/delete. ``next_free_slot`` hops from one
+    blocking interval's end to the next instead of stepping through time.
+    """
+
+    def __init__(self, horizon_days=SEARCH_HORIZON_DAYS):
+        self.horizon_days = horizon_days
+        self._calendars = {}
+        # booking_id -> (provider_id, start, end)
+        self._bookings = {}
+        self._lock = threading.Lock()
+
+    def _calendar(self, provider_id):
+        calendar = self._calendars.get(provider_id)
+        if calendar is None:
+            calendar = self._calendars[provider_id] = ProviderCalendar()
+        return calendar
+
+    # Updates
+
+    def set_hours(self, provider_id, hours):
+        """Working hours as {'start': 'HH:MM', 'end': 'HH:MM'}; end before start is an overnight shift"""
+        hours = hours or {}
+        with self._lock:
+            calendar = self._calendar(provider_id)
+            try:
+                calendar.open_minute = parse_clock(hours['start'])
+                calendar.close_minute = parse_clock(hours['end'])
+            except (KeyError, TypeError, ValueError, AttributeError):
+                calendar.open_minute = calendar.close_minute = None
+
+    def set_holidays(self, provider_id, holidays):
+        parsed = set()
+        for day in holidays or ():
+            try:
+                parsed.add(date.fromisoformat(day))
+            except (TypeError, ValueError):
+                continue
+        with self._lock:
+            self._calendar(provider_id).holidays = parsed
+
+    def book(self, provider_id, booking_id, start, end):
+        """Mark [start, end) busy for a booking, moving it if it was booked before"""
+        with self._lock:
+            self._book(provider_id, booking_id, start, end)
+
+    def claim(self, provider_id, booking_id, start, end):
+        """Book [start, end) if the provider is free then, as one step; returns False if not"""
+        with self._lock:
+            calendar = self._calendars.get(provider_id) or ProviderCalendar()
+            if not self._within_hours(calendar, start, end) or self._blocking(calendar, start, end, booking_id):
+                return False
+            self._book(provider_id, booking_id, start, end)
+            return True
+
+    def _book(self, provider_id, booking_id, start, end):
+        self._release(booking_id)
+        calendar = self._calendar(provider_id)
+        # Filed by the whole tuple, so _release finds it among intervals sharing a start
+        position = bisect_left(calendar.intervals, (start, end, booking_id))
+        calendar.starts.insert(position, start)
+        calendar.intervals.insert(position, (start, end, booking_id))
+        calendar.longest = max(calendar.longest, end - start)
+        self._bookings[booking_id] = (provider_id, start, end)
+
+    def release(self, booking_id):
+        with self._lock:
+            self._release(booking_id)
+
+    def _release(self, booking_id):
+        booked = self._bookings.pop(booking_id, None)
+        if booked is None:
+            return
+        provider_id, start, end = booked
+        calendar = self._calendars[provider_id]
+        position = bisect_left(calendar.intervals, (start, end, booking_id))
+        if position < len(calendar.intervals) and calendar.intervals[position][2] == booking_id:
+            del calendar.intervals[position]
+            del calendar.starts[position]
+
+    def sync(self, booking):
+        """Reflect a booking's current state: accepted bookings hold their slot, others free it"""
+        slot = booking_slot(booking) if booking.get('status') == 'accepted' else None
+        if slot is None or booking.get('provider_id') is None:
+            self.release(booking['id'])
+        else:
+            self.book(booking['provider_id'], booking['id'], *slot)
+
+    # Queries
+
+    def _shift(self, calendar, day):
+        """(open, close) of the shift starting on ``day``, or None on a holiday"""
+        if day in calendar.holidays:
+            return None
+        midnight = datetime.combine(day, datetime.min.time())
+        if calendar.open_minute is None:
+            return midnight, midnight + timedelta(days=1)
+        close_minute = calendar.close_minute
+        if close_minute <= calendar.open_minute:
+            close_minute += 24 * 60
+        return midnight + timedelta(minutes=calendar.open_minute), midnight + timedelta(minutes=close_minute)
+
+    def _within_hours(self, calendar, start, end):
+        for day in (start.date() - timedelta(days=1), start.date()):
+            shift = self._shift(calendar, day)
+            if shift and shift[0] <= start and end <= shift[1]:
+                return True
+        return False
+
+    @staticmethod
+    def _blocking(calendar, start, end, ignore=None):
+        """Latest-ending booked interval overlapping [start, end), or None"""
+        position = bisect_left(calendar.starts, end)
+        earliest = start - calendar.longest
+        blocking = None
+        while position > 0:
+            position -= 1
+            interval = calendar.intervals[position]
+            if interval[0] < earliest:
+                break
+            if interval[1] > start and interval[2] != ignore:
+                if blocking is None or interval[1] > blocking[1]:
+                    blocking = interval
+        return blocking
+
+    def is_free(self, provider_id, start, end, ignore=None):
+        """Whether the provider works and has nothing booked in [start, end); ``ignore`` skips a booking id"""
+        with self._lock:
+            calendar = self._calendars.get(provider_id) or ProviderCalendar()
+            return self._within_hours(calendar, start, end) and self._blocking(calendar, start, end, ignore) is None
+
+    def next_free_slot(self, provider_id, after, duration, ignore=None):
+        """Earliest start >= ``after`` with ``duration`` free inside working hours, or None"""
+        with self._lock:
+            calendar = self._calendars.get(provider_id) or ProviderCalendar()
+            day = after.date() - timedelta(days=1)
+            last_day = after.date() + timedelta(days=self.horizon_days)
+            candidate = after
+            while day <= last_day:
+                shift = self._shift(calendar, day)
+                day += timedelta(days=1)
+                if shift is None:
+                    continue
+                candidate = max(candidate, shift[0])
+                while candidate + duration <= shift[1]:
+                    blocking = self._blocking(calendar, candidate, candidate + duration, ignore)
+                    if blocking is None:
+                        return candidate
+                    candidate = blocking[1]
+            return None
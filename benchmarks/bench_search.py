@@ -0,0 +1,99 @@
+"""Compare the /api/search linear scan with GeoIndex and CoordinateStore lookups.
+
+Run from the repository root:
+
+    python benchmarks/bench_search.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coord_store import CoordinateStore  # noqa: E402
+from geo_index import GeoIndex, calculate_distance  # noqa: E402
+
+CENTER_LAT, CENTER_LNG = 12.9716, 77.5946
+SERVICES = ['Electrician', 'Plumber', 'Carpenter', 'Painter', 'Cleaner']
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 200
+RADII = [1.0, 1.5, 2.0, 3.0, 5.0]
+
+
+def make_providers(n, rng):
+    return [{
+        'id': i + 1,
+        'service': rng.choice(SERVICES),
+        # Roughly a 40 km x 40 km metro area
+        'lat': CENTER_LAT + rng.uniform(-0.18, 0.18),
+        'lng': CENTER_LNG + rng.uniform(-0.18, 0.18),
+    } for i in range(n)]
+
+
+def linear_search(providers, service, lat, lng, radius):
+    results = []
+    for provider in providers:
+        if service and provider['service'].lower() != service.lower():
+            continue
+        distance = calculate_distance(lat, lng, provider['lat'], provider['lng'])
+        if distance <= radius:
+            provider_copy = provider.copy()
+            provider_copy['distance'] = distance
+            results.append(provider_copy)
+    results.sort(key=lambda x: x['distance'])
+    return results
+
+
+def index_search(index, service, lat, lng, radius):
+    results = []
+    for distance, provider in index.query(lat, lng, radius, service):
+        provider_copy = provider.copy()
+        provider_copy['distance'] = distance
+        results.append(provider_copy)
+    return results
+
+
+def run(n):
+    rng = random.Random(n)
+    providers = make_providers(n, rng)
+
+    start = time.perf_counter()
+    index = GeoIndex()
+    index.rebuild(providers)
+    build_time = time.perf_counter() - start
+    coords = CoordinateStore()
+    coords.rebuild(providers)
+
+    queries = [(rng.choice(SERVICES + ['']),
+                CENTER_LAT + rng.uniform(-0.1, 0.1),
+                CENTER_LNG + rng.uniform(-0.1, 0.1),
+                rng.choice(RADII)) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    expected = [linear_search(providers, *q) for q in queries]
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [index_search(index, *q) for q in queries]
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = coords.nearest_many([(lat, lng, radius, service, None)
+                                   for service, lat, lng, radius in queries])
+    numpy_time = time.perf_counter() - start
+
+    for want, got in zip(expected, actual):
+        assert sorted(p['id'] for p in want) == sorted(p['id'] for p in got)
+
+    print(f"{n:>8,} providers | build {build_time * 1000:8.1f} ms | "
+          f"linear {linear_time / QUERIES * 1000:8.3f} ms/query | "
+          f"index {index_time / QUERIES * 1000:8.3f} ms/query | "
+          f"numpy batch {numpy_time / QUERIES * 1000:8.3f} ms/query | "
+          f"index speedup {linear_time / index_time:6.1f}x")
+    assert sum(len(r) for r in batched) > 0
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        run(size)
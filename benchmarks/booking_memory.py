@@ -0,0 +1,119 @@
+"""Memory held by N bookings as plain dicts versus BookingRecord slots.
+
+Each variant is built in a fresh interpreter, so the resident set size
+growth it reports is the cost of the bookings alone. Bookings look like
+what the app keeps after a completed, paid and rated job: around thirty
+fields with five timestamps.
+
+Run from the repository root:
+
+    python benchmarks/booking_memory.py [--count 1000000]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVICES = ['Repair', 'Installation', 'Products', 'Wiring', 'Pipe Fitting', 'Tank Cleaning']
+STAMP = '%Y-%m-%d %H:%M:%S'
+
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def booking(i, rng, start):
+    """A completed booking shaped like the app's, with the timestamps as formatted strings"""
+    created = start + timedelta(seconds=i * 7)
+    return {
+        'id': i,
+        'customer_name': f'Customer {rng.randrange(50_000)}',
+        'customer_id': f'consumer_{rng.randrange(50_000)}',
+        'provider_id': rng.randrange(1, 5_000),
+        'provider_ids': None,
+        'provider_name': None,
+        'service_type': rng.choice(SERVICES),
+        'service': None,
+        'distance': round(rng.uniform(0.1, 10), 2),
+        'budget': None,
+        'details': 'Service requested',
+        'customer_phone': '+91 99999 99999',
+        'customer_lat': 12.9 + rng.random() / 10,
+        'customer_lng': 77.5 + rng.random() / 10,
+        'scheduled_date': None,
+        'scheduled_time': None,
+        'duration_minutes': None,
+        'timestamp': created.strftime(STAMP),
+        'time_ago': 'Just now',
+        'status': 'accepted',
+        'job_status': 'completed',
+        'payment_status': 'paid',
+        'rating': rng.randint(1, 5),
+        'review': 'No review provided',
+        'can_cancel': False,
+        'can_reschedule': True,
+        'accepted_at': (created + timedelta(minutes=5)).strftime(STAMP),
+        'completed_at': (created + timedelta(hours=2)).strftime(STAMP),
+        'payment_amount': rng.randrange(300, 3000),
+        'payment_at': (created + timedelta(hours=2, minutes=5)).strftime(STAMP),
+        'receipt_id': f'RCP{i}{created.strftime("%Y%m%d%H%M")}',
+        'rated_at': (created + timedelta(days=1)).strftime(STAMP),
+    }
+
+
+def measure(variant, count):
+    """Build ``count`` bookings in this process; returns (KiB retained, seconds)"""
+    from records import BookingRecord
+
+    # Status strings arrive from JSON/HTTP as fresh objects, not code literals
+    def fresh(value):
+        return value if not isinstance(value, str) else (value + '.')[:-1]
+
+    rng = random.Random(1)
+    start = datetime(2025, 1, 1)
+    before = rss_kb()
+    started = time.perf_counter()
+    kept = []
+    for i in range(count):
+        data = {key: fresh(value) for key, value in booking(i, rng, start).items()}
+        kept.append(BookingRecord(data) if variant == 'records' else data)
+    elapsed = time.perf_counter() - started
+    return rss_kb() - before, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--variant', choices=('dicts', 'records'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        retained, elapsed = measure(args.variant, args.count)
+        print(retained, elapsed)
+        return
+
+    print(f'{args.count:,} bookings')
+    print(f'{"variant":>8} {"RSS MiB":>9} {"bytes/booking":>14} {"build s":>8}')
+    results = {}
+    for variant in ('dicts', 'records'):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--count', str(args.count),
+                                 '--variant', variant], check=True, capture_output=True, text=True).stdout
+        retained, elapsed = output.split()
+        results[variant] = int(retained)
+        print(f'{variant:>8} {int(retained) / 1024:>9.1f} {int(retained) * 1024 / args.count:>14.0f} '
+              f'{float(elapsed):>8.1f}')
+    print(f'records use {results["records"] / results["dicts"]:.0%} of the dict footprint')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""Synthetic LocalServe data at realistic scale for benchmarks.
+
+Providers cluster around Bangalore neighbourhoods, ratings lean high,
+a few popular providers and repeat customers take most of the bookings,
+requests peak in the morning and evening, and most bookings run the whole
+way through to a paid, rated job. Everything is drawn from a seeded RNG,
+so the same arguments always give the same data.
+
+    from benchmarks.datagen import generate, load
+    data = generate(providers=5_000, bookings=200_000, messages=500_000)
+    load(app, data)          # app is the imported app module
+
+or, to eyeball the distributions:
+
+    python benchmarks/datagen.py --providers 1000 --bookings 10000
+"""
+import argparse
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+# (name, lat, lng, spread in degrees) of the neighbourhoods providers work from
+LOCALITIES = [
+    ('Indiranagar', 12.9719, 77.6412, 0.012),
+    ('Koramangala', 12.9352, 77.6245, 0.014),
+    ('Whitefield', 12.9698, 77.7500, 0.025),
+    ('Jayanagar', 12.9250, 77.5938, 0.013),
+    ('Malleshwaram', 13.0031, 77.5643, 0.010),
+    ('HSR Layout', 12.9116, 77.6474, 0.012),
+    ('Hebbal', 13.0358, 77.5970, 0.015),
+    ('Electronic City', 12.8452, 77.6602, 0.020),
+    ('Rajajinagar', 12.9916, 77.5544, 0.011),
+    ('MG Road', 12.9756, 77.6066, 0.008),
+]
+SERVICES = {
+    'Electrician': (['Installation', 'Repair', 'Products', 'Wiring', 'Appliance Repair', 'Industrial Wiring'],
+                    ['Licensed Electrician', 'Safety Certified', 'Master Electrician']),
+    'Plumber': (['Repair', 'Installation', 'Pipe Fitting', 'Tank Cleaning', 'Leak Detection'],
+                ['Certified Plumber', 'Gas Fitting']),
+    'Carpenter': (['Furniture Repair', 'Modular Kitchen', 'Door Fitting', 'Polishing'],
+                  ['Woodwork Certified']),
+    'Painter': (['Interior Painting', 'Exterior Painting', 'Waterproofing', 'Texture'],
+                ['Asian Paints Certified']),
+    'Cleaner': (['Deep Cleaning', 'Sofa Cleaning', 'Bathroom Cleaning', 'Pest Control'],
+                ['Hygiene Certified']),
+}
+LANGUAGES = ['English', 'Hindi', 'Kannada', 'Tamil', 'Telugu', 'Malayalam']
+# Share of bookings ending in each state
+OUTCOMES = [('rated', 0.62), ('paid', 0.08), ('completed', 0.04), ('in_progress', 0.04), ('accepted', 0.06),
+            ('pending', 0.08), ('cancelled', 0.05), ('rejected', 0.03)]
+# Relative request volume per hour of day
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 12, 14, 12, 10, 9, 8, 8, 9, 11, 14, 15, 12, 8, 5, 3, 2]
+STAMP = '%Y-%m-%d %H:%M:%S'
+PHRASES = ['On my way', 'Reached the gate', 'Can you share the flat number?', 'Please bring spare parts',
+           'Running 10 minutes late', 'Thanks, see you soon', 'What time works for you?', 'Done, please check']
+
+
+def _provider(provider_id, rng):
+    locality, lat, lng, spread = rng.choice(LOCALITIES)
+    service = rng.choices(list(SERVICES), weights=[30, 25, 15, 15, 15])[0]
+    sub_services, certifications = SERVICES[service]
+    low = rng.choice(range(200, 1500, 50))
+    years = rng.randint(1, 25)
+    start_hour = rng.choice([6, 7, 8, 9, 10])
+    return {
+        'id': provider_id,
+        'name': f'{locality} {service} {provider_id}',
+        'service': service,
+        # Ratings lean high: most providers sit between 4 and 5 stars
+        'rating': round(min(5.0, max(1.0, rng.betavariate(8, 1.6) * 5)), 1),
+        'reviews': int(rng.lognormvariate(3.5, 1.0)),
+        'lat': rng.gauss(lat, spread),
+        'lng': rng.gauss(lng, spread),
+        'price': f'₹{low}-{low + rng.choice(range(200, 1200, 100))}',
+        'phone': f'+91 9{rng.randrange(10 ** 9):09d}',
+        'email': f'provider{provider_id}@example.com',
+        'services': rng.sample(sub_services, rng.randint(2, len(sub_services))),
+        'working_hours': {'start': f'{start_hour:02d}:00', 'end': f'{start_hour + rng.choice([8, 9, 10, 12]):02d}:00'},
+        'availability': 'available' if rng.random() < 0.9 else 'busy',
+        'profile_image': 'https://via.placeholder.com/150',
+        'description': f'{service} serving {locality} and nearby areas',
+        'certifications': rng.sample(certifications, rng.randint(0, len(certifications))),
+        'completed_jobs': int(rng.lognormvariate(4, 0.8)),
+        'response_time': f'{rng.choice([5, 10, 15, 20, 30])} mins',
+        'bio': f'{years} years of {service.lower()} work around {locality}',
+        'address': f'{locality}, Bangalore',
+        'years_experience': years,
+        'languages': ['English'] + rng.sample(LANGUAGES[1:], rng.randint(0, 3)),
+        'gallery': ['https://via.placeholder.com/400x300'] * rng.randint(0, 4),
+    }
+
+
+def _request_time(rng, now, days):
+    day = now - timedelta(days=int(rng.random() ** 1.5 * days))
+    hour = rng.choices(range(24), weights=HOURLY_WEIGHTS)[0]
+    moment = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60), microsecond=0)
+    return min(moment, now - timedelta(minutes=1))
+
+
+def _booking(booking_id, provider, customer, rng, now, days):
+    created = _request_time(rng, now, days)
+    outcome = rng.choices([o for o, _ in OUTCOMES], weights=[w for _, w in OUTCOMES])[0]
+    booking = {
+        'id': booking_id,
+        'customer_name': f'Customer {customer}',
+        'customer_id': f'consumer_{customer}',
+        'provider_id': provider['id'],
+        'provider_ids': None,
+        'provider_name': provider['name'],
+        'service_type': rng.choice(provider['services']),
+        'service': provider['service'],
+        'distance': round(rng.uniform(0.2, 8), 2),
+        'budget': None,
+        'details': 'Service requested',
+        'customer_phone': '+91 99999 99999',
+        'customer_lat': provider['lat'] + rng.gauss(0, 0.02),
+        'customer_lng': provider['lng'] + rng.gauss(0, 0.02),
+        'scheduled_date': None,
+        'scheduled_time': None,
+        'duration_minutes': None,
+        'timestamp': created.strftime(STAMP),
+        'time_ago': 'Just now',
+        'status': 'pending',
+        'job_status': None,
+        'payment_status': 'unpaid',
+        'rating': None,
+        'review': None,
+        'can_cancel': True,
+        'can_reschedule': False,
+    }
+    if outcome in ('cancelled', 'rejected'):
+        booking['status'] = outcome
+        booking['can_cancel'] = False
+        if outcome == 'cancelled':
+            booking['cancellation_reason'] = 'Plans changed'
+            booking['cancelled_at'] = (created + timedelta(minutes=rng.randint(1, 120))).strftime(STAMP)
+        return booking, False
+    if outcome == 'pending':
+        return booking, False
+
+    accepted = created + timedelta(minutes=rng.randint(1, 30))
+    booking.update(status='accepted', job_status='accepted', accepted_at=accepted.strftime(STAMP),
+                   can_cancel=False, can_reschedule=True)
+    if outcome == 'accepted':
+        return booking, False
+    booking['job_status'] = 'in_progress'
+    if outcome == 'in_progress':
+        return booking, False
+    completed = accepted + timedelta(minutes=rng.randint(30, 240))
+    booking.update(job_status='completed', completed_at=completed.strftime(STAMP))
+    if outcome == 'completed':
+        return booking, False
+    paid = completed + timedelta(minutes=rng.randint(1, 60))
+    booking.update(payment_status='paid', payment_amount=rng.choice(range(300, 5000, 50)),
+                   payment_at=paid.strftime(STAMP), receipt_id=f'RCP{booking_id}{paid.strftime("%Y%m%d%H%M")}')
+    if outcome == 'paid':
+        return booking, False
+    rating = rng.choices([1, 2, 3, 4, 5], weights=[2, 3, 8, 30, 57])[0]
+    booking.update(rating=rating, review=rng.choice(['Great work', 'On time and tidy', 'Okay', 'Would hire again',
+                                                     'Took longer than expected', 'No review provided']),
+                   rated_at=(paid + timedelta(hours=rng.randint(1, 48))).strftime(STAMP))
+    return booking, True
+
+
+def generate(providers=1_000, bookings=20_000, messages=50_000, days=365, customers=None, seed=42, now=None):
+    """Return {'providers', 'bookings': [(booking, archived)], 'messages', 'earnings'} as plain dicts"""
+    rng = random.Random(seed)
+    now = (now or datetime.now()).replace(microsecond=0)
+    customers = customers or max(1, bookings // 4)
+
+    provider_list = [_provider(i + 1, rng) for i in range(providers)]
+    # A few popular providers and repeat customers take most of the traffic
+    provider_weights = [rng.lognormvariate(0, 1.0) for _ in provider_list]
+    customer_weights = [rng.lognormvariate(0, 1.2) for _ in range(customers)]
+
+    booking_list = []
+    chosen_providers = rng.choices(provider_list, weights=provider_weights, k=bookings)
+    chosen_customers = rng.choices(range(1, customers + 1), weights=customer_weights, k=bookings)
+    for i in range(bookings):
+        booking_list.append(_booking(i + 1, chosen_providers[i], chosen_customers[i], rng, now, days))
+
+    # Chats belong to bookings a provider has accepted; ids rise with time per conversation
+    chatty = [b for b, _ in booking_list if b.get('accepted_at')] or [b for b, _ in booking_list]
+    per_booking = Counter(rng.choices(range(len(chatty)), k=messages)) if chatty else Counter()
+    message_list = []
+    for index in sorted(per_booking):
+        booking = chatty[index]
+        at = datetime.strptime(booking.get('accepted_at') or booking['timestamp'], STAMP)
+        for _ in range(per_booking[index]):
+            at += timedelta(seconds=rng.randint(10, 900))
+            message_list.append({
+                'id': len(message_list) + 1,
+                'request_id': booking['id'],
+                'sender': rng.choice(['consumer', 'provider']),
+                'message': rng.choice(PHRASES),
+                'timestamp': at.strftime(STAMP),
+            })
+
+    earnings = []
+    for booking, _ in booking_list:
+        if booking.get('payment_at'):
+            earnings.append({'provider_id': booking['provider_id'], 'date': booking['payment_at'][:10],
+                             'amount': booking['payment_amount'], 'service': booking['service_type'],
+                             'entry_id': f'payment-{booking["id"]}'})
+    return {'providers': provider_list, 'bookings': booking_list, 'messages': message_list, 'earnings': earnings}
+
+
+def load(app, data):
+    """Replay generated data into an imported app module through its journal record handlers"""
+    for provider in data['providers']:
+        app.apply_journal_record('provider', provider)
+    for booking, archived in data['bookings']:
+        app.apply_journal_record('booking', {'booking': booking, 'archived': archived})
+    for message in data['messages']:
+        app.apply_journal_record('message', message)
+    for entry in data['earnings']:
+        app.apply_journal_record('earning', entry)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--providers', type=int, default=1_000)
+    parser.add_argument('--bookings', type=int, default=20_000)
+    parser.add_argument('--messages', type=int, default=50_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    data = generate(args.providers, args.bookings, args.messages, args.days, seed=args.seed)
+    bookings = [b for b, _ in data['bookings']]
+    print(f"{len(data['providers']):,} providers, {len(bookings):,} bookings, "
+          f"{len(data['messages']):,} messages, {len(data['earnings']):,} payments")
+    print('services     ', dict(Counter(p['service'] for p in data['providers'])))
+    print('statuses     ', dict(Counter((b['status'], b['job_status'], b['payment_status']) for b in bookings)))
+    print('ratings      ', dict(sorted(Counter(b['rating'] for b in bookings if b['rating']).items())))
+    busiest = Counter(b['provider_id'] for b in bookings).most_common(5)
+    print('busiest      ', busiest)
+    print('peak hours   ', Counter(int(b['timestamp'][11:13]) for b in bookings).most_common(4))
+
+
+if __name__ == '__main__':
+    main()
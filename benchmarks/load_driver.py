@@ -0,0 +1,305 @@
+"""End-to-end load driver replaying the LocalServe page workflows.
+
+Seeds a fresh shared log with generated data (benchmarks/datagen.py), starts
+serve.py on it and runs simulated users for a fixed time:
+
+* searchers (search.html): load map markers, search, widen the radius while
+  nothing is found, request the nearest provider, poll the request status
+* providers (provider_dashboard.html): load the request feed, delta-poll it,
+  accept requests and walk jobs to completed, load stats and earnings
+* consumers (consumer_bookings.html): list bookings, pay finished jobs,
+  fetch receipts, rate paid jobs and read chats
+
+Each HTTP call is timed per operation and reported with p50/p99 and overall
+throughput. When the python-socketio client (with websocket-client) is
+installed, consumers also hold a Socket.IO connection and the driver reports
+how long 'request_accepted' takes to arrive after a provider accepts.
+
+Run from the repository root:
+
+    python benchmarks/load_driver.py [--workers 2] [--seconds 30] [--users 24]
+    python benchmarks/load_driver.py --url http://127.0.0.1:5000   # existing server, no seeding
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import LOCALITIES, generate  # noqa: E402
+from load_workers import free_port, start_server  # noqa: E402
+
+# Share of simulated users playing each page
+ROLE_MIX = {'searcher': 0.4, 'provider': 0.3, 'consumer': 0.3}
+# Think time between a user's actions, in seconds
+THINK_SECONDS = (0.05, 0.3)
+RADII = [1.0, 1.5, 2.0, 3.0, 5.0]
+
+
+class Recorder:
+    """Latency samples per operation plus error counts, shared by all users"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, ok=True):
+        with self.lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+    def report(self, elapsed):
+        def pct(values, fraction):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+        total = sum(len(v) for name, v in self.samples.items() if not name.startswith('socket '))
+        print(f'{"operation":<34} {"count":>7} {"err":>5} {"p50 ms":>9} {"p99 ms":>9}')
+        for name in sorted(self.samples):
+            values = self.samples[name]
+            print(f'{name:<34} {len(values):>7} {self.errors[name]:>5} {pct(values, 0.5):>9.1f} '
+                  f'{pct(values, 0.99):>9.1f}')
+        print(f'{total:,} HTTP requests in {elapsed:.1f}s = {total / elapsed:,.0f} req/s')
+
+
+class Client:
+    def __init__(self, base, recorder):
+        self.base = base
+        self.recorder = recorder
+
+    def call(self, name, method, path, body=None):
+        """Timed request; returns (json body, headers), or (None, {}) on failure"""
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                payload = response.read()
+                headers = response.headers
+            self.recorder.add(name, time.perf_counter() - started)
+            return json.loads(payload or b'null'), headers
+        except (urllib.error.URLError, OSError, ValueError):
+            self.recorder.add(name, time.perf_counter() - started, ok=False)
+            return None, {}
+
+
+class Shared:
+    """State the simulated users hand each other"""
+
+    def __init__(self, providers, customers):
+        self.providers = providers
+        self.customers = customers
+        # Providers that just received a request, so provider users poll busy feeds
+        self.requested = deque(maxlen=500)
+        # request_id -> perf_counter time the accept was sent
+        self.accepted_at = {}
+
+
+def searcher(client, shared, rng, deadline):
+    customer = rng.choice(shared.customers)
+    _, lat, lng, spread = rng.choice(LOCALITIES)
+    lat, lng = rng.gauss(lat, spread), rng.gauss(lng, spread)
+    client.call('GET providers (markers)', 'GET', '/api/providers?fields=id,name,service,rating,lat,lng')
+    while time.time() < deadline:
+        service = rng.choice(['', 'Electrician', 'Plumber', 'Carpenter', 'Painter', 'Cleaner'])
+        found = []
+        for radius in RADII:
+            result, _ = client.call('GET search', 'GET', f'/api/search?service={service}&lat={lat}&lng={lng}'
+                                                          f'&radius={radius}')
+            found = (result or {}).get('providers') or []
+            if found:
+                break
+        if found:
+            provider = found[0]
+            result, _ = client.call('POST booking/request', 'POST', '/api/booking/request', {
+                'provider_id': provider['id'], 'provider_name': provider['name'],
+                'service_type': provider['service'], 'customer_id': customer,
+                'customer_name': customer, 'customer_lat': lat, 'customer_lng': lng,
+                'distance': provider['distance']
+            })
+            if result and result.get('request_id'):
+                shared.requested.append(provider['id'])
+                for _ in range(3):
+                    time.sleep(rng.uniform(*THINK_SECONDS))
+                    client.call('GET check-status', 'GET', f'/api/consumer/check-status/{result["request_id"]}')
+        time.sleep(rng.uniform(*THINK_SECONDS))
+
+
+def provider(client, shared, rng, deadline):
+    provider_id = shared.requested[-1] if shared.requested else rng.choice(shared.providers)
+    feed = f'/api/provider/requests?provider_id={provider_id}'
+    requests, headers = client.call('GET provider/requests', 'GET', feed)
+    seq = int(headers.get('X-Feed-Seq', 0)) if headers else 0
+    pending = {r['id'] for r in requests or [] if r.get('status') == 'pending'}
+    rounds = 0
+    while time.time() < deadline:
+        delta, _ = client.call('GET provider/requests?since', 'GET', f'{feed}&since={seq}')
+        if delta:
+            seq = delta['seq']
+            pending.update(r['id'] for r in delta['upserted'] if r.get('status') == 'pending')
+            pending.difference_update(delta['removed'])
+        for request_id in list(pending)[:2]:
+            pending.discard(request_id)
+            shared.accepted_at[request_id] = time.perf_counter()
+            result, _ = client.call('POST accept-request', 'POST', '/api/provider/accept-request',
+                                    {'request_id': request_id, 'provider_id': provider_id})
+            if result and result.get('success'):
+                for status in ('in_progress', 'completed'):
+                    client.call('POST job/update-status', 'POST', '/api/job/update-status',
+                                {'request_id': request_id, 'status': status})
+        rounds += 1
+        if rounds % 10 == 0:
+            client.call('GET provider/stats', 'GET', f'/api/provider/stats?provider_id={provider_id}')
+            client.call('GET provider/earnings', 'GET', f'/api/provider/earnings?provider_id={provider_id}'
+                                                        f'&period={rng.choice(["weekly", "monthly"])}')
+        if not pending and shared.requested:
+            provider_id = rng.choice(shared.requested)
+            feed = f'/api/provider/requests?provider_id={provider_id}'
+            _, headers = client.call('GET provider/requests', 'GET', feed)
+            seq = int(headers.get('X-Feed-Seq', 0)) if headers else seq
+        time.sleep(rng.uniform(*THINK_SECONDS))
+
+
+def consumer(client, shared, rng, deadline, recorder):
+    customer = rng.choice(shared.customers)
+    socket = connect_socket(client.base, customer, shared, recorder)
+    try:
+        while time.time() < deadline:
+            bookings, _ = client.call('GET my-bookings', 'GET', f'/api/consumer/my-bookings?customer_id={customer}'
+                                                                 f'&limit=100')
+            for booking in (bookings or [])[:20]:
+                if booking.get('job_status') == 'completed' and booking.get('payment_status') != 'paid':
+                    client.call('POST payment/process', 'POST', '/api/payment/process',
+                                {'request_id': booking['id'], 'amount': rng.choice(range(300, 3000, 50)),
+                                 'method': 'upi'})
+                    client.call('GET payment/receipt', 'GET', f'/api/payment/receipt/{booking["id"]}')
+                elif booking.get('payment_status') == 'paid' and booking.get('rating') is None:
+                    client.call('POST rating/submit', 'POST', '/api/rating/submit',
+                                {'request_id': booking['id'], 'rating': rng.choice([3, 4, 5, 5]),
+                                 'review': 'Load test'})
+                elif booking.get('status') == 'accepted' and rng.random() < 0.2:
+                    client.call('GET messages', 'GET', f'/api/messages/{booking["id"]}')
+            time.sleep(rng.uniform(*THINK_SECONDS) * 4)
+    finally:
+        if socket is not None:
+            socket.disconnect()
+
+
+def connect_socket(base, customer, shared, recorder):
+    """Socket.IO connection timing request_accepted delivery; None when the client is unavailable"""
+    try:
+        import socketio
+        import websocket  # noqa: F401  websocket transport for the client
+    except ImportError:
+        return None
+    try:
+        sio = socketio.Client(reconnection=False)
+
+        @sio.on('request_accepted')
+        def on_accepted(data):
+            sent = shared.accepted_at.get(data.get('request_id'))
+            if sent is not None:
+                recorder.add('socket request_accepted delay', time.perf_counter() - sent)
+
+        sio.connect(base, transports=['websocket'], wait_timeout=10)
+        sio.emit('join_consumer', {'consumer_id': customer})
+        return sio
+    except Exception:
+        return None
+
+
+def seed(shared_db, data):
+    """Write generated data into a fresh shared log so every worker recovers it on start"""
+    from persistence import SharedLog
+
+    log = SharedLog(shared_db, worker_id='seed')
+    log.recover(lambda op, payload: None)
+    with log.write():
+        for provider_data in data['providers']:
+            log.record('provider', provider_data)
+        for booking, archived in data['bookings']:
+            log.record('booking', {'booking': booking, 'archived': archived})
+        for message in data['messages']:
+            log.record('message', message)
+        for entry in data['earnings']:
+            log.record('earning', entry)
+    log.close()
+
+
+def drive(base, users, seconds, seed_value, customers, provider_ids):
+    recorder = Recorder()
+    shared = Shared(provider_ids, customers)
+    deadline = time.time() + seconds
+    threads = []
+    # Spread roles by ROLE_MIX so even a handful of users covers every page
+    roles = [role for role, share in ROLE_MIX.items() for _ in range(max(1, round(share * users)))]
+    for index in range(users):
+        role = roles[index % len(roles)]
+        user_rng = random.Random(seed_value * 1000 + index)
+        client = Client(base, recorder)
+        if role == 'searcher':
+            target, args = searcher, (client, shared, user_rng, deadline)
+        elif role == 'provider':
+            target, args = provider, (client, shared, user_rng, deadline)
+        else:
+            target, args = consumer, (client, shared, user_rng, deadline, recorder)
+        threads.append(threading.Thread(target=target, args=args, daemon=True))
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(seconds + 60)
+    recorder.report(time.time() - started)
+    if not any(name.startswith('socket ') for name in recorder.samples):
+        print('(no Socket.IO timings: install python-socketio[client] to measure event delivery)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='drive an already running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--users', type=int, default=24)
+    parser.add_argument('--providers', type=int, default=2_000)
+    parser.add_argument('--bookings', type=int, default=50_000)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.url:
+        providers = [p['id'] for p in json.loads(urllib.request.urlopen(args.url + '/api/providers?fields=id').read())]
+        drive(args.url, args.users, args.seconds, args.seed, ['consumer_1'], providers)
+        return
+
+    data = generate(args.providers, args.bookings, args.messages, seed=args.seed)
+    customers = sorted({b['customer_id'] for b, _ in data['bookings']})
+    with tempfile.TemporaryDirectory() as tmp:
+        shared_db = os.path.join(tmp, 'shared.db')
+        started = time.time()
+        seed(shared_db, data)
+        port = free_port()
+        server = start_server(args.workers, port, shared_db)
+        print(f'{args.workers} workers, {args.users} users, {args.providers:,} providers, '
+              f'{args.bookings:,} bookings, {args.messages:,} messages (ready in {time.time() - started:.1f}s)')
+        try:
+            drive(f'http://127.0.0.1:{port}', args.users, args.seconds, args.seed, customers,
+                  [p['id'] for p in data['providers']])
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Load test serve.py at increasing worker counts.
+
+Starts the server with 1, 2 and 4 workers (each run on a fresh shared
+database), drives it with a mix of provider feed reads and booking writes
+from several client processes, and reports throughput. Afterwards it checks
+that every booking created through any worker got a distinct id and is
+visible from the cluster, i.e. that state really is shared.
+
+Run from the repository root:
+
+    python benchmarks/load_workers.py [--workers 1 2 4] [--seconds 10]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVIDER_IDS = [1, 2, 3]
+# Share of requests that create a booking; the rest read a provider feed
+WRITE_RATIO = 0.2
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, port, shared_db):
+    # Every simulated client shares one address, so per-client rate limits are off
+    env = dict(os.environ, LOCALSERVE_DATA_DIR='', LOCALSERVE_RATE_LIMITS='off')
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), '--workers', str(workers),
+                               '--host', '127.0.0.1', '--port', str(port), '--shared-db', shared_db],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            # One probe per worker so every process has finished importing
+            for _ in range(workers * 2):
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/api/providers', timeout=5).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('server did not start')
+
+
+def request(base, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read() or b'null')
+
+
+def drive(base, seconds, threads, seed):
+    """One client process: ``threads`` loops issuing requests until the deadline"""
+    def loop(index):
+        rng = random.Random(seed * 1000 + index)
+        done, created = 0, []
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            provider_id = rng.choice(PROVIDER_IDS)
+            if rng.random() < WRITE_RATIO:
+                result = request(base, 'POST', '/api/booking/request', {
+                    'provider_id': provider_id,
+                    'service_type': 'Repair',
+                    'customer_id': f'load_{seed}_{index}',
+                    'customer_name': 'Load Test'
+                })
+                created.append(result['request_id'])
+            else:
+                request(base, 'GET', f'/api/provider/requests?provider_id={provider_id}')
+            done += 1
+        return done, created
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(loop, range(threads)))
+    return sum(done for done, _ in results), [i for _, created in results for i in created]
+
+
+def run(workers, seconds, clients, threads):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(workers, port, os.path.join(tmp, 'shared.db'))
+        base = f'http://127.0.0.1:{port}'
+        try:
+            started = time.time()
+            with ProcessPoolExecutor(clients) as pool:
+                results = list(pool.map(drive, [base] * clients, [seconds] * clients,
+                                        [threads] * clients, range(clients)))
+            elapsed = time.time() - started
+            total = sum(done for done, _ in results)
+            created = [i for _, ids in results for i in ids]
+
+            # Every booking must be visible no matter which worker answers
+            visible = set()
+            for seed in range(clients):
+                for index in range(threads):
+                    path = f'/api/consumer/my-bookings?customer_id=load_{seed}_{index}&limit=200'
+                    page = request(base, 'GET', path)
+                    while page:
+                        visible.update(b['id'] for b in page)
+                        page = request(base, 'GET', f'{path}&before_id={page[-1]["id"]}') if len(page) == 200 else []
+        finally:
+            server.terminate()
+            server.wait()
+    return total / elapsed, len(created), len(set(created)), len(visible)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} CPUs, {args.clients} client processes x {args.threads} threads, '
+          f'{int(WRITE_RATIO * 100)}% writes, {args.seconds:g}s per run')
+    print(f'{"workers":>8} {"req/s":>10} {"created":>9} {"unique":>8} {"visible":>8}')
+    baseline = None
+    for workers in args.workers:
+        rate, created, unique, visible = run(workers, args.seconds, args.clients, args.threads)
+        baseline = baseline or rate
+        print(f'{workers:>8} {rate:>10.0f} {created:>9} {unique:>8} {visible:>8}   x{rate / baseline:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Micro-benchmarks of LocalServe hot paths over generated data.
+
+Loads a synthetic dataset (benchmarks/datagen.py) into an in-memory app and
+times distance maths, search, booking lookups, earnings aggregation and
+receipt rendering. Each case reports calls/s and p50/p99 per call, so runs
+before and after a change can be compared line by line.
+
+Run from the repository root:
+
+    python benchmarks/micro.py [--providers 5000 --bookings 100000 --messages 200000]
+    python benchmarks/micro.py --only search
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Benchmarks run purely in memory
+os.environ['LOCALSERVE_DATA_DIR'] = ''
+os.environ.pop('LOCALSERVE_SHARED_DB', None)
+# Measure the handlers, not the per-client rate limits
+os.environ['LOCALSERVE_RATE_LIMITS'] = 'off'
+
+from datagen import LOCALITIES, generate, load  # noqa: E402
+
+CASES = {}
+
+
+def case(group):
+    def register(fn):
+        CASES.setdefault(group, []).append(fn)
+        return fn
+    return register
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def timed(name, fn, args_list, repeat=1):
+    """Call fn(*args) for every args tuple; print calls/s, p50 and p99"""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            t0 = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    print(f'  {name:<44} {len(samples) / elapsed:>12,.0f}/s   p50 {percentile(samples, 0.5) * 1e6:>10.1f} us'
+          f'   p99 {percentile(samples, 0.99) * 1e6:>10.1f} us')
+
+
+def random_points(rng, n):
+    points = []
+    for _ in range(n):
+        _, lat, lng, spread = rng.choice(LOCALITIES)
+        points.append((rng.gauss(lat, spread * 2), rng.gauss(lng, spread * 2)))
+    return points
+
+
+@case('geo')
+def bench_geo(app, data, rng):
+    from geo_index import calculate_distance
+    points = random_points(rng, 20_000)
+    pairs = [(a[0], a[1], b[0], b[1]) for a, b in zip(points, points[1:])]
+    timed('calculate_distance', calculate_distance, pairs)
+    queries = [(lat, lng, rng.choice([1.0, 1.5, 2.0, 5.0]), rng.choice(['', 'Electrician', 'Plumber']))
+               for lat, lng in points[:2_000]]
+    timed('GeoIndex.query', app.provider_index.query, queries)
+
+
+@case('search')
+def bench_search(app, data, rng):
+    client = app.app.test_client()
+    points = random_points(rng, 500)
+    urls = [f'/api/search?service={rng.choice(["", "Electrician", "Plumber", "Painter"])}'
+            f'&lat={lat}&lng={lng}&radius={rng.choice([1.0, 1.5, 2.0])}' for lat, lng in points]
+    app.search_cache.clear()
+    timed('GET /api/search (cold cache)', client.get, [(u,) for u in urls])
+    timed('GET /api/search (warm cache)', client.get, [(u,) for u in urls])
+    timed('GET /api/search?q=repair&facets=1', client.get, [(u + '&q=repair&facets=1',) for u in urls[:200]])
+    timed('GET /api/providers?view=summary', client.get, [('/api/providers?view=summary',)] * 50)
+    ids = [p['id'] for p in rng.sample(data['providers'], min(200, len(data['providers'])))]
+    timed('GET /api/provider/<id>', client.get, [(f'/api/provider/{i}',) for i in ids])
+
+
+@case('bookings')
+def bench_bookings(app, data, rng):
+    bookings = app.bookings
+    booking_ids = [b['id'] for b, _ in rng.sample(data['bookings'], min(5_000, len(data['bookings'])))]
+    provider_ids = [p['id'] for p in rng.choices(data['providers'], k=1_000)]
+    customer_ids = list({b['customer_id'] for b, _ in data['bookings']})
+    customers = [(rng.choice(customer_ids),) for _ in range(1_000)]
+    timed('BookingStore.get', bookings.get, [(i,) for i in booking_ids])
+    timed('find(status=pending, offered_to=p)',
+          lambda p: list(bookings.find(status='pending', offered_to=p)), [(p,) for p in provider_ids])
+    timed('find(status=accepted, provider_id=p)',
+          lambda p: list(bookings.find(status='accepted', provider_id=p, archived=False)),
+          [(p,) for p in provider_ids])
+    timed('customer_page(limit=50)', lambda c: bookings.customer_page(c, None, 50), customers)
+    client = app.app.test_client()
+    timed('GET /api/provider/requests', client.get,
+          [(f'/api/provider/requests?provider_id={p}',) for p in provider_ids[:300]])
+    timed('GET /api/consumer/my-bookings', client.get,
+          [(f'/api/consumer/my-bookings?customer_id={c}',) for c, in customers[:300]])
+
+
+@case('earnings')
+def bench_earnings(app, data, rng):
+    ledger = app.earnings_ledger
+    provider_ids = [p['id'] for p in rng.choices(data['providers'], k=1_000)]
+    today = date.today()
+    timed('series(30 days, daily)',
+          lambda p: ledger.series(p, today - timedelta(days=29), today), [(p,) for p in provider_ids])
+    timed('series(365 days, monthly)',
+          lambda p: ledger.series(p, today - timedelta(days=364), today, 'monthly'), [(p,) for p in provider_ids])
+    client = app.app.test_client()
+    timed('GET /api/provider/earnings', client.get,
+          [(f'/api/provider/earnings?provider_id={p}&period=monthly',) for p in provider_ids[:300]])
+
+
+@case('receipts')
+def bench_receipts(app, data, rng):
+    from receipts import receipt_fields, render_receipt_pdf
+    paid = [b for b, _ in data['bookings'] if b.get('receipt_id')]
+    sample = [(receipt_fields(b),) for b in rng.sample(paid, min(200, len(paid)))]
+    timed('render_receipt_pdf', render_receipt_pdf, sample)
+    client = app.app.test_client()
+    urls = [(f'/api/payment/receipt/{r["receipt_id"][3:-12]}/pdf',) for r, in sample[:100]]
+    timed('GET receipt pdf (first render)', client.get, urls)
+    timed('GET receipt pdf (cached)', client.get, urls)
+
+
+@case('bulk')
+def bench_bulk(app, data, rng):
+    import json
+    client = app.app.test_client()
+
+    def body(count):
+        lines = []
+        for lat, lng in random_points(rng, count):
+            lines.append(json.dumps({'name': f'Imported {rng.randrange(10**6)}', 'lat': lat, 'lng': lng,
+                                     'service': rng.choice(['Electrician', 'Plumber', 'Painter']),
+                                     'services': ['Repair'], 'languages': ['English']}))
+        return '\n'.join(lines)
+
+    for batch_size in (1, 50, 500):
+        timed(f'POST /api/import/providers 1000 (batch {batch_size})',
+              lambda b: client.post(f'/api/import/providers?batch_size={batch_size}', data=b,
+                                    content_type='application/x-ndjson'),
+              [(body(1_000),) for _ in range(3)])
+    timed('GET /api/export/providers', lambda: b''.join(client.get('/api/export/providers').response), [()] * 5)
+    timed('GET /api/export/bookings', lambda: b''.join(client.get('/api/export/bookings').response), [()] * 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--providers', type=int, default=2_000)
+    parser.add_argument('--bookings', type=int, default=50_000)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', choices=sorted(CASES), nargs='+')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    import app
+    data = generate(args.providers, args.bookings, args.messages, seed=args.seed)
+    load(app, data)
+    print(f'{args.providers:,} providers, {args.bookings:,} bookings, {args.messages:,} messages '
+          f'loaded in {time.perf_counter() - started:.1f}s')
+
+    for group in args.only or CASES:
+        print(group)
+        for fn in CASES[group]:
+            fn(app, data, random.Random(args.seed))
+
+
+if __name__ == '__main__':
+    main()
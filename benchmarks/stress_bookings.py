@@ -0,0 +1,253 @@
+"""Race concurrent writers on the same bookings and check nothing was lost.
+
+For 1, 2, 4 and 8 threads, the threads first create bookings together,
+then all send the same accept, reject, cancel, job status, payment and
+rating requests, booking by booking and each in its own order, so every
+booking is contended by every thread at once. Half the bookings are
+broadcast to two providers, whose accepts race to claim them. Afterwards
+the store is checked:
+
+- every created booking got its own id;
+- a booking was accepted, rejected or cancelled at most once, and its
+  final status agrees with the request that won;
+- it was paid at most once and only once its accepted job was completed,
+  and the providers' earnings grew by exactly the successful payments;
+- it was rated at most once and only once paid or completed, and the
+  providers' review counts and rating fields grew by exactly the
+  successful ratings;
+- the secondary indexes, the active/history split and the change feeds
+  agree with the stored records.
+
+A short interpreter switch interval makes threads interleave far more
+often than they would in a server. Reports requests/s per thread count;
+on one core that stays flat, while the checks must hold at every count.
+
+Run from the repository root:
+
+    python benchmarks/stress_bookings.py [--threads 1 2 4 8] [--bookings 200]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Stress runs purely in memory
+os.environ['LOCALSERVE_DATA_DIR'] = ''
+os.environ.pop('LOCALSERVE_SHARED_DB', None)
+# Every thread posts as the same client
+os.environ['LOCALSERVE_RATE_LIMITS'] = 'off'
+os.environ['LOCALSERVE_MAX_CONCURRENT'] = '0'
+
+PROVIDER_IDS = (1, 2)
+# Each request of the mix is sent this many times per booking by every thread
+REPEATS = 2
+
+
+def operations(booking):
+    """(op, booking id, body) tuples that contend on one booking"""
+    booking_id = booking['id']
+    accepts = [('accept', booking_id, {'request_id': booking_id, 'provider_data': {'id': p, 'name': f'P{p}'}})
+               for p in booking['offered']]
+    return accepts + [
+        ('reject', booking_id, {'request_id': booking_id}),
+        ('cancel', booking_id, {'request_id': booking_id, 'reason': 'stress'}),
+        ('job', booking_id, {'request_id': booking_id, 'status': 'in_progress'}),
+        ('job', booking_id, {'request_id': booking_id, 'status': 'completed'}),
+        ('pay', booking_id, {'request_id': booking_id, 'amount': 100 + booking_id % 50}),
+        ('rate', booking_id, {'request_id': booking_id, 'rating': 1 + booking_id % 5, 'review': 'stress'}),
+    ]
+
+
+URLS = {
+    'accept': '/api/provider/accept-request',
+    'reject': '/api/provider/reject-request',
+    'cancel': '/api/booking/cancel',
+    'job': '/api/job/update-status',
+    'pay': '/api/payment/process',
+    'rate': '/api/rating/submit',
+}
+
+
+def run_threads(count, target):
+    """Run target(index) on ``count`` threads released together; returns seconds taken"""
+    barrier = threading.Barrier(count + 1)
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - started
+
+
+def provider_totals(app):
+    return {p: (app.earnings_ledger.total(p), app.reviews.summary(p)['reviews']) for p in PROVIDER_IDS}
+
+
+def check_store(app):
+    """Problems with the store's internal structures, as strings"""
+    store = app.bookings
+    problems = []
+    active, history = set(store._active), set(store._history)
+    if active & history:
+        problems.append(f'{len(active & history)} bookings both active and archived')
+    if active | history != set(store._bookings):
+        problems.append('active and history do not cover the store')
+    for field, index in store._indexes.items():
+        for value, bucket in index.items():
+            for booking_id, booking in bucket.items():
+                if store.get(booking_id) is not booking:
+                    problems.append(f'{field} index holds a stale copy of booking {booking_id}')
+                elif value not in store._index_values(field, booking):
+                    problems.append(f'booking {booking_id} filed under {field}={value!r}')
+    for booking in store._bookings.values():
+        for field in store._indexes:
+            for value in store._index_values(field, booking):
+                if booking['id'] not in store._indexes[field].get(value, ()):
+                    problems.append(f'booking {booking["id"]} missing from {field}={value!r}')
+    for provider_id, feed in store._feeds.items():
+        seqs = list(feed.values())
+        if any(a >= b for a, b in zip(seqs, seqs[1:])):
+            problems.append(f'feed of provider {provider_id} is out of order')
+    return problems
+
+
+def stress(app, thread_count, booking_count, seed):
+    before = provider_totals(app)
+    rating_fields = {p: app.providers_by_id[p]['reviews'] for p in PROVIDER_IDS}
+    size = len(app.bookings)
+
+    # Phase 1: create bookings from every thread at once
+    plans = []
+    for i in range(booking_count):
+        if i % 2:
+            plans.append({'customer_id': f'stress_{i % 7}', 'provider_ids': list(PROVIDER_IDS)})
+        else:
+            plans.append({'customer_id': f'stress_{i % 7}', 'provider_id': PROVIDER_IDS[i % 4 // 2]})
+    created = [[] for _ in range(thread_count)]
+
+    def create(index):
+        client = app.app.test_client()
+        for body in plans[index::thread_count]:
+            response = client.post('/api/booking/request', json={'service_type': 'Repair', **body}).get_json()
+            created[index].append({'id': response['request_id'],
+                                   'offered': body.get('provider_ids') or [body['provider_id']]})
+
+    create_seconds = run_threads(thread_count, create)
+    created = [booking for chunk in created for booking in chunk]
+    problems = []
+    ids = [booking['id'] for booking in created]
+    if len(set(ids)) != len(ids) or len(app.bookings) != size + len(ids):
+        problems.append(f'{len(ids)} creates gave {len(set(ids))} ids, store grew by {len(app.bookings) - size}')
+
+    # Phase 2: threads walk the bookings in the same order, each shuffling the
+    # requests of a booking differently, so they all pile onto one booking at a time
+    mixes = [operations(booking) * REPEATS for booking in sorted(created, key=lambda b: b['id'])]
+    wins = Counter()
+    paid = 0
+    wins_lock = threading.Lock()
+
+    def contend(index):
+        nonlocal paid
+        client = app.app.test_client()
+        order = random.Random(seed * 100 + index)
+        for mix in mixes:
+            ops = list(mix)
+            order.shuffle(ops)
+            for op, booking_id, body in ops:
+                if client.post(URLS[op], json=body).get_json()['success']:
+                    with wins_lock:
+                        wins[op, booking_id] += 1
+                        if op == 'pay':
+                            paid += body['amount']
+
+    seconds = run_threads(thread_count, contend)
+    requests = sum(map(len, mixes)) * thread_count
+
+    # Per booking outcomes
+    reviewed = Counter()
+    for booking_id in ids:
+        booking = app.bookings.get(booking_id)
+        decided = {op: wins[op, booking_id] for op in ('accept', 'reject', 'cancel') if wins[op, booking_id]}
+        if sum(decided.values()) > 1:
+            problems.append(f'booking {booking_id} decided {dict(decided)}')
+        expected = {'accept': 'accepted', 'reject': 'rejected', 'cancel': 'cancelled'}.get(next(iter(decided), None),
+                                                                                        'pending')
+        if booking['status'] != expected:
+            problems.append(f'booking {booking_id} is {booking["status"]}, expected {expected}')
+        if wins['pay', booking_id] > 1:
+            problems.append(f'booking {booking_id} paid {wins["pay", booking_id]} times')
+        if (booking.get('payment_status') == 'paid') != bool(wins['pay', booking_id]):
+            problems.append(f'booking {booking_id} payment status {booking.get("payment_status")}')
+        if wins['pay', booking_id] and (booking['status'], booking.get('job_status')) != ('accepted', 'completed'):
+            problems.append(f'booking {booking_id} paid while {booking["status"]}, job {booking.get("job_status")}')
+        if wins['rate', booking_id] and booking.get('payment_status') != 'paid' \
+                and booking.get('job_status') != 'completed':
+            problems.append(f'booking {booking_id} rated while unpaid, job {booking.get("job_status")}')
+        if wins['rate', booking_id] > 1:
+            problems.append(f'booking {booking_id} rated {wins["rate", booking_id]} times')
+        if bool(wins['rate', booking_id]) != app.bookings.is_archived(booking_id):
+            problems.append(f'booking {booking_id} rated but not archived, or the reverse')
+        if wins['rate', booking_id] and booking.get('provider_id') is not None:
+            reviewed[booking['provider_id']] += 1
+
+    # Per provider totals
+    after = provider_totals(app)
+    earned = sum(after[p][0] - before[p][0] for p in after)
+    if earned != paid:
+        problems.append(f'providers earned {earned}, payments add up to {paid}')
+    for p in PROVIDER_IDS:
+        if after[p][1] - before[p][1] != reviewed[p]:
+            problems.append(f'provider {p} gained {after[p][1] - before[p][1]} reviews, {reviewed[p]} were rated')
+        if app.providers_by_id[p]['reviews'] - rating_fields[p] != reviewed[p]:
+            problems.append(f'provider {p} review field out of step with its ratings')
+        if app.providers_by_id[p] not in app.PROVIDERS:
+            problems.append(f'provider {p} list entry differs from its id lookup')
+
+    problems.extend(check_store(app))
+    outcome = Counter(op for (op, _), n in wins.items() for _ in range(n))
+    print(f'  {thread_count} threads  creates {len(ids) / create_seconds:>8,.0f}/s   '
+          f'requests {requests / seconds:>8,.0f}/s   won {dict(sorted(outcome.items()))}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--bookings', type=int, default=200)
+    parser.add_argument('--switch-interval', type=float, default=1e-5,
+                        help='seconds between forced thread switches')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    import app
+    sys.setswitchinterval(args.switch_interval)
+    failed = False
+    for count in args.threads:
+        problems = stress(app, count, args.bookings, args.seed + count)
+        for problem in problems[:20]:
+            print(f'    ANOMALY {problem}')
+        failed = failed or bool(problems)
+    print('anomalies found' if failed else 'no anomalies')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
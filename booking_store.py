@@ -0,0 +1,435 @@
+import itertools
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from locks import KeyedLocks
+from records import as_booking
+
+# Allowed booking ``status`` moves; anything not listed is rejected
+STATUS_TRANSITIONS = {
+    'pending': ('accepted', 'rejected', 'cancelled', 'expired'),
+    'accepted': (),
+    'rejected': (),
+    'cancelled': (),
+    'expired': (),
+}
+
+# Allowed ``job_status`` moves once a provider has accepted
+JOB_STATUS_TRANSITIONS = {
+    None: ('accepted',),
+    'accepted': ('in_progress', 'completed'),
+    'in_progress': ('completed',),
+    'completed': (),
+}
+
+# A booking is paid once, after its accepted job is completed
+PAYMENT_REQUIRES = {'status': 'accepted', 'job_status': 'completed'}
+# A booking can be rated once it is paid or its job is completed
+RATING_REQUIRES = ({'payment_status': 'paid'}, {'job_status': 'completed'})
+
+# ``offered_to`` is derived: every provider a request was sent to
+INDEXED_FIELDS = ('provider_id', 'customer_id', 'status', 'offered_to')
+
+
+class InvalidTransition(ValueError):
+    """Raised when a booking is moved to a status its current state does not allow"""
+
+
+class Edit:
+    __slots__ = ('original', 'draft', 'archive')
+
+    def __init__(self, original):
+        self.original = original
+        self.draft = original.clone()
+        self.archive = False
+
+
+def offered_to(booking):
+    """Providers a booking request was sent to (broadcasts list several)"""
+    return booking.get('provider_ids') or [booking.get('provider_id')]
+
+
+class BookingStore:
+    """Bookings keyed by id with secondary indexes by provider, customer and status.
+
+    Each index maps a field value to an insertion-ordered ``{id: booking}``
+    dict, so lookups, inserts and removals are O(1) and iteration keeps
+    creation order. Bookings that have been rated are moved from the
+    active set to history without touching the other indexes.
+
+    Every change is stamped with a store-wide sequence number and recorded
+    in a per-provider feed (booking id -> last change), which backs the
+    delta polling of provider dashboards.
+
+    Stored records are never modified. ``edit`` locks one booking, hands
+    out a private copy and, when the block ends, swaps the copy in
+    everywhere at once. Readers therefore take no locks and always see a
+    booking either wholly before or wholly after a change; writers to
+    different bookings run in parallel and only meet on the short
+    structural lock around the indexes.
+    """
+
+    def __init__(self, start_id=1):
+        self._ids = itertools.count(start_id)
+        self._bookings = {}
+        self._active = {}
+        self._history = {}
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._seq = 0
+        # provider_id -> OrderedDict(booking_id -> seq), most recently changed last
+        self._feeds = {}
+        # customer_id -> ascending booking ids, for keyset pagination
+        self._timelines = {}
+        # customer_id -> (seq, unix time) of the customer's latest change
+        self._customer_versions = {}
+        self._max_id = start_id - 1
+        # One lock per booking (striped) serializes edits, so only one accept can win a request
+        self._locks = KeyedLocks()
+        # booking_id -> Edit open on it; only the thread holding the booking's lock touches its entry
+        self._edits = {}
+        # Guards the indexes, feeds and sequence number while a change is swapped in
+        self._lock = threading.Lock()
+        # Called with (booking, archived) after every change, e.g. to journal it
+        self.listener = None
+        # Context every edit runs in, outside the booking's lock, e.g. the shared-state write lock
+        self.transaction = nullcontext
+
+    def __len__(self):
+        return len(self._bookings)
+
+    def __contains__(self, booking_id):
+        return booking_id in self._bookings
+
+    def next_id(self):
+        """Allocate a booking id; ids are never reused"""
+        with self._lock:
+            booking_id = next(self._ids)
+            self._max_id = max(self._max_id, booking_id)
+        return booking_id
+
+    @staticmethod
+    def _index_values(field, booking):
+        if field == 'offered_to':
+            return offered_to(booking)
+        return [booking.get(field)]
+
+    def _index_add(self, booking):
+        for field in INDEXED_FIELDS:
+            for value in self._index_values(field, booking):
+                self._indexes[field].setdefault(value, {})[booking['id']] = booking
+
+    def _index_remove(self, field, value, booking_id):
+        bucket = self._indexes[field].get(value)
+        if bucket is not None:
+            bucket.pop(booking_id, None)
+            if not bucket:
+                del self._indexes[field][value]
+
+    def add(self, booking, archived=False):
+        """Store a booking; its id must come from ``next_id``. Returns the stored record"""
+        booking = as_booking(booking)
+        with self._lock:
+            self._insert(booking, archived)
+        if self.listener:
+            self.listener(booking, archived)
+        return booking
+
+    def add_many(self, bookings):
+        """Store a batch of (booking, archived) pairs under one lock; returns the stored records
+
+        Bookings without an id are given the next ones. Ids brought along
+        (e.g. by an import) must be above every id allocated so far, and the
+        counter moves past them; a booking that breaks this is skipped and
+        reported as (position in the batch, message) in the second list returned.
+        """
+        stored, rejected = [], []
+        with self._lock:
+            for position, (booking, archived) in enumerate(bookings):
+                if booking.get('id') is None:
+                    booking['id'] = next(self._ids)
+                elif booking['id'] <= self._max_id:
+                    rejected.append((position, f'id {booking["id"]} is already in use'))
+                    continue
+                else:
+                    self._ids = itertools.count(booking['id'] + 1)
+                self._max_id = booking['id']
+                booking = as_booking(booking)
+                self._insert(booking, archived)
+                stored.append((booking, archived))
+        if self.listener:
+            for booking, archived in stored:
+                self.listener(booking, archived)
+        return [booking for booking, _ in stored], rejected
+
+    def _insert(self, booking, archived):
+        self._bookings[booking['id']] = booking
+        (self._history if archived else self._active)[booking['id']] = booking
+        self._index_add(booking)
+        timeline = self._timelines.setdefault(booking.get('customer_id'), [])
+        if timeline and timeline[-1] > booking['id']:
+            timeline.insert(bisect_left(timeline, booking['id']), booking['id'])
+        else:
+            timeline.append(booking['id'])
+        self._stamp(booking)
+
+    def _stamp(self, booking):
+        """Give a change the next sequence number in provider feeds and customer versions"""
+        self._seq += 1
+        for provider_id in set(offered_to(booking) + [booking.get('provider_id')]):
+            feed = self._feeds.get(provider_id)
+            if feed is None:
+                feed = self._feeds[provider_id] = OrderedDict()
+            feed.pop(booking['id'], None)
+            feed[booking['id']] = self._seq
+        self._customer_versions[booking.get('customer_id')] = (self._seq, time.time())
+        return self._seq
+
+    def restore(self, booking, archived=False):
+        """Insert or replace a booking recovered from a snapshot or the journal"""
+        booking = as_booking(booking)
+        with self._locks(booking['id']):
+            existing = self._bookings.get(booking['id'])
+            if existing is None:
+                if booking['id'] > self._max_id:
+                    self._max_id = booking['id']
+                    self._ids = itertools.count(booking['id'] + 1)
+                return self.add(booking, archived)
+            self._swap(existing, booking, archived)
+        return booking
+
+    @contextmanager
+    def edit(self, booking_id, archived=False):
+        """Lock a booking and yield a private copy to change, or None if there is no such booking
+
+        ``archived`` picks active (False, the default), rated (True) or any
+        (None) bookings. When the block ends the copy replaces the stored
+        record, unless it raised or nothing changed. Nested edits of the
+        same booking in one thread share the copy. The edit runs inside
+        ``transaction``, so in a multi-worker setup it sees and publishes the
+        latest state without the caller holding the shared lock any longer.
+        """
+        with self.transaction(), self._locks(booking_id):
+            edit = self._edits.get(booking_id)
+            if edit is not None:
+                yield edit.draft
+                return
+            current = self._bookings.get(booking_id)
+            if current is None or (archived is not None and (booking_id in self._history) != archived):
+                yield None
+                return
+            edit = self._edits[booking_id] = Edit(current)
+            try:
+                yield edit.draft
+            finally:
+                del self._edits[booking_id]
+            if edit.archive or edit.draft != current:
+                self._swap(current, edit.draft, edit.archive or booking_id in self._history)
+
+    def _swap(self, current, booking, archived):
+        """Replace a stored record with its new version in every index, then journal it"""
+        booking_id = booking['id']
+        with self._lock:
+            self._bookings[booking_id] = booking
+            if archived:
+                self._active.pop(booking_id, None)
+                self._history[booking_id] = booking
+            else:
+                self._history.pop(booking_id, None)
+                self._active[booking_id] = booking
+            for field in INDEXED_FIELDS:
+                values = self._index_values(field, booking)
+                for value in self._index_values(field, current):
+                    if value not in values:
+                        self._index_remove(field, value, booking_id)
+                for value in values:
+                    # Existing entries keep their place, so iteration order is unchanged
+                    self._indexes[field].setdefault(value, {})[booking_id] = booking
+            self._stamp(booking)
+        if self.listener:
+            self.listener(booking, archived)
+
+    def _draft(self, booking):
+        """The open edit ``booking`` is the copy of; stored records are read-only"""
+        edit = self._edits.get(booking['id'])
+        if edit is None or edit.draft is not booking:
+            raise RuntimeError('Bookings can only be changed inside BookingStore.edit()')
+        return edit
+
+    def snapshot(self):
+        """[[booking, archived], ...] copies suitable for serializing"""
+        return [[b.to_dict(), b['id'] in self._history] for b in list(self._bookings.values())]
+
+    def get(self, booking_id):
+        return self._bookings.get(booking_id)
+
+    def get_active(self, booking_id):
+        return self._active.get(booking_id)
+
+    def is_archived(self, booking_id):
+        return booking_id in self._history
+
+    def set_status(self, booking, status):
+        """Move a booking being edited along STATUS_TRANSITIONS"""
+        self._draft(booking)
+        current = booking['status']
+        if status not in STATUS_TRANSITIONS.get(current, ()):
+            raise InvalidTransition(f'Cannot change booking from {current} to {status}')
+        booking['status'] = status
+
+    def set_job_status(self, booking, job_status):
+        """Move an accepted booking being edited along JOB_STATUS_TRANSITIONS"""
+        self._draft(booking)
+        current = booking.get('job_status')
+        if booking['status'] != 'accepted':
+            raise InvalidTransition(f'Cannot update job for a {booking["status"]} booking')
+        if job_status not in JOB_STATUS_TRANSITIONS.get(current, ()):
+            raise InvalidTransition(f'Cannot change job from {current} to {job_status}')
+        booking['job_status'] = job_status
+
+    def pay(self, booking, amount, paid_at):
+        """Mark a booking being edited paid, if PAYMENT_REQUIRES allows it"""
+        self._draft(booking)
+        if booking.get('payment_status') == 'paid':
+            raise InvalidTransition('Payment already processed')
+        for field, required in PAYMENT_REQUIRES.items():
+            if booking.get(field) != required:
+                raise InvalidTransition(f'Cannot take payment until the booking is {required}')
+        booking['payment_status'] = 'paid'
+        booking['payment_amount'] = amount
+        booking['payment_at'] = paid_at
+
+    def rate(self, booking, rating, review, rated_at):
+        """Record the rating of a booking being edited, if RATING_REQUIRES allows it"""
+        self._draft(booking)
+        if not any(all(booking.get(field) == value for field, value in rule.items()) for rule in RATING_REQUIRES):
+            raise InvalidTransition('Cannot rate a booking before it is paid or completed')
+        booking['rating'] = rating
+        booking['review'] = review
+        booking['rated_at'] = rated_at
+
+    def assign_provider(self, booking, provider_id):
+        """Pin a broadcast request to the provider that accepted it"""
+        self._draft(booking)
+        booking['provider_id'] = provider_id
+
+    def offer(self, booking, provider_ids):
+        """Extend a pending request's offer to more providers"""
+        self._draft(booking)
+        current = offered_to(booking)
+        added = [p for p in provider_ids if p not in current]
+        if added:
+            booking['provider_ids'] = [p for p in booking.get('provider_ids') or () if p is not None] + added
+
+    def archive(self, booking):
+        """Move a booking from the active set into history when its edit ends"""
+        self._draft(booking).archive = True
+
+    def active(self):
+        return iter(list(self._active.values()))
+
+    def history(self):
+        return iter(list(self._history.values()))
+
+    @property
+    def active_count(self):
+        return len(self._active)
+
+    @property
+    def history_count(self):
+        return len(self._history)
+
+    def find(self, archived=None, **criteria):
+        """Iterate bookings matching indexed field values, driven by the smallest index"""
+        if not criteria:
+            candidates = {None: self._bookings, False: self._active, True: self._history}[archived]
+            yield from list(candidates.values())
+            return
+
+        buckets = []
+        for field, value in criteria.items():
+            bucket = self._indexes[field].get(value)
+            if not bucket:
+                return
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        smallest, others = buckets[0], buckets[1:]
+        # Copy the driving bucket; writers may add to it while a reader iterates
+        for booking_id, booking in list(smallest.items()):
+            if all(booking_id in bucket for bucket in others):
+                if archived is None or (booking_id in self._history) == archived:
+                    yield booking
+
+    def scan(self, archived=None, **criteria):
+        """Iterate bookings in id order without copying the store, e.g. for exports
+
+        Ids are never reused, so walking the id range finds every booking
+        stored when the walk began while holding just one id; bookings added
+        meanwhile show up if their id is still ahead. With criteria only the
+        ids of the smallest matching index are copied.
+        """
+        buckets = sorted((self._indexes[field].get(value, {}) for field, value in criteria.items()), key=len)
+        booking_ids = sorted(buckets[0]) if buckets else range(1, self._max_id + 1)
+        for booking_id in booking_ids:
+            booking = self._bookings.get(booking_id)
+            if booking is None or any(booking_id not in bucket for bucket in buckets[1:]):
+                continue
+            if archived is None or (booking_id in self._history) == archived:
+                yield booking
+
+    def count(self, **criteria):
+        if len(criteria) == 1:
+            (field, value), = criteria.items()
+            return len(self._indexes[field].get(value, ()))
+        return sum(1 for _ in self.find(**criteria))
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def provider_version(self, provider_id):
+        """Sequence number of the latest change visible to a provider"""
+        feed = self._feeds.get(provider_id)
+        if not feed:
+            return 0
+        return next(reversed(feed.values()))
+
+    def customer_version(self, customer_id):
+        """(seq, unix time) of the latest change to any of a customer's bookings"""
+        return self._customer_versions.get(customer_id, (0, 0.0))
+
+    def customer_page(self, customer_id, before_id=None, limit=50, statuses=None, archived=None):
+        """Newest-first page of a customer's bookings with ids below ``before_id``
+
+        Returns (bookings, next_before_id); next_before_id is None on the last page.
+        """
+        timeline = self._timelines.get(customer_id, [])
+        end = bisect_left(timeline, before_id) if before_id is not None else len(timeline)
+        page = []
+        for position in range(end - 1, -1, -1):
+            booking = self._bookings[timeline[position]]
+            if statuses and booking['status'] not in statuses:
+                continue
+            if archived is not None and (booking['id'] in self._history) != archived:
+                continue
+            if len(page) == limit:
+                return page, page[-1]['id']
+            page.append(booking)
+        return page, None
+
+    def provider_changes(self, provider_id, since):
+        """Bookings visible to a provider that changed after ``since``, oldest first"""
+        feed = self._feeds.get(provider_id)
+        if not feed:
+            return []
+        changed = []
+        # Writers reorder the feed; hold them off only while walking the new entries
+        with self._lock:
+            for booking_id, seq in reversed(feed.items()):
+                if seq <= since:
+                    break
+                changed.append(self._bookings[booking_id])
+        changed.reverse()
+        return changed
@@ -0,0 +1,210 @@
+import json
+from itertools import islice
+
+from availability import parse_clock
+from booking_store import JOB_STATUS_TRANSITIONS, STATUS_TRANSITIONS
+from records import ENUMS, TIMESTAMP_FIELDS, to_epoch
+
+# Records validated and applied together; derived indexes refresh once per batch
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+# Longest NDJSON line accepted; longer lines are skipped and reported
+MAX_LINE_BYTES = 64 * 1024
+# Per-line errors listed in an import's summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+# Export lines are sent in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Provider fields holding lists of strings, and those holding a string
+PROVIDER_LIST_FIELDS = ('services', 'languages', 'certifications', 'gallery')
+PROVIDER_TEXT_FIELDS = ('price', 'phone', 'email', 'availability', 'profile_image', 'description',
+                        'response_time', 'bio', 'address')
+
+
+def provider_defaults():
+    """Fields every provider record carries, for imported providers that leave them out"""
+    return {
+        'rating': 0,
+        'reviews': 0,
+        'price': '',
+        'phone': '',
+        'email': '',
+        'services': [],
+        'working_hours': {'start': '09:00', 'end': '18:00'},
+        'availability': 'available',
+        'description': '',
+        'certifications': [],
+        'completed_jobs': 0,
+        'languages': [],
+        'gallery': []
+    }
+
+
+def booking_defaults():
+    """Fields of a new booking request, for imported bookings that leave them out"""
+    return {
+        'customer_name': 'Anonymous Customer',
+        'provider_id': None,
+        'provider_ids': None,
+        'details': 'Service requested',
+        'time_ago': 'Just now',
+        'status': 'pending',
+        'job_status': None,
+        'payment_status': 'unpaid',
+        'rating': None,
+        'review': None,
+        'can_cancel': True,
+        'can_reschedule': False
+    }
+
+
+def read_ndjson(stream, max_line=MAX_LINE_BYTES):
+    """Yield (line number, value, error) for every non-blank line of a binary stream
+
+    Exactly one of value and error is None. Lines are read one at a time,
+    so memory does not depend on the size of the body.
+    """
+    number = 0
+    while True:
+        line = stream.readline(max_line + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_line and not line.endswith(b'\n'):
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line + 1)
+            yield number, None, f'line is longer than {max_line} bytes'
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f'invalid JSON: {e}'
+
+
+def batched(items, size):
+    """Lists of up to ``size`` consecutive items"""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_id(record):
+    value = record.get('id')
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+        raise ValueError('id must be a positive integer')
+
+
+def parse_provider(value):
+    """A provider record from one import line; ValueError if it is invalid
+
+    ``name``, ``service``, ``lat`` and ``lng`` are required; other fields
+    are checked when present. A line for a known id replaces just the
+    fields it carries, so defaults are left to the caller for new providers.
+    """
+    if not isinstance(value, dict):
+        raise ValueError('expected a JSON object')
+    provider = dict(value)
+    check_id(provider)
+    for field in ('name', 'service'):
+        if not isinstance(provider.get(field), str) or not provider[field].strip():
+            raise ValueError(f'{field} is required')
+    for field, limit in (('lat', 90), ('lng', 180)):
+        if not is_number(provider.get(field)) or not -limit <= provider[field] <= limit:
+            raise ValueError(f'{field} must be a number between -{limit} and {limit}')
+        provider[field] = float(provider[field])
+    if 'rating' in provider and (not is_number(provider['rating']) or not 0 <= provider['rating'] <= 5):
+        raise ValueError('rating must be between 0 and 5')
+    for field in ('reviews', 'completed_jobs', 'years_experience'):
+        count = provider.get(field)
+        if count is not None and (not isinstance(count, int) or isinstance(count, bool) or count < 0):
+            raise ValueError(f'{field} must be a non-negative integer')
+    for field in PROVIDER_LIST_FIELDS:
+        items = provider.get(field, [])
+        if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+            raise ValueError(f'{field} must be a list of strings')
+    for field in PROVIDER_TEXT_FIELDS:
+        if provider.get(field) is not None and not isinstance(provider[field], str):
+            raise ValueError(f'{field} must be a string')
+    if 'working_hours' in provider:
+        hours = provider['working_hours']
+        try:
+            parse_clock(hours['start'])
+            parse_clock(hours['end'])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError("working_hours must be {'start': 'HH:MM', 'end': 'HH:MM'}") from None
+    return provider
+
+
+def parse_booking(value):
+    """(booking dict, archived) from one import line, with defaults filled in; ValueError if it is invalid
+
+    An ``archived`` key, as written by the booking export, says whether the
+    booking belongs in history rather than the active set.
+    """
+    if not isinstance(value, dict):
+        raise ValueError('expected a JSON object')
+    booking = {**booking_defaults(), **value}
+    archived = booking.pop('archived', False)
+    if not isinstance(archived, bool):
+        raise ValueError('archived must be true or false')
+    check_id(booking)
+    if not isinstance(booking.get('customer_id'), str) or not booking['customer_id']:
+        raise ValueError('customer_id is required')
+    provider_id = booking['provider_id']
+    if provider_id is not None and (not isinstance(provider_id, int) or isinstance(provider_id, bool)):
+        raise ValueError('provider_id must be an integer')
+    provider_ids = booking['provider_ids']
+    if provider_ids is not None and (not isinstance(provider_ids, list) or
+                                     not all(isinstance(p, int) and not isinstance(p, bool) for p in provider_ids)):
+        raise ValueError('provider_ids must be a list of integers')
+    if booking['status'] not in STATUS_TRANSITIONS:
+        raise ValueError(f'status must be one of {", ".join(STATUS_TRANSITIONS)}')
+    if booking['job_status'] not in JOB_STATUS_TRANSITIONS:
+        raise ValueError(f'job_status must be null or one of {", ".join(ENUMS["job_status"])}')
+    if booking['payment_status'] not in ENUMS['payment_status']:
+        raise ValueError(f'payment_status must be one of {", ".join(ENUMS["payment_status"])}')
+    rating = booking['rating']
+    if rating is not None and (not is_number(rating) or not 1 <= rating <= 5):
+        raise ValueError('rating must be between 1 and 5')
+    if booking['payment_status'] == 'paid':
+        # Earnings take the whole amount, as process_payment records it
+        try:
+            int(booking.get('payment_amount'))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError('payment_amount must be a number for a paid booking') from None
+    for field in TIMESTAMP_FIELDS & booking.keys():
+        try:
+            booking[field] = to_epoch(booking[field])
+        except (TypeError, ValueError):
+            raise ValueError(f'{field} must be a "YYYY-MM-DD HH:MM:SS" timestamp') from None
+    return booking, archived
+
+
+def encode_line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def stream_ndjson(records, chunk_size=CHUNK_SIZE):
+    """Yield NDJSON for an iterable of dicts in chunks of about ``chunk_size`` bytes"""
+    chunk = []
+    size = 0
+    for record in records:
+        line = encode_line(record)
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b''.join(chunk)
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fields of the lightweight projection used by list and map views
+SUMMARY_FIELDS = ('id', 'name', 'service', 'rating', 'reviews', 'lat', 'lng', 'price', 'availability',
+                  'profile_image', 'response_time')
+# Distinct ?fields= selections kept encoded at once
+MAX_PROJECTIONS = 32
+# (provider, ?fields= selection) detail projections kept encoded at once
+MAX_PROVIDER_PROJECTIONS = 4096
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+def encode_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def parse_fields(value):
+    """Sorted tuple of field names from a ?fields=a,b,c value; None when absent"""
+    if not value:
+        return None
+    return tuple(sorted({field.strip() for field in value.split(',') if field.strip()}))
+
+
+def project(provider, fields):
+    return {field: provider[field] for field in fields if field in provider}
+
+
+class EncodedBody:
+    """One JSON body with its strong ETag and precompressed variants"""
+
+    __slots__ = ('body', 'etag', 'gzip', 'br')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        big = len(body) >= MIN_COMPRESS_BYTES
+        self.gzip = gzip.compress(body, compresslevel=9, mtime=0) if big else None
+        self.br = brotli.compress(body) if big and brotli is not None else None
+
+    def variant(self, accept_encoding):
+        """(bytes, content encoding or None, etag) best matching an Accept-Encoding header"""
+        accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+        if self.br is not None and 'br' in accepted:
+            return self.br, 'br', f'{self.etag}-br'
+        if self.gzip is not None and 'gzip' in accepted:
+            return self.gzip, 'gzip', f'{self.etag}-gz'
+        return self.body, None, self.etag
+
+
+class CatalogCache:
+    """Versioned, pre-encoded JSON for the provider catalog and profiles.
+
+    The full catalog, the summary projection, any ``?fields=`` projection
+    and each provider's detail body, whole or projected, are encoded (and
+    compressed) once and served as bytes until ``invalidate`` bumps the
+    version of the catalog and of the changed provider. A body is rebuilt
+    lazily on the first read after a change, tagged with the version read
+    before building, so a change that lands mid-build simply forces
+    another rebuild.
+    """
+
+    def __init__(self, providers, detail):
+        # () -> list of provider dicts, in catalog order
+        self.providers = providers
+        # provider_id -> detail dict, or None for an unknown provider
+        self.detail = detail
+        self.version = 0
+        self._provider_versions = {}
+        # (kind, fields) -> (version, EncodedBody)
+        self._catalog = OrderedDict()
+        # provider_id -> (version, EncodedBody)
+        self._details = {}
+        # (provider_id, fields) -> (version, EncodedBody), least recently used first
+        self._projections = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self, provider_id=None):
+        self.invalidate_many(() if provider_id is None else (provider_id,))
+
+    def invalidate_many(self, provider_ids):
+        """One catalog version bump for a batch of changed providers"""
+        with self._lock:
+            self.version += 1
+            for provider_id in provider_ids:
+                self._provider_versions[provider_id] = self._provider_versions.get(provider_id, 0) + 1
+
+    def catalog(self, fields=None):
+        """Encoded catalog: full, 'summary', or a tuple of field names"""
+        key = fields or 'full'
+        with self._lock:
+            version = self.version
+            cached = self._catalog.get(key)
+            if cached is not None and cached[0] == version:
+                self._catalog.move_to_end(key)
+                return cached[1]
+        providers = self.providers()
+        if fields == 'summary':
+            fields = SUMMARY_FIELDS
+        encoded = EncodedBody(encode_json([project(p, fields) for p in providers] if fields else providers))
+        with self._lock:
+            self._catalog[key] = (version, encoded)
+            self._catalog.move_to_end(key)
+            while len(self._catalog) > MAX_PROJECTIONS:
+                self._catalog.popitem(last=False)
+        return encoded
+
+    def provider(self, provider_id, fields=None):
+        """Encoded detail body of one provider, whole or a tuple of field names; None if it does not exist"""
+        with self._lock:
+            version = self._provider_versions.get(provider_id, 0)
+            if fields:
+                cached = self._projections.get((provider_id, fields))
+                if cached is not None and cached[0] == version:
+                    self._projections.move_to_end((provider_id, fields))
+                    return cached[1]
+            else:
+                cached = self._details.get(provider_id)
+                if cached is not None and cached[0] == version:
+                    return cached[1]
+        data = self.detail(provider_id)
+        if data is None:
+            return None
+        encoded = EncodedBody(encode_json(project(data, fields) if fields else data))
+        with self._lock:
+            if fields:
+                self._projections[provider_id, fields] = (version, encoded)
+                self._projections.move_to_end((provider_id, fields))
+                while len(self._projections) > MAX_PROVIDER_PROJECTIONS:
+                    self._projections.popitem(last=False)
+            else:
+                self._details[provider_id] = (version, encoded)
+        return encoded
@@ -0,0 +1,149 @@
+import threading
+
+import numpy as np
+
+from geo_index import EARTH_RADIUS_KM, bounding_box
+
+INITIAL_CAPACITY = 64
+
+
+class CoordinateStore:
+    """Contiguous NumPy arrays of provider coordinates for vectorized distance scoring.
+
+    Rows are packed densely, so every array slice ``[:size]`` is live data;
+    an updated provider keeps its row. Radians and ``cos(lat)`` are computed
+    once when a provider is added. Writers take a lock; a new row is filled
+    in before ``size`` grows to include it.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.size = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._lat = np.zeros(capacity, dtype=np.float64)
+        self._lng = np.zeros(capacity, dtype=np.float64)
+        self._lat_rad = np.zeros(capacity, dtype=np.float64)
+        self._lng_rad = np.zeros(capacity, dtype=np.float64)
+        self._cos_lat = np.zeros(capacity, dtype=np.float64)
+        self._service = np.zeros(capacity, dtype=np.int32)
+        self._rows = {}
+        self._service_codes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = max(INITIAL_CAPACITY, len(self._ids) * 2)
+        for name in ('_ids', '_lat', '_lng', '_lat_rad', '_lng_rad', '_cos_lat', '_service'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _service_code(self, service):
+        key = (service or '').lower()
+        if key not in self._service_codes:
+            self._service_codes[key] = len(self._service_codes)
+        return self._service_codes[key]
+
+    def _write(self, row, provider):
+        lat = float(provider['lat'])
+        lng = float(provider['lng'])
+        self._ids[row] = provider['id']
+        self._lat[row] = lat
+        self._lng[row] = lng
+        self._lat_rad[row] = np.radians(lat)
+        self._lng_rad[row] = np.radians(lng)
+        self._cos_lat[row] = np.cos(self._lat_rad[row])
+        self._service[row] = self._service_code(provider.get('service'))
+
+    def add(self, provider):
+        """Insert or overwrite the row for a provider"""
+        with self._lock:
+            row = self._rows.get(provider['id'])
+            if row is not None:
+                self._write(row, provider)
+                return
+            if self.size == len(self._ids):
+                self._grow()
+            row = self.size
+            self._write(row, provider)
+            self._rows[provider['id']] = row
+            self.size += 1
+
+    update = add
+
+    def add_many(self, providers):
+        """``add`` for a batch: new rows are computed as arrays and the store grows at most once"""
+        with self._lock:
+            fresh = {}
+            for provider in providers:
+                row = self._rows.get(provider['id'])
+                if row is not None:
+                    self._write(row, provider)
+                else:
+                    fresh[provider['id']] = provider
+            if not fresh:
+                return
+            start, end = self.size, self.size + len(fresh)
+            while end > len(self._ids):
+                self._grow()
+            rows = slice(start, end)
+            self._ids[rows] = list(fresh)
+            self._lat[rows] = [float(p['lat']) for p in fresh.values()]
+            self._lng[rows] = [float(p['lng']) for p in fresh.values()]
+            self._lat_rad[rows] = np.radians(self._lat[rows])
+            self._lng_rad[rows] = np.radians(self._lng[rows])
+            self._cos_lat[rows] = np.cos(self._lat_rad[rows])
+            self._service[rows] = [self._service_code(p.get('service')) for p in fresh.values()]
+            for row, provider_id in enumerate(fresh, start):
+                self._rows[provider_id] = row
+            self.size = end
+
+    update_many = add_many
+
+    def rebuild(self, providers):
+        self.size = 0
+        self._rows = {}
+        self.add_many(providers)
+
+    def haversine(self, lat, lng, rows=None):
+        """Distances in km from (lat, lng) to every row, or to the given row indices"""
+        if rows is None:
+            rows = slice(0, self.size)
+        lat_rad = np.radians(lat)
+        dlat = self._lat_rad[rows] - lat_rad
+        dlng = self._lng_rad[rows] - np.radians(lng)
+        a = (np.sin(dlat / 2) ** 2 +
+             np.cos(lat_rad) * self._cos_lat[rows] * np.sin(dlng / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def nearest(self, lat, lng, radius, service=None, limit=None):
+        """Return [(provider_id, distance)] within radius km, nearest first"""
+        n = self.size
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius + 0.005)
+        lats = self._lat[:n]
+        lngs = self._lng[:n]
+        mask = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+        if service:
+            code = self._service_codes.get(service.lower())
+            if code is None:
+                return []
+            mask &= self._service[:n] == code
+
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return []
+        distances = np.round(self.haversine(lat, lng, rows), 2)
+        keep = distances <= radius
+        rows = rows[keep]
+        distances = distances[keep]
+        ids = self._ids[rows]
+        order = np.lexsort((ids, distances))
+        if limit is not None:
+            order = order[:limit]
+        return list(zip(ids[order].tolist(), distances[order].tolist()))
+
+    def nearest_many(self, queries):
+        """Run ``nearest`` for each (lat, lng, radius, service, limit) tuple"""
+        return [self.nearest(*query) for query in queries]
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+# Search radii in km; a wave moves to the next one once the nearer pool is used up
+DEFAULT_RADII = (2.0, 5.0, 10.0, 25.0)
+# Providers offered a request per wave
+DEFAULT_WAVE_SIZE = 3
+# How long a wave waits for an accept before the next one goes out
+DEFAULT_WAVE_SECONDS = 30
+
+# Ranking weights in km-equivalents: one missing rating star costs as much as
+# 1.5 km of extra distance, one open job as much as 2 km
+RATING_WEIGHT = 1.5
+LOAD_WEIGHT = 2.0
+
+
+def is_working(provider, now):
+    """Whether ``now`` falls inside the provider's working hours; missing hours mean always"""
+    hours = provider.get('working_hours') or {}
+    start, end = hours.get('start'), hours.get('end')
+    if not start or not end:
+        return True
+    clock = now.strftime('%H:%M')
+    if start <= end:
+        return start <= clock < end
+    # Overnight shift, e.g. 22:00-06:00
+    return clock >= start or clock < end
+
+
+def rank_candidates(candidates, open_jobs, now):
+    """Order (distance, provider) pairs best first, dropping unavailable or off-shift providers"""
+    ranked = []
+    for distance, provider in candidates:
+        if provider.get('availability', 'available') != 'available' or not is_working(provider, now):
+            continue
+        score = (distance
+                 + (5 - (provider.get('rating') or 0)) * RATING_WEIGHT
+                 + open_jobs(provider['id']) * LOAD_WEIGHT)
+        ranked.append((score, distance, provider['id'], provider))
+    ranked.sort(key=lambda r: r[:3])
+    return [(distance, provider) for _, distance, _, provider in ranked]
+
+
+class DispatchState:
+    __slots__ = ('booking_id', 'lat', 'lng', 'service', 'radius_index', 'offered', 'waves',
+                 'exhausted', 'deadline')
+
+    def __init__(self, booking_id, lat, lng, service, offered=()):
+        self.booking_id = booking_id
+        self.lat = lat
+        self.lng = lng
+        self.service = service
+        self.radius_index = 0
+        self.offered = set(offered)
+        self.waves = 0
+        self.exhausted = False
+        self.deadline = None
+
+
+class Dispatcher:
+    """Offers open requests to ranked providers in timed waves until one accepts.
+
+    A single scheduler thread owns a heap of wave deadlines, so thousands of
+    open requests cost one heap entry each rather than a thread or timer
+    apiece, and request threads never wait on a wave. Each wave offers the
+    request to the best ``wave_size`` providers not yet asked within the
+    current radius, widening the radius when nobody is left there; earlier
+    offers stay open. When no one new can be asked and the last wave times
+    out, the request expires.
+
+    Acceptance itself stays with the booking's status transition, which
+    only one accept can win; the dispatcher simply stops once the booking
+    is no longer pending.
+    """
+
+    def __init__(self, bookings, find_providers, open_jobs, on_offer, on_expire, transaction=None,
+                 wave_size=DEFAULT_WAVE_SIZE, wave_seconds=DEFAULT_WAVE_SECONDS, radii=DEFAULT_RADII):
+        self.bookings = bookings
+        # (lat, lng, radius, service) -> [(distance, provider)]
+        self.find_providers = find_providers
+        # provider_id -> number of accepted, unfinished jobs
+        self.open_jobs = open_jobs
+        # Called with (booking, provider_ids, state) after each wave's offers are recorded
+        self.on_offer = on_offer
+        # Called with the booking when nobody accepted in time
+        self.on_expire = on_expire
+        # Context each timed wave runs in, e.g. the shared-state write lock
+        self.transaction = transaction or nullcontext
+        self.wave_size = wave_size
+        self.wave_seconds = wave_seconds
+        self.radii = radii
+        self._open = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._open)
+
+    def dispatch(self, booking, lat, lng, service):
+        """Start offering a pending booking; the first wave goes out before this returns"""
+        state = DispatchState(booking['id'], lat, lng, service,
+                              offered=[p for p in booking.get('provider_ids') or () if p is not None])
+        with self._changed:
+            self._open[booking['id']] = state
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dispatcher', daemon=True)
+                self._thread.start()
+        self._wave(state)
+        return state
+
+    def cancel(self, booking_id):
+        """Stop dispatching a booking (accepted, cancelled or expired); its heap entry goes stale"""
+        with self._changed:
+            return self._open.pop(booking_id, None) is not None
+
+    def _schedule(self, state, delay):
+        with self._changed:
+            if self._open.get(state.booking_id) is not state:
+                return
+            state.deadline = time.monotonic() + delay
+            heapq.heappush(self._heap, (state.deadline, next(self._counter), state))
+            self._changed.notify()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while True:
+                    now = time.monotonic()
+                    # Drop entries for finished requests or superseded deadlines
+                    while self._heap and (self._open.get(self._heap[0][2].booking_id) is not self._heap[0][2]
+                                          or self._heap[0][2].deadline != self._heap[0][0]):
+                        heapq.heappop(self._heap)
+                    if self._heap and self._heap[0][0] <= now:
+                        state = heapq.heappop(self._heap)[2]
+                        break
+                    self._changed.wait(self._heap[0][0] - now if self._heap else None)
+            try:
+                with self.transaction():
+                    self._wave(state)
+            except Exception:
+                # A failed wave must not stop the scheduler; retry the request later
+                self._schedule(state, self.wave_seconds)
+
+    def _wave(self, state):
+        # The booking stays locked for the whole wave, so an accept or cancel lands before or after it
+        with self.bookings.edit(state.booking_id) as booking:
+            if booking is None or booking['status'] != 'pending':
+                self.cancel(state.booking_id)
+                return
+            if state.exhausted:
+                self.cancel(state.booking_id)
+                self.on_expire(booking)
+                return
+
+            now = datetime.now()
+            chosen = []
+            while state.radius_index < len(self.radii):
+                radius = self.radii[state.radius_index]
+                fresh = [(d, p) for d, p in self.find_providers(state.lat, state.lng, radius, state.service)
+                         if p['id'] not in state.offered]
+                chosen = rank_candidates(fresh, self.open_jobs, now)[:self.wave_size]
+                if chosen:
+                    break
+                state.radius_index += 1
+
+            if not chosen:
+                state.exhausted = True
+                if not state.offered:
+                    # Nobody to ask at all
+                    self._wave(state)
+                    return
+                # Give the last offers one more wave to be accepted
+                self._schedule(state, self.wave_seconds)
+                return
+
+            provider_ids = [p['id'] for _, p in chosen]
+            state.offered.update(provider_ids)
+            state.waves += 1
+            self.bookings.offer(booking, provider_ids)
+            self.on_offer(booking, provider_ids, state)
+            self._schedule(state, self.wave_seconds)
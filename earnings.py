@@ -0,0 +1,152 @@
+import threading
+from datetime import date, timedelta
+
+GRANULARITIES = ('daily', 'weekly', 'monthly')
+
+
+class EarningsLedger:
+    """Per-provider earnings rolled up into daily buckets as payments are recorded.
+
+    Each bucket holds the day's total, payment count and a per-service
+    breakdown, so window queries cost one dict lookup per day instead of a
+    scan over every payment ever made.
+    """
+
+    def __init__(self):
+        # Serializes writers; buckets are replaced rather than changed, so readers need no lock
+        self._lock = threading.Lock()
+        # provider_id -> {date: {'amount', 'count', 'services'}}
+        self._daily = {}
+        # provider_id -> {'amount', 'count', 'services'}
+        self._totals = {}
+        # ids of recorded entries, so replaying a journal never double counts
+        self._entry_ids = set()
+        # Called with the entry dict after every record, e.g. to journal it
+        self.listener = None
+
+    def __len__(self):
+        """Number of payments recorded"""
+        return len(self._entry_ids)
+
+    @staticmethod
+    def _empty_bucket():
+        return {'amount': 0, 'count': 0, 'services': {}}
+
+    @staticmethod
+    def _added(bucket, amount, service):
+        """A new bucket: ``bucket`` plus one payment"""
+        services = dict(bucket['services'])
+        services[service] = services.get(service, 0) + amount
+        return {'amount': bucket['amount'] + amount, 'count': bucket['count'] + 1, 'services': services}
+
+    def record(self, provider_id, day, amount, service, entry_id=None):
+        """Add one payment to the provider's day bucket and running totals
+
+        Entries with an ``entry_id`` are recorded at most once; returns False
+        for a duplicate.
+        """
+        return self.record_many([(provider_id, day, amount, service, entry_id)]) == 1
+
+    def record_many(self, entries):
+        """``record`` for a batch of (provider_id, day, amount, service, entry_id) under one lock
+
+        Returns how many entries were new.
+        """
+        recorded = []
+        with self._lock:
+            for provider_id, day, amount, service, entry_id in entries:
+                if entry_id is not None:
+                    if entry_id in self._entry_ids:
+                        continue
+                    self._entry_ids.add(entry_id)
+                days = self._daily.setdefault(provider_id, {})
+                days[day] = self._added(days.get(day) or self._empty_bucket(), amount, service)
+                self._totals[provider_id] = self._added(self._totals.get(provider_id) or self._empty_bucket(),
+                                                        amount, service)
+                recorded.append((provider_id, day, amount, service, entry_id))
+        if self.listener:
+            for provider_id, day, amount, service, entry_id in recorded:
+                self.listener({'provider_id': provider_id, 'date': day.isoformat(), 'amount': amount,
+                               'service': service, 'entry_id': entry_id})
+        return len(recorded)
+
+    def restore(self, entry):
+        """Re-record an entry passed to the listener"""
+        return self.record(entry['provider_id'], parse_date(entry['date']), entry['amount'],
+                           entry['service'], entry['entry_id'])
+
+    def snapshot(self):
+        """Daily buckets and entry ids as plain lists suitable for serializing"""
+        return {
+            'daily': [[provider_id, day.isoformat(), dict(bucket, services=dict(bucket['services']))]
+                      for provider_id, days in list(self._daily.items())
+                      for day, bucket in list(days.items())],
+            'entry_ids': list(self._entry_ids)
+        }
+
+    def load_snapshot(self, state):
+        with self._lock:
+            for provider_id, day, bucket in state['daily']:
+                self._daily.setdefault(provider_id, {})[parse_date(day)] = bucket
+                total = dict(self._totals.get(provider_id) or self._empty_bucket())
+                total['amount'] += bucket['amount']
+                total['count'] += bucket['count']
+                total['services'] = dict(total['services'])
+                for service, amount in bucket['services'].items():
+                    total['services'][service] = total['services'].get(service, 0) + amount
+                self._totals[provider_id] = total
+            self._entry_ids.update(state['entry_ids'])
+
+    def day_total(self, provider_id, day):
+        bucket = self._daily.get(provider_id, {}).get(day)
+        return bucket['amount'] if bucket else 0
+
+    def total(self, provider_id):
+        return self._totals.get(provider_id, {}).get('amount', 0)
+
+    def service_totals(self, provider_id):
+        return dict(self._totals.get(provider_id, {}).get('services', {}))
+
+    def daily(self, provider_id, start, end):
+        """Yield (day, bucket-or-None) for every day in [start, end]"""
+        days = self._daily.get(provider_id, {})
+        day = start
+        while day <= end:
+            yield day, days.get(day)
+            day += timedelta(days=1)
+
+    @staticmethod
+    def period_start(day, granularity):
+        if granularity == 'weekly':
+            return day - timedelta(days=day.weekday())
+        if granularity == 'monthly':
+            return day.replace(day=1)
+        return day
+
+    def series(self, provider_id, start, end, granularity='daily'):
+        """Return [{'start', 'amount', 'count', 'services'}] grouped by granularity
+
+        Periods are clipped to [start, end]; a weekly or monthly bucket only
+        sums the days of that period that fall inside the range.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'granularity must be one of {", ".join(GRANULARITIES)}')
+        periods = []
+        current = current_period = None
+        for day, bucket in self.daily(provider_id, start, end):
+            period = self.period_start(day, granularity)
+            if period != current_period:
+                current_period = period
+                current = {'start': max(period, start), 'amount': 0, 'count': 0, 'services': {}}
+                periods.append(current)
+            if bucket:
+                current['amount'] += bucket['amount']
+                current['count'] += bucket['count']
+                for service, amount in bucket['services'].items():
+                    current['services'][service] = current['services'].get(service, 0) + amount
+        return periods
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD query parameter"""
+    return date.fromisoformat(value)
@@ -0,0 +1,171 @@
+import threading
+import time
+import zlib
+from collections import deque
+
+# Pending jobs per worker before producers feel backpressure
+DEFAULT_MAX_QUEUE = 10_000
+# How long a producer waits for room in a full queue before the job is dropped
+DEFAULT_PUT_TIMEOUT = 0.05
+# Jobs a worker takes off its queue per wakeup
+BATCH_SIZE = 256
+# Events where only the latest pending one per (room, event, field value) matters
+COALESCED_EVENTS = {
+    'job_status_update': 'request_id',
+    'booking_rescheduled': 'request_id',
+    'dispatch_wave': 'request_id',
+}
+
+
+class Job:
+    __slots__ = ('room', 'call', 'args', 'kwargs', 'key', 'queued_at', 'superseded')
+
+    def __init__(self, room, call, args, kwargs, key=None):
+        self.room = room
+        self.call = call
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.queued_at = time.monotonic()
+        self.superseded = False
+
+
+class Lane:
+    """One worker's queue; a room always maps to the same lane, so its events stay in order"""
+
+    __slots__ = ('jobs', 'pending', 'changed', 'thread')
+
+    def __init__(self):
+        self.jobs = deque()
+        # coalescing key -> the job still waiting with that key
+        self.pending = {}
+        self.changed = threading.Condition()
+        self.thread = None
+
+
+class EventBus:
+    """Bounded in-process queue that runs socket emits and other side work off the request path.
+
+    Handlers enqueue and return; worker threads deliver. Every room hashes
+    to one worker lane, so events of a room are delivered in the order they
+    were published while different rooms proceed in parallel. A newer
+    event listed in COALESCED_EVENTS supersedes an undelivered one with the
+    same room, event and key, and moves to the back of the queue so the
+    room's sequence numbers still arrive in increasing order.
+
+    A full lane makes the producer wait up to ``put_timeout`` and then
+    drops the job; missed socket events are still in the EventStream replay
+    buffer. ``stats`` reports depth, waits, drops and delivery latency.
+    """
+
+    def __init__(self, workers=1, max_queue=DEFAULT_MAX_QUEUE, put_timeout=DEFAULT_PUT_TIMEOUT):
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self._lanes = [Lane() for _ in range(max(1, workers))]
+        self._stats_lock = threading.Lock()
+        self.enqueued = self.delivered = self.coalesced = self.dropped = self.failed = 0
+        self.producer_waits = 0
+        self.producer_wait_seconds = 0.0
+        self.max_depth = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _lane(self, room):
+        return self._lanes[zlib.crc32(str(room).encode()) % len(self._lanes)]
+
+    def submit(self, call, *args, room=None, **kwargs):
+        """Run ``call(*args, **kwargs)`` on a worker; returns False if the job was dropped"""
+        return self._put(Job(room, call, args, kwargs))
+
+    def emitter(self, deliver):
+        """An ``emit(event, data, room=...)`` that queues ``deliver`` with coalescing"""
+        def emit(event, data, room=None):
+            field = COALESCED_EVENTS.get(event)
+            key = (room, event, data.get(field)) if field and data.get(field) is not None else None
+            return self._put(Job(room, deliver, (event, data), {'room': room}, key))
+        return emit
+
+    def _put(self, job):
+        lane = self._lane(job.room)
+        with lane.changed:
+            if lane.thread is None:
+                lane.thread = threading.Thread(target=self._run, args=(lane,), name='event-bus', daemon=True)
+                lane.thread.start()
+            if len(lane.jobs) >= self.max_queue:
+                started = time.monotonic()
+                lane.changed.wait_for(lambda: len(lane.jobs) < self.max_queue, self.put_timeout)
+                with self._stats_lock:
+                    self.producer_waits += 1
+                    self.producer_wait_seconds += time.monotonic() - started
+                if len(lane.jobs) >= self.max_queue:
+                    with self._stats_lock:
+                        self.dropped += 1
+                    return False
+            if job.key is not None:
+                previous = lane.pending.get(job.key)
+                if previous is not None:
+                    previous.superseded = True
+                    with self._stats_lock:
+                        self.coalesced += 1
+                lane.pending[job.key] = job
+            lane.jobs.append(job)
+            depth = len(lane.jobs)
+            lane.changed.notify_all()
+        with self._stats_lock:
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, depth)
+        return True
+
+    def _run(self, lane):
+        while True:
+            with lane.changed:
+                while not lane.jobs:
+                    lane.changed.wait()
+                batch = [lane.jobs.popleft() for _ in range(min(BATCH_SIZE, len(lane.jobs)))]
+                for job in batch:
+                    if job.key is not None and lane.pending.get(job.key) is job:
+                        del lane.pending[job.key]
+                # Wake producers waiting for room
+                lane.changed.notify_all()
+            for job in batch:
+                if job.superseded:
+                    continue
+                try:
+                    job.call(*job.args, **job.kwargs)
+                except Exception:
+                    with self._stats_lock:
+                        self.failed += 1
+                    continue
+                latency = time.monotonic() - job.queued_at
+                with self._stats_lock:
+                    self.delivered += 1
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+
+    def depth(self):
+        return sum(len(lane.jobs) for lane in self._lanes)
+
+    def flush(self, timeout=5):
+        """Wait until every queued job has been taken by a worker"""
+        deadline = time.monotonic() + timeout
+        for lane in self._lanes:
+            with lane.changed:
+                lane.changed.wait_for(lambda: not lane.jobs, max(0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'workers': len(self._lanes),
+                'depth': self.depth(),
+                'max_depth': self.max_depth,
+                'capacity': self.max_queue * len(self._lanes),
+                'enqueued': self.enqueued,
+                'delivered': self.delivered,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'producer_waits': self.producer_waits,
+                'producer_wait_seconds': round(self.producer_wait_seconds, 4),
+                'avg_latency_ms': round(self.latency_total / self.delivered * 1000, 3) if self.delivered else None,
+                'max_latency_ms': round(self.latency_max * 1000, 3)
+            }
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+
+# Events kept per room for reconnect replay and long-poll catch-up
+REPLAY_BUFFER_SIZE = 200
+# Rooms with no new events for this long drop their replay buffer (their seq is kept)
+IDLE_ROOM_SECONDS = 60 * 60
+MAX_WAIT_SECONDS = 30
+
+
+class Room:
+    __slots__ = ('seq', 'events', 'updated_at')
+
+    def __init__(self, buffer_size):
+        self.seq = 0
+        self.events = deque(maxlen=buffer_size)
+        self.updated_at = time.time()
+
+
+class EventStream:
+    """Sequenced per-room event log behind Socket.IO emits and the long-poll fallback.
+
+    Every published event gets the next sequence number of its room and is
+    kept in a bounded replay buffer. Reconnecting sockets and HTTP clients
+    pass the last sequence they saw and receive only what they missed; if
+    that is older than the buffer they are told to resync from scratch.
+    An idle room's buffer is freed but its sequence number is kept, so
+    clients that saw its earlier events still accept the next one.
+    """
+
+    def __init__(self, emit=None, buffer_size=REPLAY_BUFFER_SIZE, idle_seconds=IDLE_ROOM_SECONDS):
+        self.emit = emit
+        self.buffer_size = buffer_size
+        self.idle_seconds = idle_seconds
+        self._rooms = {}
+        # room -> last seq of a room whose buffer was swept while idle
+        self._idle_seqs = {}
+        self._changed = threading.Condition()
+        # Recorded events waiting to be handed to ``emit``, in sequence order
+        self._outbox = deque()
+        # Held by the thread handing the outbox over, so emits keep that order
+        self._emitting = threading.Lock()
+        self._last_sweep = time.time()
+        # Called with (event, payload, room) for every published event, e.g. to
+        # share it with other worker processes
+        self.listener = None
+
+    def publish(self, event, payload, room):
+        """Record an event for a room, wake long-pollers and emit it to sockets"""
+        if self.listener:
+            self.listener(event, payload, room)
+        return self._append(event, payload, room, emit=True)
+
+    def replay(self, event, payload, room, emit=False):
+        """Record an event published by another worker; ``emit`` also sends it to local sockets"""
+        return self._append(event, payload, room, emit)
+
+    def _append(self, event, payload, room, emit):
+        with self._changed:
+            state = self._rooms.get(room)
+            if state is None:
+                state = self._rooms[room] = Room(self.buffer_size)
+                state.seq = self._idle_seqs.pop(room, 0)
+            state.seq += 1
+            state.updated_at = time.time()
+            seq = state.seq
+            data = {**payload, 'seq': seq, 'room': room}
+            state.events.append((seq, event, data))
+            self._changed.notify_all()
+            self._sweep(state.updated_at)
+            if emit and self.emit:
+                self._outbox.append((event, data, room))
+        # Emit with the room lock released, so a slow emit never holds up publishers or long-polls
+        self._flush_outbox()
+        return seq
+
+    def _flush_outbox(self):
+        """Hand queued events to ``emit`` in order; if another thread is at it, leave them to it"""
+        while self._outbox:
+            if not self._emitting.acquire(blocking=False):
+                # The holder checks the outbox again after releasing, so nothing is stranded
+                return
+            try:
+                while self._outbox:
+                    event, data, room = self._outbox.popleft()
+                    self.emit(event, data, room=room)
+            finally:
+                self._emitting.release()
+
+    def _sweep(self, now):
+        if now - self._last_sweep < self.idle_seconds:
+            return
+        self._last_sweep = now
+        for room in [r for r, s in self._rooms.items() if now - s.updated_at >= self.idle_seconds]:
+            self._idle_seqs[room] = self._rooms.pop(room).seq
+
+    def last_seq(self, room):
+        state = self._rooms.get(room)
+        return state.seq if state else self._idle_seqs.get(room, 0)
+
+    def since(self, room, seq):
+        """Return (events after seq, reset) where reset means the gap can't be replayed"""
+        state = self._rooms.get(room)
+        if state is None:
+            # A swept room has no buffer; only a client that saw its last event is up to date
+            return [], seq != self._idle_seqs.get(room, 0)
+        if seq >= state.seq:
+            return [], seq > state.seq
+        if not state.events or state.events[0][0] > seq + 1:
+            return list(state.events), True
+        return [e for e in state.events if e[0] > seq], False
+
+    def wait(self, room, seq, timeout=MAX_WAIT_SECONDS):
+        """Block until the room has events after seq or the timeout expires"""
+        deadline = time.time() + min(timeout, MAX_WAIT_SECONDS)
+        with self._changed:
+            while self.last_seq(room) <= seq:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return self.since(room, seq)
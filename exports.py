@@ -0,0 +1,151 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from receipts import draw_receipt, render_receipt_pdf
+
+CHUNK_SIZE = 64 * 1024
+# Receipts rendered ahead of the one being streamed
+RENDER_WINDOW = 8
+DEFAULT_PROCESSES = 2
+# Receipts in one statement PDF; ReportLab writes a document only once every
+# page is drawn, so a statement is held in full before its first byte goes out
+MAX_STATEMENT_RECEIPTS = 1000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def export_pool():
+    """Process pool shared by exports, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps the workers clear of the server's threads and sockets
+            _pool = ProcessPoolExecutor(max_workers=DEFAULT_PROCESSES,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink that hands written bytes back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _rendered(receipts, cache=None):
+    """Yield (receipt, pdf bytes) in order, rendering a bounded window ahead on the pool"""
+    pool = export_pool()
+    window = deque()
+    for receipt in receipts:
+        cached = cache.get(receipt['receipt_id']) if cache is not None else None
+        window.append((receipt, cached.data if cached else pool.submit(render_receipt_pdf, receipt)))
+        if len(window) >= RENDER_WINDOW:
+            receipt, pdf = window.popleft()
+            yield receipt, pdf if isinstance(pdf, bytes) else pdf.result()
+    for receipt, pdf in window:
+        yield receipt, pdf if isinstance(pdf, bytes) else pdf.result()
+
+
+def stream_receipts_zip(receipts, cache=None):
+    """Yield a ZIP archive with one PDF per receipt, a chunk at a time"""
+    sink = _ChunkSink()
+    # PDFs are already compressed, so entries are stored as-is
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for receipt, pdf in _rendered(receipts, cache):
+            archive.writestr(f'receipt_{receipt["receipt_id"]}.pdf', pdf)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+
+def render_statement_pdf(path, title, period, receipts):
+    """Write a summary page plus one page per receipt to ``path``; runs in a pool worker"""
+    p = canvas.Canvas(path, pagesize=letter)
+    p.setFont("Helvetica-Bold", 20)
+    p.drawString(100, 750, "LocalServe - Provider Statement")
+    p.setFont("Helvetica", 12)
+    p.drawString(100, 720, f"Provider: {title}")
+    p.drawString(100, 700, f"Period: {period}")
+    p.drawString(100, 680, f"Receipts: {len(receipts)}")
+
+    total = 0
+    y = 640
+    for receipt in receipts:
+        try:
+            total += float(receipt.get('payment_amount') or 0)
+        except (TypeError, ValueError):
+            pass
+        if y < 80:
+            p.showPage()
+            p.setFont("Helvetica", 12)
+            y = 750
+        p.drawString(100, y, f"{receipt.get('payment_at')}  {receipt.get('receipt_id')}  "
+                             f"{receipt.get('service_type')}  ₹{receipt.get('payment_amount')}")
+        y -= 18
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(100, max(y - 20, 40), f"Total: ₹{total:g}")
+    p.showPage()
+
+    for receipt in receipts:
+        draw_receipt(p, receipt)
+        p.showPage()
+    p.save()
+
+
+def stream_statement_pdf(title, period, receipts):
+    """Render a statement on the process pool into a temp file and return a generator of its chunks
+
+    Unlike the ZIP export, nothing can be sent until the whole PDF is
+    rendered, so the receipts are gathered up front and capped: ValueError
+    if there are more than ``MAX_STATEMENT_RECEIPTS``, raised before any
+    response starts.
+    """
+    receipts = list(islice(receipts, MAX_STATEMENT_RECEIPTS + 1))
+    if len(receipts) > MAX_STATEMENT_RECEIPTS:
+        raise ValueError(f'a statement PDF holds at most {MAX_STATEMENT_RECEIPTS} receipts; '
+                         'narrow the range or use format=zip')
+    return _stream_statement_file(title, period, receipts)
+
+
+def _stream_statement_file(title, period, receipts):
+    fd, path = tempfile.mkstemp(suffix='.pdf', prefix='statement_')
+    os.close(fd)
+    try:
+        export_pool().submit(render_statement_pdf, path, title, period, receipts).result()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
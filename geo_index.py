@@ -0,0 +1,168 @@
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+# Grid cell edge in degrees (~1.1 km of latitude)
+DEFAULT_CELL_SIZE = 0.01
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two coordinates in km"""
+    R = EARTH_RADIUS_KM
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon / 2) ** 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return round(R * c, 2)
+
+
+def bounding_box(lat, lng, radius):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing a radius in km"""
+    dlat = radius / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 89.9)))
+    dlng = min(radius / (KM_PER_DEGREE * cos_lat), 180.0)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+class GeoIndex:
+    """Grid-bucket spatial index over providers, partitioned by service.
+
+    Providers are stored by reference. Call ``update`` with the new record
+    whenever a provider is replaced or its ``lat``, ``lng`` or ``service``
+    may have changed. Writers take a lock and replace a bucket instead of
+    resizing it, so queries run without locking.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        # service key -> {(cell_x, cell_y): {provider_id: provider}}
+        self._partitions = {}
+        # provider_id -> (service key, cell)
+        self._locations = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._locations)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    @staticmethod
+    def _service_key(service):
+        return (service or '').lower()
+
+    def add(self, provider):
+        """Index a provider, replacing any previous entry with the same id"""
+        key = self._service_key(provider.get('service'))
+        cell = self._cell(provider['lat'], provider['lng'])
+        with self._lock:
+            self._add(provider, key, cell)
+
+    def _add(self, provider, key, cell):
+        self._remove(provider['id'])
+        partition = self._partitions.setdefault(key, {})
+        partition[cell] = {**partition.get(cell, {}), provider['id']: provider}
+        self._locations[provider['id']] = (key, cell)
+
+    def _remove(self, provider_id):
+        location = self._locations.pop(provider_id, None)
+        if location is None:
+            return
+        key, cell = location
+        partition = self._partitions[key]
+        bucket = {pid: provider for pid, provider in partition[cell].items() if pid != provider_id}
+        if bucket:
+            partition[cell] = bucket
+        else:
+            del partition[cell]
+            if not partition:
+                del self._partitions[key]
+
+    def update(self, provider):
+        """Re-bucket a provider if its service or coordinates changed, else swap in the new record"""
+        key = self._service_key(provider.get('service'))
+        cell = self._cell(provider['lat'], provider['lng'])
+        with self._lock:
+            if self._locations.get(provider['id']) != (key, cell):
+                self._add(provider, key, cell)
+            else:
+                # Same size, so a query iterating the bucket is unaffected
+                self._partitions[key][cell][provider['id']] = provider
+
+    def update_many(self, providers):
+        """``update`` for a batch, copying each bucket that gains providers once"""
+        placed = {p['id']: (p, self._service_key(p.get('service')), self._cell(p['lat'], p['lng']))
+                  for p in providers}
+        with self._lock:
+            moved = {}
+            for provider, key, cell in placed.values():
+                if self._locations.get(provider['id']) == (key, cell):
+                    self._partitions[key][cell][provider['id']] = provider
+                    continue
+                self._remove(provider['id'])
+                moved.setdefault((key, cell), {})[provider['id']] = provider
+                self._locations[provider['id']] = (key, cell)
+            for (key, cell), added in moved.items():
+                partition = self._partitions.setdefault(key, {})
+                partition[cell] = {**partition.get(cell, {}), **added}
+
+    def rebuild(self, providers):
+        partitions = {}
+        locations = {}
+        for provider in providers:
+            key = self._service_key(provider.get('service'))
+            cell = self._cell(provider['lat'], provider['lng'])
+            partitions.setdefault(key, {}).setdefault(cell, {})[provider['id']] = provider
+            locations[provider['id']] = (key, cell)
+        with self._lock:
+            self._partitions = partitions
+            self._locations = locations
+
+    def _candidate_buckets(self, partition, min_cell, max_cell):
+        """Yield buckets overlapping the cell range, walking whichever is smaller"""
+        (min_x, min_y), (max_x, max_y) = min_cell, max_cell
+        span = (max_x - min_x + 1) * (max_y - min_y + 1)
+        if span > len(partition):
+            for (x, y), bucket in list(partition.items()):
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    yield bucket
+            return
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                bucket = partition.get((x, y))
+                if bucket:
+                    yield bucket
+
+    def candidates(self, lat, lng, radius, service=None):
+        """Yield providers inside the bounding box of the search radius"""
+        # Distances are rounded to 0.01 km, so widen the box by half a step
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius + 0.005)
+        min_cell = self._cell(min_lat, min_lng)
+        max_cell = self._cell(max_lat, max_lng)
+
+        if service:
+            partition = self._partitions.get(self._service_key(service))
+            partitions = [partition] if partition else []
+        else:
+            partitions = list(self._partitions.values())
+
+        for partition in partitions:
+            for bucket in self._candidate_buckets(partition, min_cell, max_cell):
+                for provider in bucket.values():
+                    if (min_lat <= provider['lat'] <= max_lat and
+                            min_lng <= provider['lng'] <= max_lng):
+                        yield provider
+
+    def query(self, lat, lng, radius, service=None):
+        """Return [(distance, provider)] within radius km, nearest first"""
+        results = []
+        for provider in self.candidates(lat, lng, radius, service):
+            distance = calculate_distance(lat, lng, provider['lat'], provider['lng'])
+            if distance <= radius:
+                results.append((distance, provider))
+        results.sort(key=lambda item: (item[0], item[1]['id']))
+        return results
@@ -0,0 +1,33 @@
+import threading
+from contextlib import ExitStack
+
+# Locks shared out among all keys; more stripes mean fewer unrelated collisions
+DEFAULT_STRIPES = 256
+
+
+class KeyedLocks:
+    """Per-entity locks (one booking, one provider) from a fixed pool of stripes.
+
+    A key hashes to one of ``stripes`` re-entrant locks, so memory stays
+    constant however many entities exist and taking a lock is O(1). Two
+    keys sharing a stripe only wait on each other briefly. The locks are
+    re-entrant, so a handler may take the lock of an entity it already holds,
+    and ``many`` acquires stripes in index order, so batches never deadlock.
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def _index(self, key):
+        return hash(key) % len(self._locks)
+
+    def __call__(self, key):
+        """The lock guarding ``key``, for use in a ``with`` statement"""
+        return self._locks[self._index(key)]
+
+    def many(self, keys):
+        """A context holding the locks of all ``keys`` at once"""
+        stack = ExitStack()
+        for index in sorted({self._index(key) for key in keys}):
+            stack.enter_context(self._locks[index])
+        return stack
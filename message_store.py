@@ -0,0 +1,186 @@
+import itertools
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+# Oldest messages are dropped once a single conversation exceeds this
+MAX_MESSAGES_PER_CONVERSATION = 1000
+# How long a closed booking's chat stays readable before it is evicted
+CLOSED_RETENTION_SECONDS = 24 * 60 * 60
+# Closed chats past retention are swept at most this often as messages arrive
+SWEEP_INTERVAL_SECONDS = 60
+# Above this many messages in all, closed chats are evicted oldest first before their retention ends
+MAX_MESSAGES = 1_000_000
+
+
+class Conversation:
+    """Append-only message segment for one booking, searchable by id
+
+    Ids and messages sit together in one ``segment`` tuple. Appends extend
+    the messages before the ids, and a trim publishes a new tuple, so a
+    reader that takes the tuple once always finds a message for every id.
+    """
+
+    __slots__ = ('segment',)
+
+    def __init__(self):
+        self.segment = ([], [])
+
+    @property
+    def messages(self):
+        return self.segment[1]
+
+    def append(self, message, max_messages):
+        """Append a message and return how many old messages were trimmed"""
+        ids, messages = self.segment
+        messages.append(message)
+        ids.append(message['id'])
+        if len(messages) <= max_messages:
+            return 0
+        # Trim in one slice so the amortized cost per append stays O(1)
+        drop = len(messages) - max_messages // 2
+        self.segment = (ids[drop:], messages[drop:])
+        return drop
+
+    def page(self, after_id=None, before_id=None, limit=None):
+        ids, messages = self.segment
+        lo = bisect_right(ids, after_id) if after_id is not None else 0
+        hi = bisect_left(ids, before_id) if before_id is not None else len(ids)
+        if limit is not None and hi - lo > limit:
+            # Walking backwards from before_id returns the newest page
+            if before_id is not None or after_id is None:
+                lo = hi - limit
+            else:
+                hi = lo + limit
+        return messages[lo:hi]
+
+
+class MessageStore:
+    """Chat messages grouped per booking with monotonic ids and closed-chat retention
+
+    Closed chats are evicted once their retention window passes, checked
+    when a chat closes and, at most every ``sweep_interval`` seconds, when
+    a message arrives. If the store grows past ``max_messages`` the oldest
+    closed chats go early.
+    """
+
+    def __init__(self, max_per_conversation=MAX_MESSAGES_PER_CONVERSATION,
+                 retention_seconds=CLOSED_RETENTION_SECONDS, on_evict=None,
+                 sweep_interval=SWEEP_INTERVAL_SECONDS, max_messages=MAX_MESSAGES):
+        self.max_per_conversation = max_per_conversation
+        self.retention_seconds = retention_seconds
+        self.on_evict = on_evict
+        self.sweep_interval = sweep_interval
+        self.max_messages = max_messages
+        self._next_sweep = 0
+        self._ids = itertools.count(1)
+        self._conversations = {}
+        self._count = 0
+        # request_id -> time closed, oldest first
+        self._closed = OrderedDict()
+        self._max_id = 0
+        # Writers allocate ids and append under this lock; readers go without
+        self._lock = threading.Lock()
+        # Called with (op, payload) for 'message' and 'chat_closed', e.g. to journal them
+        self.listener = None
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def conversation_count(self):
+        return len(self._conversations)
+
+    def add(self, request_id, sender, text, timestamp, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            message = {
+                'id': next(self._ids),
+                'request_id': request_id,
+                'sender': sender,
+                'message': text,
+                'timestamp': timestamp
+            }
+            self._append(message)
+            if now >= self._next_sweep or self._count > self.max_messages:
+                self._next_sweep = now + self.sweep_interval
+                self._evict_expired(now)
+        if self.listener:
+            self.listener('message', message)
+        return message
+
+    def restore(self, message):
+        """Re-append a recovered message; ids already present are skipped"""
+        with self._lock:
+            conversation = self._conversations.get(message['request_id'])
+            ids = conversation.segment[0] if conversation is not None else None
+            if ids and ids[-1] >= message['id']:
+                return
+            if message['id'] > self._max_id:
+                self._max_id = message['id']
+                self._ids = itertools.count(message['id'] + 1)
+            self._append(message)
+
+    def _append(self, message):
+        request_id = message['request_id']
+        conversation = self._conversations.get(request_id)
+        if conversation is None:
+            conversation = self._conversations[request_id] = Conversation()
+        self._count += 1 - conversation.append(message, self.max_per_conversation)
+        if request_id in self._closed:
+            # Late messages on a closed booking restart its retention window
+            del self._closed[request_id]
+            self._closed[request_id] = time.time()
+
+    def page(self, request_id, after_id=None, before_id=None, limit=None):
+        """Messages with after_id < id < before_id, at most ``limit`` of them"""
+        conversation = self._conversations.get(request_id)
+        if conversation is None:
+            return []
+        return conversation.page(after_id, before_id, limit)
+
+    def close(self, request_id, now=None):
+        """Mark a booking's chat as closed and evict chats past their retention window"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._closed.pop(request_id, None)
+            self._closed[request_id] = now
+        if self.listener:
+            self.listener('chat_closed', {'request_id': request_id, 'closed_at': now})
+        self.evict_expired(now)
+
+    def evict_expired(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._evict_expired(now)
+
+    def _evict_expired(self, now):
+        evicted = 0
+        while self._closed:
+            request_id, closed_at = next(iter(self._closed.items()))
+            if now - closed_at < self.retention_seconds and self._count <= self.max_messages:
+                break
+            del self._closed[request_id]
+            conversation = self._conversations.pop(request_id, None)
+            if conversation is not None:
+                self._count -= len(conversation.messages)
+                if self.on_evict:
+                    self.on_evict(request_id, conversation.messages)
+            evicted += 1
+        return evicted
+
+    def snapshot(self):
+        """Conversations and close times as plain lists suitable for serializing"""
+        return {
+            'conversations': [[request_id, list(c.messages)] for request_id, c in list(self._conversations.items())],
+            'closed': [[request_id, closed_at] for request_id, closed_at in list(self._closed.items())]
+        }
+
+    def load_snapshot(self, state):
+        for request_id, conversation in state['conversations']:
+            for message in conversation:
+                self.restore(message)
+        with self._lock:
+            for request_id, closed_at in state['closed']:
+                self._closed[request_id] = closed_at
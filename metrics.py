@@ -0,0 +1,261 @@
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as Tally, deque
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# How often the profiler looks at requests that are still running
+PROFILE_INTERVAL = 0.005
+# Slow request reports kept for /metrics/slow
+MAX_SLOW_REPORTS = 50
+# Frames kept from the innermost end of each sampled stack
+MAX_STACK_DEPTH = 40
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of series keyed by label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for rendering"""
+        with self._lock:
+            series = list(self._series.items())
+        for labels, value in series:
+            yield '', labels, (), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(self.labelnames, labels, extra)} {format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._series.get(labels, 0)
+
+
+class Gauge(Metric):
+    """A value that is either set directly or read from ``collect`` at scrape time.
+
+    ``collect`` returns an iterable of (label values tuple, value) pairs, so
+    sizes of stores and queues are read when /metrics is scraped rather than
+    tracked on every change.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), collect=None, kind=None):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+        if kind:
+            self.kind = kind
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._series[labels] = value
+
+    def samples(self):
+        yield from super().samples()
+        if self.collect is not None:
+            for labels, value in self.collect():
+                yield '', tuple(labels), (), value
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            # Index len(buckets) is the +Inf bucket
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float('inf'),), counts):
+                cumulative += hits
+                yield '_bucket', labels, (('le', format_value(float(bound))),), cumulative
+            yield '_sum', labels, (), round(total, 6)
+            yield '_count', labels, (), count
+
+
+class MetricsRegistry:
+    """The metrics of one process, rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), collect=None, kind=None):
+        return self.register(Gauge(name, help, labelnames, collect, kind))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class Trace:
+    __slots__ = ('label', 'thread_id', 'started', 'stacks', 'samples')
+
+    def __init__(self, label, thread_id):
+        self.label = label
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.stacks = Tally()
+        self.samples = 0
+
+
+def collapse(frame):
+    """A stack as 'file:function:line' entries, outermost first"""
+    entries = []
+    while frame is not None and len(entries) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        entries.append(f'{code.co_filename.rsplit("/", 1)[-1]}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    return tuple(reversed(entries))
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of requests that run past a latency threshold.
+
+    A sampled request registers its thread on ``start``. A background thread
+    wakes every ``interval`` seconds while requests are in flight and, for
+    each one that has been running longer than ``threshold`` seconds, records
+    the thread's current stack. When such a request finishes, its collapsed
+    stacks and their sample counts are kept as a report, newest first, so the
+    frames that dominate slow requests show up without attaching a debugger.
+    Fast requests cost two dict operations and are never walked.
+    """
+
+    def __init__(self, threshold, sample_rate=1.0, interval=PROFILE_INTERVAL, keep=MAX_SLOW_REPORTS):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._reports = deque(maxlen=keep)
+        self._traces = {}
+        self._lock = threading.Lock()
+        self._busy = threading.Event()
+        self._thread = None
+        self.slow = 0
+
+    def start(self, label):
+        """Begin tracing the calling thread; returns a token for ``finish`` or None if not sampled"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+        trace = Trace(label, threading.get_ident())
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-profiler', daemon=True)
+                self._thread.start()
+            self._traces[id(trace)] = trace
+            self._busy.set()
+        return trace
+
+    def finish(self, trace):
+        """Stop tracing; returns the report if the request was slow"""
+        if trace is None:
+            return None
+        duration = time.perf_counter() - trace.started
+        with self._lock:
+            self._traces.pop(id(trace), None)
+            if not self._traces:
+                self._busy.clear()
+        if duration < self.threshold:
+            return None
+        report = {
+            'label': trace.label,
+            'duration_ms': round(duration * 1000, 3),
+            'samples': trace.samples,
+            'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'stacks': [{'count': count, 'frames': list(stack)} for stack, count in trace.stacks.most_common(10)]
+        }
+        with self._lock:
+            self.slow += 1
+            self._reports.appendleft(report)
+        return report
+
+    def _run(self):
+        while True:
+            self._busy.wait()
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self._lock:
+                overdue = [t for t in self._traces.values() if now - t.started >= self.threshold]
+            if not overdue:
+                continue
+            frames = sys._current_frames()
+            for trace in overdue:
+                frame = frames.get(trace.thread_id)
+                # Skip a request that finished since the overdue list was taken
+                if frame is not None and id(trace) in self._traces:
+                    trace.stacks[collapse(frame)] += 1
+                    trace.samples += 1
+            del frames
+
+    def reports(self, limit=None):
+        with self._lock:
+            reports = list(self._reports)
+        return reports[:limit] if limit else reports
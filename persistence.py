@@ -0,0 +1,404 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from records import json_default
+
+SNAPSHOT_FILE = 'snapshot.json'
+SEGMENT_PREFIX = 'wal-'
+SEGMENT_SUFFIX = '.log'
+# How long the writer gathers records before one write + fsync
+FLUSH_INTERVAL = 0.05
+# Take a snapshot (and drop old segments) after this many records
+SNAPSHOT_EVERY = 50_000
+# How often a shared-log worker pulls records appended by other workers
+POLL_INTERVAL = 0.05
+# Workers silent for longer than this no longer hold back log compaction
+WORKER_TIMEOUT = 60
+
+
+class Journal:
+    """Append-only, group-committed write-ahead log with periodic snapshots.
+
+    ``record`` only serializes the mutation and queues it; a writer thread
+    appends everything queued since its last pass to the current segment
+    file and fsyncs once per batch, so request threads never wait on disk.
+    Every record is an idempotent upsert, which lets snapshots be captured
+    from live state without stopping writers: replaying the log tail after
+    a snapshot converges to the same state.
+
+    Records are JSON lines ``[seq, op, payload]``. Segments are named after
+    the first sequence number they hold; a snapshot at seq S makes every
+    segment whose successor starts at or below S + 1 obsolete.
+    """
+
+    def __init__(self, directory, flush_interval=FLUSH_INTERVAL, snapshot_every=SNAPSHOT_EVERY):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_source = None
+        self.seq = 0
+        self.durable_seq = 0
+        self.snapshot_seq = 0
+        self._queue = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._segment = None
+        self._rotate = False
+        self._closed = False
+        self._writer = None
+        self._snapshotting = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # Recovery
+
+    def _segments(self):
+        names = [n for n in os.listdir(self.directory)
+                 if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)]
+        return sorted((int(n[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]), n) for n in names)
+
+    def recover(self, apply):
+        """Load the latest snapshot and replay newer log records through ``apply``
+
+        ``apply('snapshot', state)`` is called first when a snapshot exists,
+        then ``apply(op, payload)`` for every record after it. Returns the
+        number of log records replayed.
+        """
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.snapshot_seq = self.seq = snapshot['seq']
+            apply('snapshot', snapshot['state'])
+
+        replayed = 0
+        for _, name in self._segments():
+            with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        seq, op, payload = json.loads(line)
+                    except ValueError:
+                        # Torn final write from a crash; nothing after it was acknowledged
+                        break
+                    if seq <= self.seq:
+                        continue
+                    apply(op, payload)
+                    self.seq = seq
+                    replayed += 1
+        self.durable_seq = self.seq
+        return replayed
+
+    # Writing
+
+    def start(self):
+        self._writer = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._writer.start()
+
+    def record(self, op, payload):
+        """Queue a mutation for the log and return its sequence number"""
+        # Encode outside the lock; only the sequence number is assigned under it
+        body = json.dumps([op, payload], default=json_default, ensure_ascii=False)
+        with self._lock:
+            self.seq += 1
+            self._queue.append(f'[{self.seq},{body[1:]}')
+            return self.seq
+
+    def _open_segment(self, first_seq):
+        name = f'{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}'
+        return open(os.path.join(self.directory, name), 'a', encoding='utf-8')
+
+    def _run(self):
+        since_snapshot = 0
+        while True:
+            with self._lock:
+                if not self._queue and not self._closed:
+                    self._wakeup.wait(self.flush_interval)
+                batch, self._queue = self._queue, []
+                last_seq = self.seq
+                rotate, self._rotate = self._rotate, False
+                closed = self._closed
+
+            if rotate and self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            if batch:
+                if self._segment is None:
+                    self._segment = self._open_segment(last_seq - len(batch) + 1)
+                self._segment.write('\n'.join(batch) + '\n')
+                self._segment.flush()
+                os.fsync(self._segment.fileno())
+                with self._lock:
+                    self.durable_seq = last_seq
+                since_snapshot += len(batch)
+
+            if since_snapshot >= self.snapshot_every and self.snapshot_source:
+                since_snapshot = 0
+                threading.Thread(target=self.snapshot, name='journal-snapshot', daemon=True).start()
+            if closed:
+                if self._segment is not None:
+                    self._segment.close()
+                return
+
+    # Snapshots
+
+    def snapshot(self):
+        """Write a compact snapshot of current state and drop segments it covers"""
+        if not self.snapshot_source or not self._snapshotting.acquire(blocking=False):
+            return None
+        try:
+            with self._lock:
+                seq = self.seq
+                # Records after seq go to a fresh segment, so older ones can be deleted
+                self._rotate = True
+            state = self.snapshot_source()
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'seq': seq, 'taken_at': time.time(), 'state': state}, f,
+                          default=json_default, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            self.snapshot_seq = seq
+            self._drop_segments(seq)
+            return seq
+        finally:
+            self._snapshotting.release()
+
+    def _drop_segments(self, snapshot_seq):
+        segments = self._segments()
+        for (_, name), (next_first, _) in zip(segments, segments[1:]):
+            if next_first <= snapshot_seq + 1:
+                os.remove(os.path.join(self.directory, name))
+
+    def close(self, snapshot=True):
+        """Flush queued records, stop the writer and optionally snapshot"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        if snapshot:
+            self.snapshot()
+
+
+class SharedLog:
+    """Change log in a SQLite database shared by several worker processes.
+
+    Every worker keeps its own in-memory stores and treats them as a
+    replica of the log. A check-and-set, such as accepting a booking or
+    allocating an id, runs between ``begin`` and ``end`` (or inside
+    ``write``): ``begin`` takes SQLite's write lock and applies everything
+    other workers appended since this worker last looked, so the check
+    sees the latest state; ``end`` appends the records queued by ``record``
+    and commits. Only that state change holds the lock, never a whole
+    request. A ``record`` outside a write is appended on its own. Reads
+    call ``catch_up`` first, and a tailer thread keeps applying new records
+    so long-polls and socket rooms hear about other workers' events.
+
+    Records are the same ``(op, payload)`` upserts the single-process
+    ``Journal`` writes, so the same ``apply`` callback replays both.
+    """
+
+    def __init__(self, path, worker_id=None, poll_interval=POLL_INTERVAL, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.worker_id = worker_id or f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.poll_interval = poll_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_source = None
+        # Called from the tailer about once a second, e.g. to take over a dead worker's work
+        self.upkeep = None
+        self.apply = None
+        self.seq = 0
+        self.snapshot_seq = 0
+        self._pending = []
+        self._depth = 0
+        self._applying = False
+        # Held for a write transaction and while applying records, so request
+        # threads of this process never see a half-applied batch
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._tailer = None
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS log (
+                seq INTEGER PRIMARY KEY, op TEXT NOT NULL, payload TEXT NOT NULL, worker TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS snapshot (
+                id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL, state TEXT NOT NULL, taken_at REAL);
+            CREATE TABLE IF NOT EXISTS workers (
+                worker TEXT PRIMARY KEY, seq INTEGER NOT NULL, seen_at REAL NOT NULL);
+        """)
+
+    # Reading
+
+    def recover(self, apply):
+        """Load the shared snapshot and every newer record; ``apply`` is kept for later catch-ups"""
+        self.apply = apply
+        with self._lock:
+            # Under the write lock so no worker compacts between the snapshot and the tail
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._db.execute('SELECT seq, state FROM snapshot WHERE id = 1').fetchone()
+                if row is not None:
+                    self.snapshot_seq = self.seq = row[0]
+                    apply('snapshot', json.loads(row[1]))
+                replayed = self._apply_new()
+                self._db.execute('INSERT OR REPLACE INTO workers (worker, seq, seen_at) VALUES (?, ?, ?)',
+                                 (self.worker_id, self.seq, time.time()))
+            finally:
+                self._db.execute('COMMIT')
+            return replayed
+
+    def _apply_new(self):
+        rows = self._db.execute('SELECT seq, op, payload FROM log WHERE seq > ? ORDER BY seq',
+                                (self.seq,)).fetchall()
+        # Store listeners fire while records are applied; those echoes are not new changes
+        self._applying = True
+        try:
+            for seq, op, payload in rows:
+                self.apply(op, json.loads(payload))
+                self.seq = seq
+        finally:
+            self._applying = False
+        return len(rows)
+
+    def catch_up(self):
+        """Apply records other workers appended; skipped while this process is mid-write"""
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._apply_new()
+        finally:
+            self._lock.release()
+
+    # Writing
+
+    def record(self, op, payload):
+        """Queue a mutation for the current write; outside one it is written on its own"""
+        body = json.dumps(payload, default=json_default, ensure_ascii=False)
+        with self._lock:
+            if self._applying:
+                return
+            if self._depth:
+                self._pending.append((op, body))
+                return
+            with self.write():
+                self._pending.append((op, body))
+
+    def begin(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            try:
+                self._db.execute('BEGIN IMMEDIATE')
+                self._apply_new()
+            except BaseException:
+                self._depth -= 1
+                self._lock.release()
+                raise
+
+    def end(self):
+        """Append queued records and commit; local state already holds them, so always commit"""
+        try:
+            if self._depth == 1:
+                pending, self._pending = self._pending, []
+                seq = self.seq
+                rows = []
+                for op, body in pending:
+                    seq += 1
+                    rows.append((seq, op, body, self.worker_id))
+                try:
+                    self._db.executemany('INSERT INTO log (seq, op, payload, worker) VALUES (?, ?, ?, ?)', rows)
+                    self._db.execute('COMMIT')
+                except BaseException:
+                    self._db.execute('ROLLBACK')
+                    raise
+                self.seq = seq
+        finally:
+            self._depth -= 1
+            self._lock.release()
+
+    @contextmanager
+    def write(self):
+        self.begin()
+        try:
+            yield
+        finally:
+            self.end()
+
+    # Background upkeep
+
+    def start(self):
+        self._tailer = threading.Thread(target=self._run, name='shared-log-tailer', daemon=True)
+        self._tailer.start()
+
+    def _run(self):
+        last_heartbeat = 0
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.catch_up()
+                now = time.time()
+                if now - last_heartbeat >= 1:
+                    last_heartbeat = now
+                    self._heartbeat(now)
+                    try:
+                        if self.upkeep:
+                            self.upkeep()
+                    except Exception:
+                        # A failed pass must not stop the tailer; upkeep runs again next second
+                        pass
+                if self.snapshot_source and self.seq - self.snapshot_seq >= self.snapshot_every:
+                    self.snapshot()
+            except sqlite3.OperationalError:
+                # Busy database; try again on the next pass
+                continue
+
+    def _heartbeat(self, now):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO workers (worker, seq, seen_at) VALUES (?, ?, ?)',
+                             (self.worker_id, self.seq, now))
+
+    def live_workers(self, timeout=WORKER_TIMEOUT):
+        """Ids of the workers that sent a heartbeat in the last ``timeout`` seconds"""
+        with self._lock:
+            rows = self._db.execute('SELECT worker FROM workers WHERE seen_at >= ?',
+                                    (time.time() - timeout,)).fetchall()
+        return {worker for (worker,) in rows}
+
+    def snapshot(self):
+        """Store a snapshot of this worker's state and drop records every live worker has applied"""
+        if not self.snapshot_source:
+            return None
+        with self.write():
+            row = self._db.execute('SELECT seq FROM snapshot WHERE id = 1').fetchone()
+            if row is not None and row[0] >= self.seq:
+                self.snapshot_seq = row[0]
+                return row[0]
+            seq = self.seq
+            self._db.execute('INSERT OR REPLACE INTO snapshot (id, seq, state, taken_at) VALUES (1, ?, ?, ?)',
+                             (seq, json.dumps(self.snapshot_source(), default=json_default, ensure_ascii=False),
+                              time.time()))
+            self._db.execute('DELETE FROM workers WHERE seen_at < ?', (time.time() - WORKER_TIMEOUT,))
+            (oldest,) = self._db.execute('SELECT MIN(seq) FROM workers WHERE worker != ?',
+                                         (self.worker_id,)).fetchone()
+            self._db.execute('DELETE FROM log WHERE seq <= ?', (min(seq, oldest if oldest is not None else seq),))
+            self.snapshot_seq = seq
+            return seq
+
+    def close(self, snapshot=False):
+        """Stop the tailer and drop this worker from the compaction bookkeeping"""
+        self._stopped.set()
+        if self._tailer is not None:
+            self._tailer.join()
+        if snapshot:
+            self.snapshot()
+        with self._lock:
+            self._db.execute('DELETE FROM workers WHERE worker = ?', (self.worker_id,))
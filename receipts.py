@@ -0,0 +1,129 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+# Rendered receipts kept in memory, by total PDF size
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_WORKERS = 2
+
+
+def receipt_fields(booking):
+    """Plain, picklable snapshot of the booking fields printed on a receipt"""
+    return {
+        'receipt_id': booking.get('receipt_id'),
+        'payment_at': booking.get('payment_at'),
+        'customer_name': booking.get('customer_name'),
+        'provider_name': booking.get('provider_name'),
+        'service_type': booking.get('service_type'),
+        'payment_amount': booking.get('payment_amount'),
+    }
+
+
+def draw_receipt(p, receipt):
+    """Draw one receipt on the current page of a ReportLab canvas"""
+    p.setFont("Helvetica-Bold", 20)
+    p.drawString(100, 750, "LocalServe - Payment Receipt")
+
+    p.setFont("Helvetica", 12)
+    p.drawString(100, 700, f"Receipt ID: {receipt.get('receipt_id')}")
+    p.drawString(100, 680, f"Date: {receipt.get('payment_at')}")
+    p.drawString(100, 660, f"Customer: {receipt['customer_name']}")
+    p.drawString(100, 640, f"Provider: {receipt['provider_name']}")
+    p.drawString(100, 620, f"Service: {receipt['service_type']}")
+    p.drawString(100, 600, f"Amount Paid: ₹{receipt.get('payment_amount')}")
+    p.drawString(100, 580, "Status: Paid")
+
+
+def render_receipt_pdf(receipt):
+    """Render a single-page receipt and return the PDF bytes"""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    draw_receipt(p, receipt)
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+class RenderedReceipt:
+    __slots__ = ('data', 'etag')
+
+    def __init__(self, data):
+        self.data = data
+        self.etag = hashlib.sha256(data).hexdigest()
+
+
+class ReceiptCache:
+    """Byte-bounded LRU of rendered receipts keyed by receipt_id"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, receipt_id):
+        with self._lock:
+            entry = self._entries.get(receipt_id)
+            if entry is not None:
+                self._entries.move_to_end(receipt_id)
+            return entry
+
+    def put(self, receipt_id, entry):
+        with self._lock:
+            old = self._entries.pop(receipt_id, None)
+            if old is not None:
+                self.size -= len(old.data)
+            self._entries[receipt_id] = entry
+            self.size += len(entry.data)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.data)
+
+
+class ReceiptRenderer:
+    """Renders receipts on a worker pool, deduplicating concurrent requests for one receipt"""
+
+    def __init__(self, cache=None, workers=DEFAULT_WORKERS):
+        self.cache = cache if cache is not None else ReceiptCache()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='receipt')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _render(self, receipt):
+        try:
+            entry = RenderedReceipt(render_receipt_pdf(receipt))
+            self.cache.put(receipt['receipt_id'], entry)
+            return entry
+        finally:
+            with self._lock:
+                self._pending.pop(receipt['receipt_id'], None)
+
+    def submit(self, receipt):
+        """Queue a receipt for rendering unless it is cached or already queued"""
+        receipt_id = receipt['receipt_id']
+        with self._lock:
+            future = self._pending.get(receipt_id)
+            if future is None:
+                if self.cache.get(receipt_id) is not None:
+                    return None
+                future = self._pending[receipt_id] = self._executor.submit(self._render, receipt)
+            return future
+
+    def get(self, receipt, timeout=30):
+        """Return the RenderedReceipt, rendering it on the pool if needed"""
+        entry = self.cache.get(receipt['receipt_id'])
+        if entry is not None:
+            return entry
+        future = self.submit(receipt)
+        if future is None:
+            # Rendered between the cache check and submit
+            return self.cache.get(receipt['receipt_id']) or self._render(receipt)
+        return future.result(timeout)
@@ -0,0 +1,190 @@
+import sys
+import time
+from collections.abc import Mapping, MutableMapping
+from datetime import datetime
+
+# Format every API timestamp uses
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Booking fields, in the order the API has always returned them
+BOOKING_FIELDS = (
+    'id', 'customer_name', 'customer_id', 'provider_id', 'provider_ids', 'provider_name', 'service_type',
+    'service', 'distance', 'budget', 'details', 'customer_phone', 'customer_lat', 'customer_lng',
+    'scheduled_date', 'scheduled_time', 'duration_minutes', 'timestamp', 'time_ago', 'status', 'job_status',
+    'payment_status', 'rating', 'review', 'can_cancel', 'can_reschedule', 'dispatch', 'accepted_at',
+    'completed_at', 'rescheduled_date', 'rescheduled_time', 'rescheduled_at', 'cancellation_reason',
+    'cancelled_at', 'expired_at', 'payment_amount', 'payment_at', 'receipt_id', 'rated_at'
+)
+# Held as integer epoch seconds, formatted only when read
+TIMESTAMP_FIELDS = frozenset({'timestamp', 'accepted_at', 'completed_at', 'rescheduled_at', 'cancelled_at',
+                              'expired_at', 'payment_at', 'rated_at'})
+# Closed sets of values; every booking shares the same string objects
+ENUMS = {
+    'status': ('pending', 'accepted', 'rejected', 'cancelled', 'expired'),
+    'job_status': ('accepted', 'in_progress', 'completed'),
+    'payment_status': ('unpaid', 'paid'),
+}
+# Free text that repeats across bookings, interned so repeats cost one pointer
+INTERNED_FIELDS = frozenset({'customer_name', 'customer_id', 'provider_name', 'service_type', 'service',
+                             'details', 'customer_phone', 'time_ago', 'scheduled_date', 'scheduled_time'})
+
+_FIELD_SET = frozenset(BOOKING_FIELDS)
+_CANONICAL = {field: {value: value for value in values} for field, values in ENUMS.items()}
+# Value of a slot whose field is not set
+_UNSET = object()
+
+
+def epoch_now():
+    return int(time.time())
+
+
+def to_epoch(value):
+    """Epoch seconds from an epoch number, a datetime or a TIMESTAMP_FORMAT string"""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if len(value) == 19 and value[4] == '-' and value[13] == ':':
+        # Fast path for TIMESTAMP_FORMAT; strptime dominates bulk restores otherwise
+        value = datetime(int(value[:4]), int(value[5:7]), int(value[8:10]),
+                         int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    else:
+        value = datetime.strptime(value, TIMESTAMP_FORMAT)
+    return int(value.timestamp())
+
+
+def format_epoch(value):
+    return None if value is None else datetime.fromtimestamp(value).strftime(TIMESTAMP_FORMAT)
+
+
+class BookingRecord(MutableMapping):
+    """A booking held in slots instead of a per-object dict.
+
+    Reads and writes use the same ``booking['field']`` mapping interface as
+    the dicts it replaces, and a record iterates, copies and serializes to
+    exactly the JSON shape bookings have always had: unset fields are
+    absent, timestamps are 'YYYY-MM-DD HH:MM:SS' strings. Internally
+    timestamps are integer epoch seconds, enum fields point at shared
+    canonical strings and repetitive text is interned. Keys outside
+    BOOKING_FIELDS go to a small overflow dict created on first use.
+    """
+
+    __slots__ = BOOKING_FIELDS + ('_extra',)
+
+    def __init__(self, fields=None):
+        # Unset fields hold _UNSET rather than being left empty, so reads never raise internally
+        for field in BOOKING_FIELDS:
+            setattr(self, field, _UNSET)
+        self._extra = None
+        if fields:
+            for key, value in fields.items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is _UNSET:
+                raise KeyError(key)
+            return format_epoch(value) if key in TIMESTAMP_FIELDS else value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is _UNSET:
+                return default
+            return format_epoch(value) if key in TIMESTAMP_FIELDS else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+            return
+        if key in TIMESTAMP_FIELDS:
+            value = to_epoch(value)
+        elif key in _CANONICAL:
+            value = _CANONICAL[key].get(value, value)
+        elif key in INTERNED_FIELDS and type(value) is str:
+            value = sys.intern(value)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET:
+            if getattr(self, key) is _UNSET:
+                raise KeyError(key)
+            setattr(self, key, _UNSET)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for field in BOOKING_FIELDS:
+            if getattr(self, field) is not _UNSET:
+                yield field
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key) is not _UNSET
+        return self._extra is not None and key in self._extra
+
+    def epoch(self, field):
+        """Raw epoch seconds of a timestamp field, or None"""
+        value = getattr(self, field)
+        return None if value is _UNSET else value
+
+    def to_dict(self):
+        values = {}
+        for field in BOOKING_FIELDS:
+            value = getattr(self, field)
+            if value is not _UNSET:
+                values[field] = format_epoch(value) if field in TIMESTAMP_FIELDS else value
+        if self._extra:
+            values.update(self._extra)
+        return values
+
+    copy = to_dict
+
+    def clone(self):
+        """An independent record with the same fields; nested lists and dicts are shared"""
+        twin = BookingRecord.__new__(BookingRecord)
+        for field in BOOKING_FIELDS:
+            setattr(twin, field, getattr(self, field))
+        twin._extra = dict(self._extra) if self._extra else None
+        return twin
+
+    def _values(self):
+        return [getattr(self, field) for field in BOOKING_FIELDS]
+
+    def __eq__(self, other):
+        if not isinstance(other, BookingRecord):
+            return super().__eq__(other)
+        return self._values() == other._values() and (self._extra or {}) == (other._extra or {})
+
+    def __repr__(self):
+        return f'BookingRecord({self.to_dict()!r})'
+
+
+def as_booking(booking):
+    """A BookingRecord for a booking dict (e.g. from the journal); records pass through"""
+    return booking if isinstance(booking, BookingRecord) else BookingRecord(booking)
+
+
+def json_default(value):
+    """``default`` hook for json.dumps: records and other mappings serialize as objects"""
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
@@ -0,0 +1,138 @@
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+
+# Reviews kept per provider for detail pages
+RECENT_REVIEWS = 5
+# Star values a rating can take
+STARS = (1, 2, 3, 4, 5)
+
+
+def review_fields(booking):
+    """The public part of a rated booking"""
+    return {
+        'request_id': booking['id'],
+        'customer_name': booking.get('customer_name'),
+        'service_type': booking.get('service_type'),
+        'rating': booking['rating'],
+        'review': booking.get('review'),
+        'rated_at': booking.get('rated_at')
+    }
+
+
+class ProviderReviews:
+    __slots__ = ('base_sum', 'base_count', 'total', 'count', 'histogram', 'recent', 'keys', 'by_key', 'key_of')
+
+    def __init__(self, base_rating=0, base_count=0):
+        # Rating and review count the provider had before joining, kept apart so
+        # the average is always recomputed from exact sums instead of a rounded mean
+        self.base_sum = (base_rating or 0) * (base_count or 0)
+        self.base_count = base_count or 0
+        self.total = 0
+        self.count = 0
+        self.histogram = dict.fromkeys(STARS, 0)
+        self.recent = deque(maxlen=RECENT_REVIEWS)
+        # (rated_at, request_id) sort keys, oldest first, for paging
+        self.keys = []
+        self.by_key = {}
+        self.key_of = {}
+
+
+class ReviewStore:
+    """Per-provider reviews with running rating aggregates.
+
+    Each provider keeps the exact sum and count of ratings plus a star
+    histogram, so the average never drifts from re-averaging a rounded
+    value, and a bounded deque of the latest reviews, so a detail page costs
+    the same no matter how many bookings were ever completed. All reviews
+    stay in a per-provider list sorted by rating time for paged listing.
+    Adding is idempotent per booking, which lets journal replays re-add
+    reviews safely.
+    """
+
+    def __init__(self):
+        self._providers = {}
+        # Serializes writers so concurrent reviews of one provider are all counted
+        self._lock = threading.Lock()
+
+    def _reviews(self, provider_id):
+        reviews = self._providers.get(provider_id)
+        if reviews is None:
+            reviews = self._providers[provider_id] = ProviderReviews()
+        return reviews
+
+    def set_baseline(self, provider_id, rating, count):
+        """Seed a provider's rating from reviews collected elsewhere"""
+        with self._lock:
+            reviews = self._reviews(provider_id)
+            reviews.base_sum = (rating or 0) * (count or 0)
+            reviews.base_count = count or 0
+
+    def add(self, booking):
+        """Record a rated booking's review; returns False if it was already recorded"""
+        with self._lock:
+            return self._add(booking)
+
+    def _add(self, booking):
+        reviews = self._reviews(booking['provider_id'])
+        if booking['id'] in reviews.key_of:
+            return False
+        review = review_fields(booking)
+        key = (review['rated_at'] or '', review['request_id'])
+        reviews.key_of[review['request_id']] = key
+        reviews.by_key[key] = review
+        if not reviews.keys or key > reviews.keys[-1]:
+            reviews.keys.append(key)
+            reviews.recent.append(review)
+        else:
+            # Replayed out of order: the recent window may need rebuilding
+            insort(reviews.keys, key)
+            reviews.recent.clear()
+            reviews.recent.extend(reviews.by_key[k] for k in reviews.keys[-RECENT_REVIEWS:])
+        reviews.total += review['rating']
+        reviews.count += 1
+        star = min(max(round(review['rating']), STARS[0]), STARS[-1])
+        reviews.histogram[star] += 1
+        return True
+
+    def summary(self, provider_id):
+        """{'rating', 'reviews', 'distribution'}; the distribution only covers reviews recorded here"""
+        reviews = self._providers.get(provider_id) or ProviderReviews()
+        count = reviews.base_count + reviews.count
+        average = (reviews.base_sum + reviews.total) / count if count else 0
+        return {
+            'rating': round(average, 1),
+            'reviews': count,
+            'distribution': {str(star): n for star, n in reviews.histogram.items()}
+        }
+
+    def baseline(self, provider_id):
+        """{'rating', 'reviews'} the provider started from, before any review recorded here"""
+        reviews = self._providers.get(provider_id) or ProviderReviews()
+        return {
+            'rating': reviews.base_sum / reviews.base_count if reviews.base_count else 0,
+            'reviews': reviews.base_count
+        }
+
+    def recent(self, provider_id):
+        """Latest reviews, newest first"""
+        reviews = self._providers.get(provider_id)
+        return list(reversed(reviews.recent)) if reviews else []
+
+    def page(self, provider_id, before_id=None, limit=RECENT_REVIEWS):
+        """Newest-first page of reviews rated before the review of booking ``before_id``
+
+        Returns (reviews, next_before_id); next_before_id is None on the last page.
+        """
+        reviews = self._providers.get(provider_id)
+        if reviews is None:
+            return [], None
+        if before_id is None:
+            end = len(reviews.keys)
+        elif before_id in reviews.key_of:
+            end = bisect_left(reviews.keys, reviews.key_of[before_id])
+        else:
+            return [], None
+        start = max(0, end - limit)
+        page = [reviews.by_key[key] for key in reversed(reviews.keys[start:end])]
+        return page, page[-1]['request_id'] if start > 0 else None
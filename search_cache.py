@@ -0,0 +1,202 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from geo_index import calculate_distance
+
+# Geohash characters per cell; 6 gives cells of about 1.2 x 0.6 km
+DEFAULT_PRECISION = 6
+# Search radii are rounded up to a multiple of this many km
+RADIUS_STEP = 0.5
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 300
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat, lng, precision=DEFAULT_PRECISION):
+    """Standard base32 geohash of a point"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        target, point = (lng_range, lng) if even else (lat_range, lat)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if point >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def geohash_bounds(cell):
+    """(min_lat, max_lat, min_lng, max_lng) of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            target = lng_range if even else lat_range
+            middle = (target[0] + target[1]) / 2
+            if value >> shift & 1:
+                target[0] = middle
+            else:
+                target[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def radius_bucket(radius):
+    return math.ceil(radius / RADIUS_STEP - 1e-9) * RADIUS_STEP
+
+
+class SearchEntry:
+    __slots__ = ('key', 'lat', 'lng', 'reach', 'providers', 'expires')
+
+    def __init__(self, key, lat, lng, reach, providers, expires):
+        self.key = key
+        # Centre of the cell and the radius around it the candidates cover
+        self.lat = lat
+        self.lng = lng
+        self.reach = reach
+        # Provider copies found within ``reach`` of the centre
+        self.providers = providers
+        self.expires = expires
+
+
+class SearchCache:
+    """LRU/TTL cache of radius-search candidates keyed by (service, geohash cell, radius bucket).
+
+    An entry holds every provider within the rounded-up radius plus the
+    cell's half-diagonal of the cell centre, a superset of what any search
+    from inside the cell with a radius in that bucket can return. A hit
+    therefore only recomputes exact distances over a handful of cached
+    providers and stays correct for every point in the cell.
+
+    ``invalidate`` drops exactly the entries a provider change can affect:
+    those that contain the provider (its old position and data) and those
+    whose covered circle contains its new position.
+    """
+
+    def __init__(self, lookup, precision=DEFAULT_PRECISION, max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        # (lat, lng, radius, service) -> [(distance, provider)]
+        self.lookup = lookup
+        self.precision = precision
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        # provider_id -> keys of the entries holding it
+        self._holders = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a fill racing one is not cached
+        self._generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, lat, lng, radius, service):
+        return (service or '').lower(), geohash(lat, lng, self.precision), radius_bucket(radius)
+
+    def query(self, lat, lng, radius, service=None):
+        """[(distance, provider copy)] within ``radius`` km, nearest first"""
+        key = self._key(lat, lng, radius, service)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                self._drop(entry)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                generation = self._generation
+        if entry is None:
+            entry = self._fill(key, now, generation)
+
+        results = []
+        for provider in entry.providers:
+            distance = calculate_distance(lat, lng, provider['lat'], provider['lng'])
+            if distance <= radius:
+                results.append((distance, provider))
+        results.sort(key=lambda item: (item[0], item[1]['id']))
+        return results
+
+    def _fill(self, key, now, generation):
+        service, cell, bucket = key
+        min_lat, max_lat, min_lng, max_lng = geohash_bounds(cell)
+        lat, lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+        # Distances are rounded to 0.01 km, so reach a little further
+        reach = bucket + calculate_distance(lat, lng, max_lat, max_lng) + 0.01
+        providers = [dict(provider) for _, provider in self.lookup(lat, lng, reach, service)]
+        entry = SearchEntry(key, lat, lng, reach, providers, now + self.ttl)
+        with self._lock:
+            if generation != self._generation:
+                return entry
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._drop(previous)
+            self._entries[key] = entry
+            for provider in providers:
+                self._holders.setdefault(provider['id'], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries.values())))
+                self.evictions += 1
+        return entry
+
+    def _drop(self, entry):
+        if self._entries.get(entry.key) is not entry:
+            return
+        del self._entries[entry.key]
+        for provider in entry.providers:
+            keys = self._holders.get(provider['id'])
+            if keys is not None:
+                keys.discard(entry.key)
+                if not keys:
+                    del self._holders[provider['id']]
+
+    def invalidate(self, provider):
+        """Forget every entry the provider's change could affect"""
+        service = (provider.get('service') or '').lower()
+        with self._lock:
+            self._generation += 1
+            stale = {self._entries[key] for key in self._holders.get(provider['id'], ())}
+            for entry in self._entries.values():
+                if (entry.key[0] in ('', service) and
+                        calculate_distance(entry.lat, entry.lng, provider['lat'], provider['lng']) <= entry.reach):
+                    stale.add(entry)
+            for entry in stale:
+                self._drop(entry)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Forget every entry, e.g. after a batch of provider changes"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._holders.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
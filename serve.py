@@ -0,0 +1,77 @@
+"""Run LocalServe with several worker processes behind one listening socket.
+
+    python serve.py --workers 4 --port 5000
+
+The parent binds the port and every worker accepts from the inherited socket,
+so the kernel spreads connections across processes. Workers replicate
+bookings, chats, earnings and room events through a shared SQLite log
+(LOCALSERVE_SHARED_DB, default data/shared.db); set LOCALSERVE_MESSAGE_QUEUE
+to a Socket.IO message queue URL (e.g. redis://localhost:6379/0) to fan out
+socket emits through it instead of through the log.
+
+Socket.IO clients should connect with the websocket transport: HTTP
+long-polling sessions are per worker and need a sticky load balancer.
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+DEFAULT_SHARED_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'shared.db')
+
+
+def run_worker(fd):
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    server = make_server('0.0.0.0', 0, app, threaded=True, fd=fd)
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--shared-db', default=os.environ.get('LOCALSERVE_SHARED_DB', DEFAULT_SHARED_DB))
+    parser.add_argument('--worker-fd', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_fd is not None:
+        run_worker(args.worker_fd)
+        return
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(128)
+    listener.set_inheritable(True)
+
+    env = dict(os.environ, LOCALSERVE_SHARED_DB=args.shared_db)
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker-fd', str(listener.fileno())],
+                                env=env, pass_fds=(listener.fileno(),))
+               for _ in range(args.workers)]
+    print(f'LocalServe: {args.workers} workers on http://{args.host}:{args.port} (shared state in {args.shared_db})')
+
+    def stop(*_):
+        for worker in workers:
+            worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while all(worker.poll() is None for worker in workers):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop()
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == '__main__':
+    main()
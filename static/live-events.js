@@ -0,0 +1,67 @@
+// Live updates for one LocalServe room (provider_<id>, consumer_<id> or chat_<id>).
+// Uses Socket.IO when it is loaded and connected, and falls back to long-polling
+// /api/events otherwise. Events carry a per-room `seq`; on reconnect the last seen
+// seq is sent back so the server replays only what was missed.
+// Sockets try the websocket transport first: it needs no sticky sessions when
+// the server runs several workers (see serve.py).
+const SOCKET_OPTIONS = { transports: ['websocket', 'polling'] };
+
+function subscribeEvents(room, handlers, options = {}) {
+    let lastSeq = null;
+    let socket = options.socket || (window.io ? io(SOCKET_OPTIONS) : null);
+    let polling = false;
+
+    function deliver(event, data) {
+        if (data.room !== room) return;
+        if (lastSeq !== null && data.seq <= lastSeq) return; // already seen via replay
+        lastSeq = data.seq;
+        if (handlers[event]) handlers[event](data);
+    }
+
+    function resync(seq) {
+        lastSeq = seq;
+        if (handlers.resync) handlers.resync();
+    }
+
+    function poll() {
+        if (polling || (socket && socket.connected)) return;
+        polling = true;
+        const since = lastSeq === null ? '' : `&since=${lastSeq}`;
+        fetch(`/api/events?room=${encodeURIComponent(room)}${since}`)
+            .then(r => r.json())
+            .then(data => {
+                polling = false;
+                if (data.reset) {
+                    resync(data.last_seq);
+                } else {
+                    data.events.forEach(e => deliver(e.event, e.data));
+                    if (lastSeq === null) lastSeq = data.last_seq;
+                }
+                poll();
+            })
+            .catch(() => {
+                polling = false;
+                setTimeout(poll, 2000);
+            });
+    }
+
+    if (socket) {
+        socket.on('connect', () => {
+            socket.emit('join_room', { room: room, since: lastSeq });
+        });
+        socket.on('joined', data => {
+            if (data.room === room && lastSeq === null) lastSeq = data.seq;
+        });
+        socket.on('disconnect', () => setTimeout(poll, 1000));
+        socket.on('resync', data => {
+            if (data.room === room) resync(data.seq);
+        });
+        Object.keys(handlers).forEach(event => {
+            if (event !== 'resync') socket.on(event, data => deliver(event, data));
+        });
+        // Cover the window before the socket finishes its handshake
+        setTimeout(poll, 3000);
+    } else {
+        poll();
+    }
+}
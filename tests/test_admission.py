@@ -0,0 +1,36 @@
+from admission import RateLimiter
+
+# (tokens per second, burst) of a slow and a fast endpoint, as in app.RATE_LIMITS
+SLOW = (0.2, 5)
+FAST = (5, 20)
+
+
+def drain(limiter, key, limit, now):
+    while limiter.check(key, *limit, now=now) == 0:
+        pass
+
+
+def test_drained_slow_bucket_survives_fast_traffic():
+    limiter = RateLimiter()
+    drain(limiter, ('create_booking_request', 'a'), SLOW, now=0)
+    # Fast-endpoint buckets refill within 4 s; the slow one needs 25 s
+    for i in range(200):
+        limiter.check(('api_search', f'client-{i}'), *FAST, now=4.2 + i / 1000)
+    assert limiter.check(('create_booking_request', 'a'), *SLOW, now=4.5) > 0
+
+
+def test_buckets_are_evicted_once_full_by_their_own_limits():
+    limiter = RateLimiter()
+    drain(limiter, ('create_booking_request', 'a'), SLOW, now=0)
+    drain(limiter, ('api_search', 'b'), FAST, now=0)
+    limiter.check(('api_search', 'c'), *FAST, now=5)
+    assert limiter.stats()['keys'] == 2
+    limiter.check(('api_search', 'c'), *FAST, now=30)
+    assert limiter.stats()['keys'] == 1
+
+
+def test_max_keys_caps_buckets_that_are_not_yet_full():
+    limiter = RateLimiter(max_keys=10)
+    for i in range(50):
+        limiter.check(('create_booking_request', i), *SLOW, now=0)
+    assert limiter.stats()['keys'] <= 10
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+from availability import AvailabilityIndex
+
+START = datetime(2026, 3, 2, 10, 0)
+
+
+def test_release_among_bookings_sharing_a_start():
+    index = AvailabilityIndex()
+    # Booked so that filing by start alone would put them out of tuple order
+    for booking_id, hours in ((3, 1), (2, 2), (1, 1)):
+        index.book(7, booking_id, START, START + timedelta(hours=hours))
+    for booking_id in (3, 2, 1):
+        index.release(booking_id)
+    assert index.is_free(7, START, START + timedelta(hours=2))
+
+
+def test_rebooking_moves_the_slot():
+    index = AvailabilityIndex()
+    index.book(7, 1, START, START + timedelta(hours=1))
+    index.book(7, 2, START, START + timedelta(hours=1))
+    index.book(7, 1, START + timedelta(hours=3), START + timedelta(hours=4))
+    index.release(2)
+    assert index.is_free(7, START, START + timedelta(hours=2))
+    assert not index.is_free(7, START + timedelta(hours=3), START + timedelta(hours=4))
@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from booking_store import BookingStore, InvalidTransition
+
+
+def new_booking(store, **fields):
+    return store.add({'id': store.next_id(), 'customer_id': 'c1', 'provider_id': 1, 'status': 'pending',
+                      'job_status': None, 'payment_status': 'unpaid', **fields})
+
+
+def test_ids_are_unique_across_threads():
+    store = BookingStore()
+    ids = []
+
+    def allocate():
+        for _ in range(500):
+            ids.append(store.next_id())
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ids) == list(range(1, 2001))
+
+
+def test_transitions_follow_the_state_machine():
+    store = BookingStore()
+    booking_id = new_booking(store)['id']
+    with store.edit(booking_id) as booking:
+        with pytest.raises(InvalidTransition):
+            store.set_job_status(booking, 'accepted')
+        with pytest.raises(InvalidTransition):
+            store.pay(booking, 100, 0)
+        with pytest.raises(InvalidTransition):
+            store.rate(booking, 5, 'great', 0)
+        store.set_status(booking, 'accepted')
+        store.set_job_status(booking, 'accepted')
+        with pytest.raises(InvalidTransition):
+            store.set_job_status(booking, 'accepted')
+        store.set_job_status(booking, 'completed')
+        store.pay(booking, 100, 0)
+        with pytest.raises(InvalidTransition):
+            store.pay(booking, 100, 0)
+        store.rate(booking, 5, 'great', 0)
+        store.archive(booking)
+    with store.edit(booking_id) as booking:
+        assert booking is None
+    stored = store.get(booking_id)
+    assert (stored['status'], stored['job_status'], stored['payment_status']) == ('accepted', 'completed', 'paid')
+    assert store.is_archived(booking_id)
+    with store.edit(booking_id, archived=True) as booking:
+        with pytest.raises(InvalidTransition):
+            store.set_status(booking, 'cancelled')
+
+
+def test_stored_records_change_only_inside_edit():
+    store = BookingStore()
+    booking = new_booking(store)
+    with pytest.raises(RuntimeError):
+        store.set_status(booking, 'accepted')
+    with store.edit(booking['id']) as draft:
+        store.set_status(draft, 'accepted')
+        assert store.get(booking['id'])['status'] == 'pending'
+    assert store.get(booking['id'])['status'] == 'accepted'
+
+
+def test_indexes_follow_changes():
+    store = BookingStore()
+    first = new_booking(store, provider_id=None, provider_ids=[1, 2])
+    second = new_booking(store, provider_id=2)
+    assert {b['id'] for b in store.find(offered_to=2)} == {first['id'], second['id']}
+    with store.edit(first['id']) as booking:
+        store.set_status(booking, 'accepted')
+        store.assign_provider(booking, 1)
+    assert [b['id'] for b in store.find(status='pending')] == [second['id']]
+    assert [b['id'] for b in store.find(provider_id=1, status='accepted')] == [first['id']]
+    assert store.count(status='accepted') == 1
+    assert [b['id'] for b in store.scan(customer_id='c1')] == [first['id'], second['id']]
+    # Every indexed copy is the current record
+    assert all(store.get(b['id']) is b for b in store.find(offered_to=1))
+
+
+def test_feeds_and_customer_pages():
+    store = BookingStore()
+    first = new_booking(store, provider_id=1)
+    new_booking(store, provider_id=2)
+    seen = store.provider_version(1)
+    assert store.provider_changes(1, seen) == []
+    with store.edit(first['id']) as booking:
+        store.set_status(booking, 'rejected')
+    assert store.provider_version(1) > seen
+    assert [b['status'] for b in store.provider_changes(1, seen)] == ['rejected']
+    assert store.provider_changes(2, store.provider_version(2)) == []
+    for _ in range(3):
+        new_booking(store)
+    page, next_before_id = store.customer_page('c1', limit=2)
+    assert [b['id'] for b in page] == [5, 4] and next_before_id == 4
+    page, next_before_id = store.customer_page('c1', before_id=next_before_id, limit=10, statuses={'pending'})
+    assert [b['id'] for b in page] == [3, 2] and next_before_id is None
+
+
+def test_add_many_keeps_ids_unique():
+    store = BookingStore()
+    new_booking(store)
+    stored, rejected = store.add_many([({'customer_id': 'c2', 'status': 'pending'}, False),
+                                       ({'id': 1, 'customer_id': 'c2', 'status': 'pending'}, False),
+                                       ({'id': 10, 'customer_id': 'c2', 'status': 'pending'}, True)])
+    assert [b['id'] for b in stored] == [2, 10] and rejected == [(1, 'id 1 is already in use')]
+    assert store.is_archived(10) and store.next_id() == 11
@@ -0,0 +1,65 @@
+import io
+import os
+
+import pytest
+
+from booking_store import BookingStore
+from bulk import booking_defaults, parse_booking, parse_provider, read_ndjson, stream_ndjson
+
+
+@pytest.fixture(scope='module')
+def client():
+    # In memory, without rate limits; set before the app module first loads
+    os.environ['LOCALSERVE_DATA_DIR'] = 'none'
+    os.environ['LOCALSERVE_RATE_LIMITS'] = 'off'
+    import app
+    return app.app.test_client()
+
+
+def test_read_ndjson_reports_bad_lines():
+    body = b'{"a": 1}\n\nnot json\n' + b'[' * 100 + b'\n{"b": 2}'
+    lines = list(read_ndjson(io.BytesIO(body), max_line=50))
+    assert [(line, value) for line, value, _ in lines] == [(1, {'a': 1}), (3, None), (4, None), (5, {'b': 2})]
+    assert lines[1][2].startswith('invalid JSON') and lines[2][2] == 'line is longer than 50 bytes'
+
+
+def test_bookings_round_trip_through_ndjson():
+    store = BookingStore()
+    for i in range(50):
+        store.add({**booking_defaults(), 'id': store.next_id(), 'customer_id': f'c{i % 3}', 'provider_id': i % 5 + 1,
+                   'status': 'pending', 'job_status': None, 'payment_status': 'unpaid',
+                   'details': f'job {i} – ünïcode', 'timestamp': 1_700_000_000 + i}, archived=i % 7 == 0)
+    records = ({**booking.to_dict(), 'archived': store.is_archived(booking['id'])} for booking in store.scan(None))
+    body = b''.join(stream_ndjson(records, chunk_size=256))
+
+    copy = BookingStore()
+    stored, rejected = copy.add_many(parse_booking(value) for _, value, _ in read_ndjson(io.BytesIO(body)))
+    assert len(stored) == 50 and rejected == []
+    assert [b.to_dict() for b in copy.scan(None)] == [b.to_dict() for b in store.scan(None)]
+    assert [b['id'] for b in copy.find(archived=True)] == [b['id'] for b in store.find(archived=True)]
+
+
+def test_providers_round_trip_through_ndjson():
+    providers = [{'id': i, 'name': f'p{i}', 'service': 'Plumbing', 'lat': 12.5 + i / 100, 'lng': 77,
+                  'services': ['pipes'], 'working_hours': {'start': '08:00', 'end': '17:00'}}
+                 for i in range(1, 11)]
+    body = b''.join(stream_ndjson(providers))
+    parsed = [parse_provider(value) for _, value, _ in read_ndjson(io.BytesIO(body))]
+    assert parsed == providers and all(isinstance(p['lng'], float) for p in parsed)
+
+
+def test_export_then_import_through_the_api(client):
+    exported = client.get('/api/export/bookings?customer_id=bulk-source').data
+    assert exported == b''
+    body = b''.join(stream_ndjson({'customer_id': 'bulk-source', 'provider_id': 1, 'service_type': 'Repair',
+                                   'details': f'job {i}'} for i in range(5)))
+    summary = client.post('/api/import/bookings?batch_size=2', data=body).json
+    assert (summary['imported'], summary['rejected'], summary['batches']) == (5, 0, 3)
+
+    exported = client.get('/api/export/bookings?customer_id=bulk-source').data
+    lines = [value for _, value, _ in read_ndjson(io.BytesIO(exported))]
+    assert [line['details'] for line in lines] == [f'job {i}' for i in range(5)]
+    # Importing the export again is refused line by line: every id is already in use
+    summary = client.post('/api/import/bookings', data=exported).json
+    assert (summary['imported'], summary['rejected']) == (0, 5)
+    assert summary['errors'][0] == {'line': 1, 'error': f'id {lines[0]["id"]} is already in use'}
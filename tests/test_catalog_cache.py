@@ -0,0 +1,22 @@
+from catalog_cache import CatalogCache
+
+
+def make_cache(calls):
+    providers = {1: {'id': 1, 'name': 'Asha', 'rating': 4.5}}
+
+    def detail(provider_id):
+        calls.append(provider_id)
+        return providers.get(provider_id)
+
+    return CatalogCache(lambda: list(providers.values()), detail), providers
+
+
+def test_projections_are_cached_per_provider_version():
+    calls = []
+    cache, providers = make_cache(calls)
+    first = cache.provider(1, ('name',))
+    assert cache.provider(1, ('name',)) is first and calls == [1]
+    providers[1] = {**providers[1], 'name': 'Asha K'}
+    cache.invalidate(1)
+    assert cache.provider(1, ('name',)).body == b'{"name":"Asha K"}'
+    assert cache.provider(2, ('name',)) is None
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from booking_store import BookingStore, InvalidTransition
+from dispatch import Dispatcher
+
+
+def make_providers(count):
+    # Provider i sits i km out, so ranking follows the id
+    return [(float(i), {'id': i, 'rating': 5}) for i in range(1, count + 1)]
+
+
+class Harness:
+    def __init__(self, providers, wave_seconds=0.05):
+        self.bookings = BookingStore()
+        self.offers = []
+        self.expired = threading.Event()
+        self.dispatcher = Dispatcher(
+            self.bookings,
+            find_providers=lambda lat, lng, radius, service: [(d, p) for d, p in providers if d <= radius],
+            open_jobs=lambda provider_id: 0,
+            on_offer=lambda booking, provider_ids, state: self.offers.append(provider_ids),
+            on_expire=self.expire, wave_size=2, wave_seconds=wave_seconds, radii=(2, 5))
+
+    def expire(self, booking):
+        self.bookings.set_status(booking, 'expired')
+        self.expired.set()
+
+    def dispatch(self):
+        booking = self.bookings.add({'id': self.bookings.next_id(), 'customer_id': 'c1', 'provider_id': None,
+                                     'status': 'pending', 'job_status': None, 'payment_status': 'unpaid'})
+        return self.dispatcher.dispatch(booking, 0, 0, 'Plumbing')
+
+
+def test_waves_widen_the_radius_then_expire():
+    harness = Harness(make_providers(5))
+    state = harness.dispatch()
+    assert harness.offers == [[1, 2]]
+    assert harness.expired.wait(2)
+    assert harness.offers == [[1, 2], [3, 4], [5]] and state.waves == 3
+    booking = harness.bookings.get(state.booking_id)
+    assert booking['status'] == 'expired' and booking['provider_ids'] == [1, 2, 3, 4, 5]
+    assert len(harness.dispatcher) == 0
+
+
+def test_expires_at_once_with_nobody_to_ask():
+    harness = Harness([])
+    state = harness.dispatch()
+    assert harness.expired.is_set() and harness.offers == []
+    assert harness.bookings.get(state.booking_id)['status'] == 'expired'
+
+
+def test_first_accept_wins_and_stops_the_waves():
+    harness = Harness(make_providers(5), wave_seconds=0.2)
+    state = harness.dispatch()
+    barrier = threading.Barrier(2)
+    winners = []
+
+    def accept(provider_id):
+        barrier.wait()
+        try:
+            with harness.bookings.edit(state.booking_id) as booking:
+                harness.bookings.set_status(booking, 'accepted')
+                harness.bookings.assign_provider(booking, provider_id)
+            winners.append(provider_id)
+        except InvalidTransition:
+            pass
+
+    threads = [threading.Thread(target=accept, args=(provider_id,)) for provider_id in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.3)
+    booking = harness.bookings.get(state.booking_id)
+    assert len(winners) == 1 and booking['provider_id'] == winners[0]
+    assert booking['status'] == 'accepted' and harness.offers == [[1, 2]]
+    assert not harness.expired.is_set() and len(harness.dispatcher) == 0
+
+
+def test_cancel_stops_dispatch():
+    harness = Harness(make_providers(5))
+    state = harness.dispatch()
+    assert harness.dispatcher.cancel(state.booking_id)
+    time.sleep(0.2)
+    assert harness.offers == [[1, 2]] and not harness.expired.is_set()
+    assert not harness.dispatcher.cancel(state.booking_id)
@@ -0,0 +1,15 @@
+from datetime import date
+
+from earnings import EarningsLedger
+
+
+def test_record_many_counts_each_entry_once():
+    ledger = EarningsLedger()
+    seen = []
+    ledger.listener = seen.append
+    day = date(2026, 1, 5)
+    assert ledger.record_many([(3, day, 900, 'Repair', 'booking-1'), (3, day, 100, 'Install', 'booking-2')]) == 2
+    assert ledger.record_many([(3, day, 900, 'Repair', 'booking-1')]) == 0
+    assert not ledger.record(3, day, 100, 'Install', entry_id='booking-2')
+    assert ledger.day_total(3, day) == 1000 and ledger.service_totals(3) == {'Repair': 900, 'Install': 100}
+    assert [entry['entry_id'] for entry in seen] == ['booking-1', 'booking-2']
@@ -0,0 +1,52 @@
+import threading
+
+from event_stream import EventStream
+
+
+def test_slow_emit_does_not_hold_up_publishers():
+    entered, release = threading.Event(), threading.Event()
+    emitted = []
+
+    def emit(event, data, room=None):
+        entered.set()
+        release.wait(5)
+        emitted.append((room, data['seq']))
+
+    stream = EventStream(emit=emit)
+    first = threading.Thread(target=stream.publish, args=('ping', {}, 'chat_1'))
+    first.start()
+    entered.wait(5)
+    # The first publish is stuck in emit; others still record and return
+    second = threading.Thread(target=stream.publish, args=('ping', {}, 'chat_1'))
+    second.start()
+    second.join(1)
+    assert not second.is_alive()
+    assert [seq for seq, _, _ in stream.since('chat_1', 0)[0]] == [1, 2]
+    release.set()
+    first.join(5)
+    assert emitted == [('chat_1', 1), ('chat_1', 2)]
+
+
+class Clock:
+    now = 1000.0
+
+    @classmethod
+    def time(cls):
+        return cls.now
+
+
+def test_room_seq_survives_an_idle_sweep(monkeypatch):
+    import event_stream
+    monkeypatch.setattr(event_stream, 'time', Clock)
+    stream = EventStream(idle_seconds=60)
+    for _ in range(5):
+        stream.publish('ping', {}, 'provider_1')
+    last_seen = 5
+    Clock.now += 61
+    # Any publish sweeps idle rooms; provider_1's buffer goes, its seq stays
+    stream.publish('ping', {}, 'provider_2')
+    assert stream.since('provider_1', last_seen) == ([], False)
+    seq = stream.publish('ping', {}, 'provider_1')
+    # static/live-events.js drops events with data.seq <= lastSeq
+    assert seq > last_seen
+    assert [e[0] for e in stream.since('provider_1', last_seen)[0]] == [seq]
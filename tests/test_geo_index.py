@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from coord_store import CoordinateStore
+from geo_index import GeoIndex, calculate_distance
+
+SERVICES = ['Plumbing', 'Cleaning', 'Electrical']
+
+
+def random_providers(count, seed=7):
+    rng = random.Random(seed)
+    return [{'id': i, 'name': f'p{i}', 'service': rng.choice(SERVICES),
+             'lat': 40.7 + rng.uniform(-0.3, 0.3), 'lng': -74.0 + rng.uniform(-0.3, 0.3)}
+            for i in range(1, count + 1)]
+
+
+def linear_search(providers, lat, lng, radius, service=None):
+    results = []
+    for provider in providers:
+        if service and provider['service'].lower() != service.lower():
+            continue
+        distance = calculate_distance(lat, lng, provider['lat'], provider['lng'])
+        if distance <= radius:
+            results.append((distance, provider['id']))
+    return sorted(results)
+
+
+QUERIES = [(40.7, -74.0, 2, None), (40.75, -73.95, 5, 'plumbing'), (40.6, -74.1, 10, 'Cleaning'),
+           (40.9, -73.8, 25, None), (41.5, -74.0, 5, None)]
+
+
+@pytest.mark.parametrize('lat, lng, radius, service', QUERIES)
+def test_geo_index_matches_linear_scan(lat, lng, radius, service):
+    providers = random_providers(2000)
+    index = GeoIndex()
+    for provider in providers:
+        index.add(provider)
+    found = [(distance, provider['id']) for distance, provider in index.query(lat, lng, radius, service)]
+    assert found == linear_search(providers, lat, lng, radius, service)
+
+
+def test_geo_index_follows_updates():
+    providers = random_providers(500)
+    index = GeoIndex()
+    index.rebuild(providers)
+    moved = [{**provider, 'lat': provider['lat'] + 0.2} for provider in providers[:100]]
+    index.update_many(moved)
+    current = moved + providers[100:]
+    for lat, lng, radius, service in QUERIES:
+        found = [(distance, provider['id']) for distance, provider in index.query(lat, lng, radius, service)]
+        assert found == linear_search(current, lat, lng, radius, service)
+
+
+@pytest.mark.parametrize('lat, lng, radius, service', QUERIES)
+def test_coordinate_store_matches_linear_scan(lat, lng, radius, service):
+    providers = random_providers(2000)
+    store = CoordinateStore()
+    store.add_many(providers[:1000])
+    for provider in providers[1000:]:
+        store.add(provider)
+    expected = linear_search(providers, lat, lng, radius, service)
+    found = store.nearest(lat, lng, radius, service)
+    # NumPy and math may round a distance sitting on a 0.005 km boundary differently
+    assert len(found) == pytest.approx(len(expected), abs=1)
+    for (provider_id, distance), (expected_distance, expected_id) in zip(found, expected):
+        assert distance == pytest.approx(expected_distance, abs=0.011)
+    assert {i for i, _ in found} ^ {i for _, i in expected} <= {
+        provider['id'] for provider in providers
+        if abs(calculate_distance(lat, lng, provider['lat'], provider['lng']) - radius) <= 0.01}
+    assert store.nearest(lat, lng, radius, service, limit=3) == found[:3]
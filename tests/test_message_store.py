@@ -0,0 +1,21 @@
+from message_store import MessageStore
+
+
+def test_expired_chats_are_evicted_as_messages_arrive():
+    store = MessageStore(retention_seconds=100, sweep_interval=10)
+    store.add(1, 'a', 'hi', 'ts', now=0)
+    store.close(1, now=0)
+    store.add(2, 'a', 'hi', 'ts', now=50)
+    assert store.page(1)
+    store.add(2, 'a', 'again', 'ts', now=101)
+    assert store.page(1) == [] and len(store) == 2
+
+
+def test_closed_chats_go_early_when_the_store_is_full():
+    store = MessageStore(retention_seconds=100, max_messages=3)
+    for request_id in (1, 2):
+        store.add(request_id, 'a', 'hi', 'ts', now=0)
+        store.close(request_id, now=0)
+    store.add(3, 'a', 'hi', 'ts', now=1)
+    store.add(3, 'a', 'again', 'ts', now=2)
+    assert store.page(1) == [] and store.page(2) and len(store) == 3
@@ -0,0 +1,227 @@
+import re
+import threading
+from bisect import bisect_left
+
+# Provider fields searched by free text
+TEXT_FIELDS = ('name', 'service', 'services', 'languages', 'certifications', 'description', 'bio', 'address')
+# Provider fields offered as facets (exact, case-insensitive values)
+FACET_FIELDS = ('service', 'services', 'languages', 'certifications', 'price_band', 'rating')
+# Lower bounds of the price bands, by the low end of a provider's price range
+PRICE_BANDS = ((0, 'under_500'), (500, '500_1000'), (1000, '1000_plus'))
+# Tokens at least this long also match with one typo
+MIN_TYPO_LENGTH = 4
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_NUMBER = re.compile(r'\d+')
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+
+def price_band(price):
+    """Band for a price string like '₹500-800', by its low end"""
+    match = _NUMBER.search(str(price or '').replace(',', ''))
+    if not match:
+        return None
+    low = int(match.group())
+    band = None
+    for floor, name in PRICE_BANDS:
+        if low >= floor:
+            band = name
+    return band
+
+
+def rating_bucket(rating):
+    """'4+' style bucket used for the rating facet"""
+    if rating is None:
+        return None
+    return f'{int(rating)}+'
+
+
+def _deletes(token):
+    """The token with each single character removed (symmetric-delete typo matching)"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _values(provider, field):
+    if field == 'price_band':
+        value = price_band(provider.get('price'))
+    elif field == 'rating':
+        value = rating_bucket(provider.get('rating'))
+    else:
+        value = provider.get(field)
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).lower() for v in value]
+    return [str(value).lower()]
+
+
+class TextIndex:
+    """Inverted index over provider text fields with prefix, typo and facet lookups.
+
+    Every token maps to the ids of providers containing it. A sorted token
+    list answers prefix queries with a bisect, and a symmetric-delete map
+    (token with one character dropped -> tokens) finds words one edit away
+    without scanning the vocabulary. Facet values get their own postings,
+    so filters are set intersections and facet counts only touch the
+    matched ids. ``update`` swaps one provider's postings in place.
+    """
+
+    def __init__(self):
+        # token -> {provider ids}
+        self._postings = {}
+        self._vocabulary = []
+        # token with one character deleted -> {tokens}
+        self._deleted = {}
+        # field -> value -> {provider ids}
+        self._facets = {field: {} for field in FACET_FIELDS}
+        # provider id -> (tokens, {field: values}) currently indexed
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def rebuild(self, providers):
+        with self._lock:
+            self._reset()
+            added = []
+            for provider in providers:
+                self._add(provider, added)
+            self._vocabulary = sorted(added)
+
+    def _reset(self):
+        self._postings = {}
+        self._vocabulary = []
+        self._deleted = {}
+        self._facets = {field: {} for field in FACET_FIELDS}
+        self._docs = {}
+
+    def update(self, provider):
+        """Reindex one provider after its profile changed"""
+        with self._lock:
+            self._remove(provider['id'])
+            self._add(provider)
+
+    def update_many(self, providers):
+        """Reindex a batch of providers, merging their new tokens into the vocabulary once"""
+        batch = {provider['id']: provider for provider in providers}
+        with self._lock:
+            for provider_id in batch:
+                self._remove(provider_id)
+            added = []
+            for provider in batch.values():
+                self._add(provider, added)
+            if added:
+                self._vocabulary = sorted(self._vocabulary + added)
+
+    def _add(self, provider, added=None):
+        """Index a provider; new tokens go to ``added`` for the caller to merge, if given"""
+        provider_id = provider['id']
+        tokens = set()
+        for field in TEXT_FIELDS:
+            value = provider.get(field)
+            for item in value if isinstance(value, (list, tuple)) else [value]:
+                if item is not None:
+                    tokens.update(tokenize(item))
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                if added is None:
+                    self._vocabulary.insert(bisect_left(self._vocabulary, token), token)
+                else:
+                    added.append(token)
+                if len(token) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(token):
+                        self._deleted.setdefault(variant, set()).add(token)
+            ids.add(provider_id)
+
+        facets = {field: _values(provider, field) for field in FACET_FIELDS}
+        for field, values in facets.items():
+            for value in values:
+                self._facets[field].setdefault(value, set()).add(provider_id)
+        self._docs[provider_id] = (tokens, facets)
+
+    def _remove(self, provider_id):
+        doc = self._docs.pop(provider_id, None)
+        if doc is None:
+            return
+        tokens, facets = doc
+        for token in tokens:
+            ids = self._postings[token]
+            ids.discard(provider_id)
+            if not ids:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+                if len(token) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(token):
+                        variants = self._deleted[variant]
+                        variants.discard(token)
+                        if not variants:
+                            del self._deleted[variant]
+        for field, values in facets.items():
+            for value in values:
+                bucket = self._facets[field][value]
+                bucket.discard(provider_id)
+                if not bucket:
+                    del self._facets[field][value]
+
+    def _expand(self, term):
+        """Vocabulary tokens a query term matches: itself, words it prefixes, words one edit away"""
+        matches = set()
+        position = bisect_left(self._vocabulary, term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            matches.add(self._vocabulary[position])
+            position += 1
+        if len(term) >= MIN_TYPO_LENGTH:
+            # Deletion, insertion and substitution are all found through shared delete variants
+            for variant in _deletes(term) | {term}:
+                matches.update(self._deleted.get(variant, ()))
+            for variant in _deletes(term):
+                if variant in self._postings:
+                    matches.add(variant)
+        return matches
+
+    def match(self, text):
+        """Ids of providers matching every term of ``text``; None when there are no terms"""
+        terms = tokenize(text)
+        if not terms:
+            return None
+        with self._lock:
+            result = None
+            # Rarest-looking terms (longest) first keeps the intersections small
+            for term in sorted(set(terms), key=len, reverse=True):
+                ids = set()
+                for token in self._expand(term):
+                    ids |= self._postings[token]
+                result = ids if result is None else result & ids
+                if not result:
+                    return set()
+            return result
+
+    def filter(self, **filters):
+        """Ids having every given facet value, e.g. languages='hindi'; None without filters"""
+        result = None
+        with self._lock:
+            for field, value in filters.items():
+                if value is None:
+                    continue
+                ids = self._facets[field].get(str(value).lower(), set())
+                result = set(ids) if result is None else result & ids
+        return result
+
+    def facet_counts(self, provider_ids):
+        """{field: {value: count}} over the given providers"""
+        counts = {field: {} for field in FACET_FIELDS}
+        with self._lock:
+            for provider_id in provider_ids:
+                doc = self._docs.get(provider_id)
+                if doc is None:
+                    continue
+                for field, values in doc[1].items():
+                    for value in values:
+                        counts[field][value] = counts[field].get(value, 0) + 1
+        return counts